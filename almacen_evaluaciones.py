@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Almacén local de evaluaciones en SQLite (modo WAL) para consultar el
+historial de cada paciente.
+
+Las inserciones pasan por una cola y un hilo escritor que las agrupa en una
+transacción por tanda. Las lecturas usan una conexión por hilo y los índices
+sobre paciente+fecha, fecha, versión del modelo y clase predicha, así que una
+consulta de historial solo toca las filas que devuelve.
+
+Las respuestas se guardan como la clave uint64 de codec_paciente y las
+probabilidades como float32 en un BLOB.
+"""
+
+import argparse
+import atexit
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import ETIQUETAS, calcular_puntaje_riesgo
+from codec_paciente import MASCARA_EDAD, empaquetar_paciente, desempaquetar_paciente
+
+RUTA_EVALUACIONES = 'evaluaciones.db'
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS evaluaciones (
+    id INTEGER PRIMARY KEY,
+    paciente TEXT,
+    fecha TEXT NOT NULL,
+    version TEXT NOT NULL,
+    clave INTEGER NOT NULL,
+    puntaje INTEGER NOT NULL,
+    clase INTEGER NOT NULL,
+    confianza REAL NOT NULL,
+    probabilidades BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_paciente ON evaluaciones (paciente, fecha);
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_fecha ON evaluaciones (fecha);
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_version ON evaluaciones (version, fecha);
+CREATE INDEX IF NOT EXISTS idx_evaluaciones_clase ON evaluaciones (clase, fecha);
+"""
+
+INSERTAR = """
+INSERT INTO evaluaciones (paciente, fecha, version, clave, puntaje, clase, confianza, probabilidades)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+COLUMNAS = 'id, paciente, fecha, version, clave, puntaje, clase, confianza, probabilidades'
+
+
+def conectar(ruta):
+    conexion = sqlite3.connect(ruta, check_same_thread=False)
+    conexion.execute('PRAGMA journal_mode=WAL')
+    conexion.execute('PRAGMA synchronous=NORMAL')
+    return conexion
+
+
+def fila_evaluacion(paciente, datos_usuario, probabilidades, version, fecha=None):
+    """Tupla lista para INSERTAR a partir de las respuestas y la salida del modelo"""
+    probabilidades = np.asarray(probabilidades, dtype=np.float32)
+    fecha = fecha or datetime.datetime.now().isoformat(sep=' ', timespec='seconds')
+    return (paciente or None, fecha, version, empaquetar_paciente(datos_usuario),
+            calcular_puntaje_riesgo(datos_usuario), int(probabilidades.argmax()),
+            float(probabilidades.max()), probabilidades.tobytes())
+
+
+class AlmacenEvaluaciones:
+    def __init__(self, ruta=RUTA_EVALUACIONES, version='', tamano_cola=10000, filas_por_tanda=1000):
+        self.ruta = ruta
+        self.version = version
+        self.filas_por_tanda = filas_por_tanda
+        self.cola = queue.Queue(maxsize=tamano_cola)
+        self.fallidas = 0
+        self._lectura = threading.local()
+
+        with conectar(ruta) as conexion:
+            conexion.executescript(ESQUEMA)
+        self._hilo = threading.Thread(target=self._escribir, name='almacen_evaluaciones', daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def guardar(self, paciente, datos_usuario, probabilidades):
+        """Encola una evaluación (solo espera si la cola está llena)"""
+        self.cola.put(fila_evaluacion(paciente, datos_usuario, probabilidades, self.version))
+
+    def esperar(self):
+        """Bloquea hasta que todo lo encolado esté escrito"""
+        self.cola.join()
+
+    def cerrar(self):
+        if self._hilo.is_alive():
+            self.cola.put(None)
+            self._hilo.join()
+
+    def insertar_lote(self, filas, filas_por_transaccion=100000):
+        """Inserción masiva directa (importaciones y pruebas de carga)"""
+        conexion = conectar(self.ruta)
+        try:
+            for desde in range(0, len(filas), filas_por_transaccion):
+                with conexion:
+                    conexion.executemany(INSERTAR, filas[desde:desde + filas_por_transaccion])
+        finally:
+            conexion.close()
+
+    def _escribir(self):
+        conexion = conectar(self.ruta)
+        terminar = False
+        while not terminar:
+            tanda = [self.cola.get()]
+            while len(tanda) < self.filas_por_tanda:
+                try:
+                    tanda.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+            filas = [f for f in tanda if f is not None]
+            terminar = len(filas) < len(tanda)
+            try:
+                if filas:
+                    with conexion:
+                        conexion.executemany(INSERTAR, filas)
+            except sqlite3.Error as e:
+                # P. ej. "database is locked" con otro escritor: se pierde la tanda, no el hilo
+                self.fallidas += len(filas)
+                print(f"⚠️ No se pudieron guardar {len(filas)} evaluaciones en {self.ruta}: {e}")
+            finally:
+                for _ in tanda:
+                    self.cola.task_done()
+        conexion.close()
+
+    def _conexion(self):
+        # sqlite3 no comparte conexiones entre hilos de forma segura: una por hilo
+        if not hasattr(self._lectura, 'conexion'):
+            self._lectura.conexion = conectar(self.ruta)
+        return self._lectura.conexion
+
+    def _consultar(self, condiciones, parametros, limite):
+        sql = f"SELECT {COLUMNAS} FROM evaluaciones"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += " ORDER BY fecha DESC, id DESC LIMIT ?"
+        filas = self._conexion().execute(sql, (*parametros, limite)).fetchall()
+        return tabla_evaluaciones(filas)
+
+    def historial(self, paciente, limite=100):
+        """Evaluaciones de un paciente, de la más reciente a la más antigua"""
+        return self._consultar(['paciente = ?'], [paciente], limite)
+
+    def consultar(self, desde=None, hasta=None, version=None, clase=None, limite=100):
+        """Evaluaciones filtradas por rango de fechas, versión del modelo y clase predicha"""
+        condiciones, parametros = [], []
+        for condicion, valor in (('fecha >= ?', desde), ('fecha <= ?', hasta),
+                                 ('version = ?', version), ('clase = ?', clase)):
+            if valor is not None:
+                condiciones.append(condicion)
+                parametros.append(valor)
+        return self._consultar(condiciones, parametros, limite)
+
+    def total(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM evaluaciones").fetchone()[0]
+
+
+def tabla_evaluaciones(filas):
+    """DataFrame legible a partir de las filas de la tabla"""
+    ids, pacientes, fechas, versiones, claves, puntajes, clases, confianzas, blobs = (
+        zip(*filas) if filas else [()] * 9)
+    probabilidades = np.frombuffer(b''.join(blobs), dtype=np.float32).reshape(len(ids), len(ETIQUETAS))
+    claves = np.array(claves, dtype=np.int64)
+    datos = {
+        'ID': ids,
+        'Paciente': pacientes,
+        'Fecha': pd.to_datetime(fechas, format='%Y-%m-%d %H:%M:%S'),
+        'Edad (meses)': claves & MASCARA_EDAD,
+        'Diagnóstico': np.asarray(ETIQUETAS, dtype=object)[np.array(clases, dtype=np.int64)],
+        'Confianza': confianzas,
+        'Puntaje riesgo': puntajes,
+        'Versión': versiones,
+        'Clave': claves
+    }
+    for i, etiqueta in enumerate(ETIQUETAS):
+        datos[f'P({etiqueta})'] = probabilidades[:, i]
+    return pd.DataFrame(datos)
+
+
+def comparar_respuestas(clave_anterior, clave_actual):
+    """Variables cuya respuesta cambió entre dos evaluaciones: {variable: (antes, ahora)}"""
+    antes, ahora = desempaquetar_paciente(clave_anterior), desempaquetar_paciente(clave_actual)
+    return {var: (antes[var], ahora[var]) for var in antes if antes[var] != ahora[var]}
+
+
+def poblar(almacen, n_evaluaciones, n_pacientes, semilla=42, model_path=None, ruta_bundle=None):
+    """Evaluaciones sintéticas puntuadas con el modelo, para pruebas de rendimiento"""
+    from prediccion_tea import RUTA_MODELO, crear_interprete
+    from datos_tea import RUTA_BUNDLE, cargar_bundle
+    from codec_paciente import empaquetar
+    from puntuacion_lote import PUNTOS_POR_INDICE, puntuar_claves
+    from simulador_poblacion import generar_cohorte
+
+    rng = np.random.default_rng(semilla)
+    preprocessor, _ = cargar_bundle(ruta_bundle or RUTA_BUNDLE)
+    edades, codigos = generar_cohorte(n_evaluaciones, rng)
+    claves = empaquetar(edades, codigos)
+    probabilidades, _ = puntuar_claves(crear_interprete(model_path or RUTA_MODELO), preprocessor, claves)
+    probabilidades = probabilidades.astype(np.float32)
+    puntajes = PUNTOS_POR_INDICE[np.arange(codigos.shape[1]), codigos].sum(axis=1)
+
+    pacientes = rng.integers(0, n_pacientes, n_evaluaciones)
+    inicio = datetime.datetime(2020, 1, 1)
+    segundos = np.sort(rng.integers(0, 5 * 365 * 86400, n_evaluaciones))
+    filas = [
+        (f'P{p:07d}', (inicio + datetime.timedelta(seconds=int(s))).isoformat(sep=' '), almacen.version,
+         int(c), int(pt), int(pr.argmax()), float(pr.max()), pr.tobytes())
+        for p, s, c, pt, pr in zip(pacientes, segundos, claves, puntajes, probabilidades)
+    ]
+    almacen.insertar_lote(filas)
+
+
+def main():
+    from registro_auditoria import version_modelo
+
+    parser = argparse.ArgumentParser(description="Carga y mide el almacén de evaluaciones")
+    parser.add_argument('--ruta', default=RUTA_EVALUACIONES)
+    parser.add_argument('--poblar', type=int, default=0, help="Evaluaciones sintéticas a insertar")
+    parser.add_argument('--pacientes', type=int, default=100000, help="Pacientes distintos al poblar")
+    parser.add_argument('--consultas', type=int, default=1000, help="Consultas de historial a medir")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    print("🗄️ Almacén de evaluaciones")
+    print("=" * 50)
+
+    almacen = AlmacenEvaluaciones(args.ruta, version=f'{version_modelo():08x}')
+    if args.poblar:
+        inicio = time.perf_counter()
+        poblar(almacen, args.poblar, args.pacientes, args.semilla)
+        duracion = time.perf_counter() - inicio
+        print(f"   Insertadas: {args.poblar:,} evaluaciones en {duracion:.1f} s ({args.poblar / duracion:,.0f}/s)")
+
+    print(f"   Total: {almacen.total():,} evaluaciones | Archivo: {os.path.getsize(args.ruta) / 1024 ** 2:.0f} MB")
+
+    rng = np.random.default_rng(args.semilla)
+    tiempos = {'Historial de un paciente': [], 'Últimas de una clase': [], 'Un día': []}
+    for _ in range(args.consultas):
+        inicio = time.perf_counter()
+        almacen.historial(f'P{rng.integers(0, args.pacientes):07d}')
+        tiempos['Historial de un paciente'].append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        almacen.consultar(clase=int(rng.integers(0, len(ETIQUETAS))), limite=50)
+        tiempos['Últimas de una clase'].append(time.perf_counter() - inicio)
+
+        dia = datetime.date(2020, 1, 1) + datetime.timedelta(days=int(rng.integers(0, 5 * 365)))
+        inicio = time.perf_counter()
+        almacen.consultar(desde=f'{dia} 00:00:00', hasta=f'{dia} 23:59:59', limite=1000)
+        tiempos['Un día'].append(time.perf_counter() - inicio)
+
+    print(f"\n⏱️ Latencia de consultas ({args.consultas} de cada tipo):\n")
+    for nombre, muestras in tiempos.items():
+        muestras = np.array(muestras) * 1000
+        print(f"   {nombre:26s} mediana {np.median(muestras):6.2f} ms | p99 {np.percentile(muestras, 99):6.2f} ms")
+    almacen.cerrar()
+
+
+if __name__ == "__main__":
+    main()
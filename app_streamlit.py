@@ -1,11 +1,28 @@
 import streamlit as st
+import altair as alt
 import numpy as np
 import pandas as pd
-import tensorflow as tf
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
 import pickle
 import os
+import time
+import uuid
+
+from prediccion_tea import (
+    OPCIONES_VARIABLES, ETIQUETAS, calcular_puntaje_riesgo,
+    crear_interprete, predecir_probabilidades, analizar_contrafactuales
+)
+from datos_tea import RUTA_DATASET, RUTA_BUNDLE, cargar_bundle
+from cubo_analitico import CuboAnalitico, ruta_cubo
+from codec_paciente import empaquetar_paciente
+from registro_auditoria import RegistroAuditoria, version_modelo
+from almacen_evaluaciones import AlmacenEvaluaciones, comparar_respuestas
+from modo_sombra import ModoSombra, RUTA_CANDIDATO, inferencia_cronometrada
+from guardia_latencia import GuardiaLatencia, ModeloNoDisponible, prediccion_respaldo, es_respaldo
+from control_admision import ControlAdmision, PeticionRechazada
+from captura_trafico import captura_desde_entorno
+from validar_contrato import validar_contrato
 
 # Configuración de la página
 st.set_page_config(
@@ -19,25 +36,6 @@ st.title("🧠 Predictor de trastorno del espectro autista")
 st.markdown("### Aplicación de diagnóstico clínico usando IA")
 st.markdown("**Precisión del modelo: ~70%** | Basado en variables clínicas y conductuales")
 
-# Definir las opciones para cada variable categórica (basadas en el dataset de entrenamiento)
-OPCIONES_VARIABLES = {
-    'Sexo': ['Masculino', 'Femenino'],
-    'Lenguaje': ['No verbal', 'Ecolalia', 'Frases simples', 'Lenguaje funcional'],
-    'Comunicación no verbal': ['Ausente', 'Muy limitada', 'Limitada', 'Adecuada'],
-    'Contacto visual': ['Evitativo', 'Intermitente', 'Sostenido', 'Natural'],
-    'Interacción social': ['Ausente', 'Pasiva', 'Inapropiada', 'Adecuada'],
-    'Respuesta al nombre': ['Nunca', 'A veces', 'Siempre'],
-    'Estereotipias': ['Muy frecuentes', 'Frecuentes', 'Ocasionales', 'Ausentes'],
-    'Intereses restringidos': ['Muy intensos', 'Persistentes', 'Leves', 'Ausentes'],
-    'Regulación emocional': ['Autolesiva', 'Crisis frecuentes', 'Ocasionales', 'Adecuada'],
-    'TDAH': ['Sí', 'No'],
-    'Discapacidad intelectual': ['Sí', 'No'],
-    'Hipersensibilidad sensorial': ['Alta', 'Moderada', 'Leve', 'Ninguna'],
-    'Trastornos del sueño': ['Severo', 'Moderado', 'Leve', 'Normal'],
-    'Alimentación selectiva': ['Alta', 'Moderada', 'Leve', 'Ninguna'],
-    'Antecedentes familiares': ['TEA', 'TDAH', 'Discapacidad intelectual', 'Ninguno']
-}
-
 # Cargar modelo
 # Función para crear el preprocessor (debe ser igual al del entrenamiento)
 @st.cache_resource
@@ -52,6 +50,12 @@ def create_preprocessor():
     ]
     numeric_cols = ['Edad (meses)', 'Puntaje riesgo']
     
+    # Preprocessor exportado junto al modelo (categorías y escalado del entrenamiento)
+    if os.path.exists(RUTA_BUNDLE):
+        preprocessor, _ = cargar_bundle(RUTA_BUNDLE)
+        print(f"✅ Preprocessor cargado desde {RUTA_BUNDLE}")
+        return preprocessor, categorical_cols, numeric_cols
+    
     # Crear dataset de entrenamiento que incluya TODAS las categorías posibles
     print("🔧 Creando dataset de entrenamiento para preprocessor...")
     
@@ -117,106 +121,149 @@ def create_preprocessor():
     
     return preprocessor, categorical_cols, numeric_cols
 
-def calcular_puntaje_riesgo(datos):
-    """Calcula el puntaje de riesgo basado en las respuestas clínicas"""
-    score = 0
-    
-    # Lenguaje
-    if datos['Lenguaje'] == 'No verbal': score += 3
-    elif datos['Lenguaje'] == 'Ecolalia': score += 2
-    elif datos['Lenguaje'] == 'Frases simples': score += 1
-    
-    # Comunicación no verbal
-    if datos['Comunicación no verbal'] == 'Ausente': score += 3
-    elif datos['Comunicación no verbal'] == 'Muy limitada': score += 2
-    elif datos['Comunicación no verbal'] == 'Limitada': score += 1
-    
-    # Contacto visual
-    if datos['Contacto visual'] == 'Evitativo': score += 2
-    elif datos['Contacto visual'] == 'Intermitente': score += 1
-    
-    # Interacción social
-    if datos['Interacción social'] == 'Ausente': score += 3
-    elif datos['Interacción social'] == 'Pasiva': score += 2
-    elif datos['Interacción social'] == 'Inapropiada': score += 1
-    
-    # Respuesta al nombre
-    if datos['Respuesta al nombre'] == 'Nunca': score += 2
-    elif datos['Respuesta al nombre'] == 'A veces': score += 1
-    
-    # Estereotipias
-    if datos['Estereotipias'] == 'Muy frecuentes': score += 3
-    elif datos['Estereotipias'] == 'Frecuentes': score += 2
-    elif datos['Estereotipias'] == 'Ocasionales': score += 1
-    
-    # Intereses restringidos
-    if datos['Intereses restringidos'] == 'Muy intensos': score += 2
-    elif datos['Intereses restringidos'] == 'Persistentes': score += 1
-    
-    # Regulación emocional
-    if datos['Regulación emocional'] == 'Autolesiva': score += 3
-    elif datos['Regulación emocional'] == 'Crisis frecuentes': score += 2
-    elif datos['Regulación emocional'] == 'Ocasionales': score += 1
-    
-    # Comorbilidades
-    if datos['Discapacidad intelectual'] == 'Sí': score += 2
-    if datos['TDAH'] == 'Sí': score += 1
-    
-    return score
 @st.cache_resource
 def load_model():
     model_path = 'modelo_autismo.tflite'
     if os.path.exists(model_path):
-        interpreter = tf.lite.Interpreter(model_path=model_path)
-        interpreter.allocate_tensors()
-        return interpreter
+        # Modelo, bundle y opciones deben coincidir (formas, categorías, escalado y clases)
+        diferencias = validar_contrato(model_path, RUTA_BUNDLE)
+        if diferencias:
+            st.error("❌ El modelo no coincide con el bundle de preprocesamiento:\n\n"
+                     + "\n".join(f"- {d}" for d in diferencias))
+            return None
+        # Backend e hilos del perfil de autotune.py, si existe
+        return crear_interprete(model_path, uso='interactivo')
     else:
         st.error("❌ No se encontró el archivo modelo_autismo.tflite")
         st.info("Asegúrate de que el archivo esté en la misma carpeta que esta aplicación")
         return None
 
+@st.cache_resource
+def load_model_contrafactual():
+    # Intérprete aparte para el barrido contrafactual: se queda con el lote de las
+    # variantes y el de predecir_tea con una fila, sin redimensionar en cada petición
+    return crear_interprete('modelo_autismo.tflite', uso='interactivo')
+
+@st.cache_resource
+def iniciar_registro():
+    # Un escritor en segundo plano por proceso; registrar solo encola
+    return RegistroAuditoria(version_modelo('modelo_autismo.tflite'))
+
+@st.cache_resource
+def iniciar_captura():
+    # Captura de tráfico solo si TEA_CAPTURA indica el archivo (para repetirlo con captura_trafico.py)
+    return captura_desde_entorno()
+
+@st.cache_resource
+def iniciar_guardia():
+    # Compartida por todas las sesiones: el estado del circuito es del modelo, no del usuario
+    return GuardiaLatencia(tiempo_maximo=0.5, fallos_para_abrir=3, segundos_abierto=30.0)
+
+@st.cache_resource
+def iniciar_admision():
+    # Una petición a la vez en el intérprete; el resto espera en una cola acotada y justa por sesión
+    return ControlAdmision(concurrencia=1, capacidad_cola=32, capacidad_por_cliente=2, espera_maxima=2.0)
+
+def cliente_actual():
+    if 'cliente' not in st.session_state:
+        st.session_state.cliente = uuid.uuid4().hex
+    return st.session_state.cliente
+
+@st.cache_resource
+def iniciar_sombra():
+    # Modo sombra solo si hay un modelo candidato junto a la app
+    if os.path.exists(RUTA_CANDIDATO):
+        return ModoSombra(RUTA_CANDIDATO)
+    return None
+
+@st.cache_resource
+def iniciar_almacen():
+    # Sin modelo el historial sigue disponible para consulta (las estimaciones de respaldo no se guardan)
+    model_path = 'modelo_autismo.tflite'
+    version = f"{version_modelo(model_path):08x}" if os.path.exists(model_path) else 'sin-modelo'
+    return AlmacenEvaluaciones(version=version)
+
 # Función de predicción
 def predecir_tea(interpreter, preprocessor, datos_usuario):
     """
-    Realiza predicción usando el modelo TFLite y los datos preprocesados
+    Realiza predicción usando el modelo TFLite y los datos preprocesados.
+    Si el modelo no está, tarda demasiado o falla (o el circuito está
+    abierto), devuelve la estimación por puntaje de riesgo.
     """
     try:
+        # Captura anónima de la petición al llegar (antes de la cola y del modelo)
+        captura = iniciar_captura()
+        if captura is not None:
+            captura.capturar(datos_usuario)
+        
         # Crear DataFrame con los datos del usuario
         df_usuario = pd.DataFrame([datos_usuario])
         
         # Preprocesar los datos (aplicar OneHotEncoder y StandardScaler)
         X_processed = preprocessor.transform(df_usuario)
         
-        # Convertir a float32 para TFLite
-        input_data = X_processed.astype(np.float32)
-        
-        # Realizar predicción
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        if interpreter is None:
+            return prediccion_respaldo(datos_usuario)
         
-        interpreter.set_tensor(input_details[0]['index'], input_data)
-        interpreter.invoke()
-        output_data = interpreter.get_tensor(output_details[0]['index'])
+        # Realizar predicción con tiempo máximo e interruptor de circuito
+        # y detrás del control de admisión (rechazo rápido si la cola está llena)
+        # La latencia se mide dentro del hilo de la guardia, igual que la del candidato en modo sombra
+        with iniciar_admision().admitir(cliente_actual()):
+            output_data, latencia = iniciar_guardia().ejecutar(inferencia_cronometrada, interpreter, X_processed)
         
         pred_idx = int(np.argmax(output_data))
         confianza = float(np.max(output_data))
         
-        # Etiquetas (deben coincidir con las del entrenamiento)
-        ETIQUETAS = ['Desarrollo típico', 'TEA - Nivel 1', 'TEA - Nivel 2', 'TEA - Nivel 3', 'Indeterminado']
         resultado = ETIQUETAS[pred_idx] if pred_idx < len(ETIQUETAS) else "Resultado desconocido"
         
+        # Registro de auditoría (no añade latencia: lo escribe otro hilo)
+        iniciar_registro().registrar(empaquetar_paciente(datos_usuario), output_data[0])
+        
+        # Modo sombra: el candidato puntúa la misma petición en otro hilo
+        sombra = iniciar_sombra()
+        if sombra is not None:
+            sombra.enviar(datos_usuario, output_data[0], latencia)
+        
         return resultado, confianza, output_data[0]
         
+    except ModeloNoDisponible:
+        return prediccion_respaldo(datos_usuario)
+    except PeticionRechazada as e:
+        st.warning(f"⏳ Hay demasiadas evaluaciones en curso ({e.motivo.lower()}). "
+                   f"Vuelve a intentarlo en {max(e.reintentar_en, 1.0):.0f} s")
+        return "Error", 0.0, []
     except Exception as e:
         st.error(f"Error en la predicción: {str(e)}")
         return "Error", 0.0, []
 
+def analisis_contrafactual(preprocessor, datos_usuario):
+    """
+    Barrido contrafactual por el mismo camino que la predicción (admisión y
+    guardia de latencia). Devuelve (sensibilidad, curva_edad, duracion_ms) o
+    None si no se puede calcular; la evaluación se conserva igualmente.
+    """
+    guardia = iniciar_guardia()
+    try:
+        with iniciar_admision().admitir(cliente_actual()):
+            inicio = time.perf_counter()
+            sensibilidad, curva_edad = analizar_contrafactuales(
+                load_model_contrafactual(), preprocessor, datos_usuario,
+                predecir=lambda interpreter, X: guardia.ejecutar(predecir_probabilidades, interpreter, X))
+            return sensibilidad, curva_edad, (time.perf_counter() - inicio) * 1000
+    except (ModeloNoDisponible, PeticionRechazada):
+        st.info("ℹ️ El análisis contrafactual no está disponible en este momento")
+        return None
+    except Exception as e:
+        # La predicción ya está hecha (y quizá guardada): solo se omite el barrido
+        st.info(f"ℹ️ No se pudo calcular el análisis contrafactual: {e}")
+        return None
+
 # Interfaz principal
 def main():
     # Cargar modelo y preprocessor
     interpreter = load_model()
     if interpreter is None:
-        st.stop()
+        st.warning("⚠️ Sin modelo: los resultados serán la estimación por puntaje de riesgo")
     
     preprocessor, categorical_cols, numeric_cols = create_preprocessor()
     
@@ -229,68 +276,96 @@ def main():
     **Diagnósticos:** 5 categorías
     """)
     
+    mostrar_estado_guardia(interpreter)
+    
     st.sidebar.markdown("---")
     st.sidebar.header("📊 Modo de Predicción")
     
     modo = st.sidebar.radio(
         "Selecciona el modo:",
-        ["📋 Evaluación clínica completa", "🔮 Datos simulados", "📊 Información del modelo"]
+        ["📋 Evaluación clínica completa", "🔮 Datos simulados", "🗂️ Historial de evaluaciones",
+         "📈 Análisis del dataset", "📊 Información del modelo"]
     )
     
     if modo == "📋 Evaluación clínica completa":
         mostrar_evaluacion_clinica(interpreter, preprocessor)
     elif modo == "🔮 Datos simulados":
         mostrar_datos_simulados(interpreter, preprocessor)
+    elif modo == "🗂️ Historial de evaluaciones":
+        mostrar_historial()
+    elif modo == "📈 Análisis del dataset":
+        mostrar_analisis_dataset()
     else:
         mostrar_informacion_modelo()
 
+def mostrar_estado_guardia(interpreter):
+    metricas = iniciar_guardia().metricas()
+    if interpreter is None:
+        st.sidebar.error("🔴 Modelo no cargado: estimación por puntaje")
+    elif metricas['estado'] == 'abierto':
+        st.sidebar.error(f"🔴 Modelo en pausa (circuito abierto): estimación por puntaje. "
+                         f"Reintento en {metricas['segundos_para_reintento']:.0f} s")
+    elif metricas['estado'] == 'semiabierto':
+        st.sidebar.warning("🟡 Probando de nuevo el modelo")
+    else:
+        st.sidebar.success("🟢 Modelo activo")
+    with st.sidebar.expander("Métricas del motor de predicción"):
+        st.json({'circuito': metricas, 'admision': iniciar_admision().metricas()})
+
 def mostrar_evaluacion_clinica(interpreter, preprocessor):
     st.header("📋 Evaluación clínica completa")
     st.markdown("**Completa todos los campos para obtener un diagnóstico orientativo**")
     
-    # Crear dos columnas principales
-    col1, col2 = st.columns(2)
+    # Formulario: las respuestas se envían juntas al pulsar el botón, sin un rerun por cada cambio
+    with st.form("evaluacion_clinica"):
+        paciente = st.text_input("Identificador del paciente (opcional)",
+                                 help="Para guardar la evaluación y consultarla luego en el historial")
     
-    with col1:
-        st.subheader("👶 Información básica")
-        edad = st.slider("Edad (en meses)", 3, 36, 36, help="Edad del paciente en meses")
-        sexo = st.selectbox("Sexo", OPCIONES_VARIABLES['Sexo'])
+        # Crear dos columnas principales
+        col1, col2 = st.columns(2)
+    
+        with col1:
+            st.subheader("👶 Información básica")
+            edad = st.slider("Edad (en meses)", 3, 36, 36, help="Edad del paciente en meses")
+            sexo = st.selectbox("Sexo", OPCIONES_VARIABLES['Sexo'])
         
-        st.subheader("🗣️ Comunicación y lenguaje")
-        lenguaje = st.selectbox("Nivel de lenguaje", OPCIONES_VARIABLES['Lenguaje'])
-        comunicacion_nv = st.selectbox("Comunicación no verbal", OPCIONES_VARIABLES['Comunicación no verbal'])
-        contacto_visual = st.selectbox("Contacto visual", OPCIONES_VARIABLES['Contacto visual'])
-        respuesta_nombre = st.selectbox("Respuesta al nombre", OPCIONES_VARIABLES['Respuesta al nombre'])
+            st.subheader("🗣️ Comunicación y lenguaje")
+            lenguaje = st.selectbox("Nivel de lenguaje", OPCIONES_VARIABLES['Lenguaje'])
+            comunicacion_nv = st.selectbox("Comunicación no verbal", OPCIONES_VARIABLES['Comunicación no verbal'])
+            contacto_visual = st.selectbox("Contacto visual", OPCIONES_VARIABLES['Contacto visual'])
+            respuesta_nombre = st.selectbox("Respuesta al nombre", OPCIONES_VARIABLES['Respuesta al nombre'])
         
-        st.subheader("🤝 Interacción social")
-        interaccion_social = st.selectbox("Interacción social", OPCIONES_VARIABLES['Interacción social'])
+            st.subheader("🤝 Interacción social")
+            interaccion_social = st.selectbox("Interacción social", OPCIONES_VARIABLES['Interacción social'])
         
-        st.subheader("🔄 Comportamientos repetitivos")
-        estereotipias = st.selectbox("Estereotipias", OPCIONES_VARIABLES['Estereotipias'])
-        intereses_restringidos = st.selectbox("Intereses restringidos", OPCIONES_VARIABLES['Intereses restringidos'])
+            st.subheader("🔄 Comportamientos repetitivos")
+            estereotipias = st.selectbox("Estereotipias", OPCIONES_VARIABLES['Estereotipias'])
+            intereses_restringidos = st.selectbox("Intereses restringidos", OPCIONES_VARIABLES['Intereses restringidos'])
     
-    with col2:
-        st.subheader("😌 Regulación emocional")
-        regulacion = st.selectbox("Regulación emocional", OPCIONES_VARIABLES['Regulación emocional'])
+        with col2:
+            st.subheader("😌 Regulación emocional")
+            regulacion = st.selectbox("Regulación emocional", OPCIONES_VARIABLES['Regulación emocional'])
         
-        st.subheader("🏥 Comorbilidades")
-        tdah = st.selectbox("TDAH", OPCIONES_VARIABLES['TDAH'])
-        discapacidad_int = st.selectbox("Discapacidad intelectual", OPCIONES_VARIABLES['Discapacidad intelectual'])
+            st.subheader("🏥 Comorbilidades")
+            tdah = st.selectbox("TDAH", OPCIONES_VARIABLES['TDAH'])
+            discapacidad_int = st.selectbox("Discapacidad intelectual", OPCIONES_VARIABLES['Discapacidad intelectual'])
         
-        st.subheader("👂 Aspectos sensoriales")
-        hipersensibilidad = st.selectbox("Hipersensibilidad sensorial", OPCIONES_VARIABLES['Hipersensibilidad sensorial'])
+            st.subheader("👂 Aspectos sensoriales")
+            hipersensibilidad = st.selectbox("Hipersensibilidad sensorial", OPCIONES_VARIABLES['Hipersensibilidad sensorial'])
         
-        st.subheader("💤 Hábitos")
-        sueno = st.selectbox("Trastornos del sueño", OPCIONES_VARIABLES['Trastornos del sueño'])
-        alimentacion = st.selectbox("Alimentación selectiva", OPCIONES_VARIABLES['Alimentación selectiva'])
+            st.subheader("💤 Hábitos")
+            sueno = st.selectbox("Trastornos del sueño", OPCIONES_VARIABLES['Trastornos del sueño'])
+            alimentacion = st.selectbox("Alimentación selectiva", OPCIONES_VARIABLES['Alimentación selectiva'])
         
-        st.subheader("👨‍👩‍👧‍👦 Antecedentes")
-        antecedentes = st.selectbox("Antecedentes familiares", OPCIONES_VARIABLES['Antecedentes familiares'])
+            st.subheader("👨‍👩‍👧‍👦 Antecedentes")
+            antecedentes = st.selectbox("Antecedentes familiares", OPCIONES_VARIABLES['Antecedentes familiares'])
     
-    # Botón para predecir
-    st.markdown("---")
+        # Botón para predecir
+        st.markdown("---")
+    
+        enviado = st.form_submit_button("🧠 Realizar diagnóstico", type="primary", use_container_width=True)
     
-    if st.button("🧠 Realizar diagnóstico", type="primary", use_container_width=True):
+    if enviado:
         # Preparar datos del usuario
         datos_usuario = {
             'Edad (meses)': edad,
@@ -320,12 +395,43 @@ def mostrar_evaluacion_clinica(interpreter, preprocessor):
             with st.spinner("🔄 Procesando diagnóstico..."):
                 resultado, confianza, probabilidades = predecir_tea(interpreter, preprocessor, datos_usuario)
             
-            # Mostrar resultados
-            mostrar_resultados(resultado, confianza, probabilidades, puntaje_riesgo)
+            if resultado == "Error":
+                # predecir_tea ya mostró el motivo; no se dibuja la evaluación anterior debajo
+                # (es de otras respuestas), pero se conserva en la sesión marcada como anterior
+                st.session_state.envio_fallido = True
+                return
+            
+            evaluacion = {'resultado': resultado, 'confianza': confianza, 'probabilidades': probabilidades,
+                          'puntaje_riesgo': puntaje_riesgo, 'paciente': None, 'contrafactual': None}
+            
+            if not es_respaldo(resultado):
+                if paciente.strip():
+                    iniciar_almacen().guardar(paciente.strip(), datos_usuario, probabilidades)
+                    evaluacion['paciente'] = paciente.strip()
+                evaluacion['contrafactual'] = analisis_contrafactual(preprocessor, datos_usuario)
+            
+            # Última evaluación de la sesión: se vuelve a mostrar (sin recalcular) al cambiar de modo y volver
+            st.session_state.ultima_evaluacion = evaluacion
+            st.session_state.envio_fallido = False
             
         except Exception as e:
+            # Igual que con "Error": solo el fallo, sin la evaluación anterior debajo
             st.error(f"❌ Error en el procesamiento: {str(e)}")
             st.error("Por favor, revisa que todos los campos estén completos.")
+            st.session_state.envio_fallido = True
+            return
+    
+    evaluacion = st.session_state.get('ultima_evaluacion')
+    if evaluacion is not None:
+        if st.session_state.get('envio_fallido'):
+            st.caption("🕘 Evaluación anterior: el último envío no se completó")
+        mostrar_resultados(evaluacion['resultado'], evaluacion['confianza'], evaluacion['probabilidades'],
+                           evaluacion['puntaje_riesgo'])
+        if evaluacion['paciente']:
+            # Se escribe en segundo plano: la página de historial avisa si alguna tanda falló
+            st.caption(f"💾 Evaluación enviada al historial de {evaluacion['paciente']}")
+        if evaluacion['contrafactual'] is not None:
+            mostrar_analisis_contrafactual(*evaluacion['contrafactual'])
 
 def mostrar_resultados(resultado, confianza, probabilidades, puntaje_riesgo):
     st.markdown("---")
@@ -336,7 +442,9 @@ def mostrar_resultados(resultado, confianza, probabilidades, puntaje_riesgo):
     
     with col1:
         # Color según resultado
-        if resultado == 'Desarrollo típico':
+        if es_respaldo(resultado):
+            st.info(f"**{resultado}**")
+        elif resultado == 'Desarrollo típico':
             st.success(f"**Diagnóstico:** {resultado}")
         elif 'TEA' in resultado:
             st.warning(f"**Diagnóstico:** {resultado}")
@@ -344,7 +452,10 @@ def mostrar_resultados(resultado, confianza, probabilidades, puntaje_riesgo):
             st.info(f"**Diagnóstico:** {resultado}")
     
     with col2:
-        st.metric("Confianza del modelo", f"{confianza*100:.1f}%")
+        if es_respaldo(resultado):
+            st.metric("Confianza del modelo", "No disponible")
+        else:
+            st.metric("Confianza del modelo", f"{confianza*100:.1f}%")
     
     with col3:
         # Interpretar puntaje de riesgo (actualizado para escala /24)
@@ -370,7 +481,6 @@ def mostrar_resultados(resultado, confianza, probabilidades, puntaje_riesgo):
     if len(probabilidades) > 0:
         st.subheader("📈 Distribución de probabilidades")
         
-        ETIQUETAS = ['Desarrollo típico', 'TEA - Nivel 1', 'TEA - Nivel 2', 'TEA - Nivel 3', 'Indeterminado']
         chart_data = {}
         
         for i, etiqueta in enumerate(ETIQUETAS[:len(probabilidades)]):
@@ -383,6 +493,10 @@ def mostrar_resultados(resultado, confianza, probabilidades, puntaje_riesgo):
         df_prob['Probabilidad'] = df_prob['Probabilidad'].apply(lambda x: f"{x*100:.1f}%")
         st.dataframe(df_prob, use_container_width=True)
     
+    if es_respaldo(resultado):
+        st.warning("El modelo no está disponible o no respondió a tiempo. Este resultado es solo el nivel "
+                   "del puntaje de riesgo calculado a partir de las respuestas, sin diagnóstico del modelo.")
+    
     # Advertencia médica
     st.warning("""
     ⚠️ **IMPORTANTE:** Este es un sistema de apoyo al diagnóstico basado en IA. 
@@ -390,6 +504,29 @@ def mostrar_resultados(resultado, confianza, probabilidades, puntaje_riesgo):
     Consulte siempre con un especialista en neurología o psiquiatría infantil.
     """)
 
+def mostrar_analisis_contrafactual(sensibilidad, curva_edad, duracion_ms):
+    st.markdown("---")
+    st.header("🔍 ¿Qué pasaría si...?")
+    st.markdown("Cada fila cambia **una sola respuesta** del paciente; todas las variantes se evalúan en una única inferencia.")
+    
+    n_cambios = int(sensibilidad['Cambia diagnóstico'].sum())
+    if n_cambios:
+        st.warning(f"**{n_cambios}** respuestas alternativas cambiarían el diagnóstico")
+    else:
+        st.success("Ninguna respuesta alternativa cambia el diagnóstico por sí sola")
+    
+    st.subheader("📋 Tabla de sensibilidad")
+    tabla = sensibilidad.copy()
+    tabla['Confianza'] = tabla['Confianza'].apply(lambda x: f"{x*100:.1f}%")
+    tabla['Δ prob. diagnóstico actual'] = tabla['Δ prob. diagnóstico actual'].apply(lambda x: f"{x*100:+.1f} pp")
+    tabla['Cambia diagnóstico'] = tabla['Cambia diagnóstico'].map({True: '⚠️ Sí', False: 'No'})
+    st.dataframe(tabla, use_container_width=True, hide_index=True)
+    
+    st.subheader("📈 Probabilidades según la edad")
+    st.line_chart(curva_edad.set_index('Edad (meses)'))
+    
+    st.caption(f"{len(sensibilidad) + len(curva_edad) + 1} variantes evaluadas en {duracion_ms:.0f} ms")
+
 def mostrar_datos_simulados(interpreter, preprocessor):
     st.header("🔮 Predicción con datos simulados")
     st.info("Esta opción utiliza valores predeterminados para probar el modelo")
@@ -445,6 +582,121 @@ def mostrar_datos_simulados(interpreter, preprocessor):
             st.error("Hay un problema con el modelo o los datos.")
 
 
+@st.cache_resource
+def cargar_cubo_analitico():
+    ruta = ruta_cubo(RUTA_DATASET)
+    return CuboAnalitico.cargar(ruta) if os.path.exists(ruta) else None
+
+
+def mostrar_analisis_dataset():
+    st.header("📈 Análisis del dataset de entrenamiento")
+    
+    cubo = cargar_cubo_analitico()
+    if cubo is None:
+        st.info("No se encontró el cubo analítico. Genéralo con: `python cubo_analitico.py`")
+        return
+    
+    st.markdown("Conteos precalculados por edad, puntaje de riesgo, diagnóstico y variables seleccionadas.")
+    
+    # Filtros
+    edades = cubo.etiquetas[cubo.ejes.index('Edad (meses)')]
+    diagnosticos = cubo.etiquetas[cubo.ejes.index('Diagnóstico orientativo')]
+    col1, col2 = st.columns(2)
+    with col1:
+        rango_edad = st.slider("Edad (meses)", min(edades), max(edades), (min(edades), max(edades)))
+        seleccion_diagnosticos = st.multiselect("Diagnóstico", diagnosticos, default=diagnosticos)
+    filtros = {
+        'Edad (meses)': list(range(rango_edad[0], rango_edad[1] + 1)),
+        'Diagnóstico orientativo': seleccion_diagnosticos
+    }
+    with col2:
+        for eje, etiquetas in zip(cubo.ejes[3:], cubo.etiquetas[3:]):
+            filtros[eje] = st.multiselect(eje, etiquetas, default=etiquetas)
+    
+    inicio = time.perf_counter()
+    seleccion = cubo.seleccionar(filtros)
+    por_puntaje = seleccion.marginal('Puntaje riesgo', 'Diagnóstico orientativo')
+    por_edad = seleccion.marginal('Edad (meses)', 'Diagnóstico orientativo')
+    resumen = seleccion.resumen_caja('Puntaje riesgo', 'Diagnóstico orientativo')
+    densidad = seleccion.marginal('Edad (meses)', 'Puntaje riesgo')
+    duracion = time.perf_counter() - inicio
+    
+    st.metric("Casos seleccionados", f"{seleccion.total:,}")
+    if seleccion.total == 0:
+        st.warning("Ningún caso cumple los filtros")
+        return
+    
+    st.subheader("📊 Puntaje de riesgo por diagnóstico")
+    st.bar_chart(por_puntaje)
+    st.dataframe(resumen.round(2), use_container_width=True)
+    
+    st.subheader("👶 Edad por diagnóstico")
+    st.bar_chart(por_edad)
+    
+    st.subheader("🗺️ Densidad edad / puntaje de riesgo")
+    celdas = densidad.stack().rename('Casos').reset_index()
+    st.altair_chart(alt.Chart(celdas).mark_rect().encode(
+        x=alt.X('Edad (meses):O'),
+        y=alt.Y('Puntaje riesgo:O', sort='descending'),
+        color=alt.Color('Casos:Q', scale=alt.Scale(scheme='blues')),
+        tooltip=['Edad (meses)', 'Puntaje riesgo', 'Casos']
+    ), use_container_width=True)
+    
+    st.caption(f"Consulta sobre el cubo ({cubo.conteos.size:,} celdas, {cubo.total:,} casos) "
+               f"en {duracion * 1000:.1f} ms")
+
+
+def mostrar_historial():
+    st.header("🗂️ Historial de evaluaciones")
+    
+    almacen = iniciar_almacen()
+    # Incluir las evaluaciones que aún estén en la cola del escritor
+    almacen.esperar()
+    if almacen.fallidas:
+        st.warning(f"⚠️ {almacen.fallidas} evaluaciones enviadas no se pudieron guardar (ver el registro del servidor)")
+    
+    paciente = st.text_input("Identificador del paciente", help="Vacío para ver las últimas evaluaciones")
+    
+    inicio = time.perf_counter()
+    if paciente.strip():
+        historial = almacen.historial(paciente.strip())
+    else:
+        diagnostico = st.selectbox("Diagnóstico", ["Todos"] + ETIQUETAS)
+        clase = None if diagnostico == "Todos" else ETIQUETAS.index(diagnostico)
+        historial = almacen.consultar(clase=clase, limite=50)
+    duracion = time.perf_counter() - inicio
+    
+    if historial.empty:
+        st.info("No hay evaluaciones guardadas" + (f" para {paciente.strip()}" if paciente.strip() else ""))
+        return
+    
+    columnas = ['Fecha', 'Paciente', 'Edad (meses)', 'Diagnóstico', 'Confianza', 'Puntaje riesgo', 'Versión']
+    st.dataframe(historial[columnas].style.format({'Confianza': '{:.1%}'}), use_container_width=True, hide_index=True)
+    
+    if paciente.strip() and len(historial) >= 2:
+        st.subheader("📈 Evolución")
+        evolucion = historial.set_index('Fecha').sort_index()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.line_chart(evolucion[['Puntaje riesgo']])
+        with col2:
+            st.line_chart(evolucion[[f'P({etiqueta})' for etiqueta in ETIQUETAS]])
+        
+        actual, anterior = historial.iloc[0], historial.iloc[1]
+        st.subheader("🔁 Cambios respecto a la evaluación anterior")
+        st.markdown(f"**Diagnóstico:** {anterior['Diagnóstico']} → {actual['Diagnóstico']} | "
+                    f"**Puntaje de riesgo:** {anterior['Puntaje riesgo']} → {actual['Puntaje riesgo']}")
+        cambios = comparar_respuestas(anterior['Clave'], actual['Clave'])
+        if cambios:
+            st.dataframe(pd.DataFrame([(var, antes, ahora) for var, (antes, ahora) in cambios.items()],
+                                      columns=['Variable', 'Antes', 'Ahora']),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.info("Las respuestas no cambiaron")
+    
+    st.caption(f"Consulta en {duracion * 1000:.1f} ms")
+
+
 def mostrar_informacion_modelo():
     st.header("📊 Información del modelo")
     
@@ -504,10 +756,28 @@ def mostrar_informacion_modelo():
         - Historia familiar
         """)
     
+    sombra = iniciar_sombra()
+    if sombra is not None:
+        mostrar_modo_sombra(sombra)
+    
     st.info("""
     💡 **Nota:** Este modelo fue entrenado con datos sintéticos basados en criterios clínicos establecidos. 
     Está diseñado como herramienta de apoyo y NO debe usarse como único método diagnóstico.
     """)
 
+def mostrar_modo_sombra(sombra):
+    st.subheader(f"🕶️ Modo sombra: {sombra.ruta_candidato}")
+    metricas = sombra.metricas()
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Peticiones comparadas", f"{metricas['evaluadas']:,}")
+    col2.metric("Acuerdo con producción", "—" if metricas['evaluadas'] == 0 else f"{metricas['acuerdo']:.1%}")
+    col3.metric("Descartadas por carga", f"{metricas['descartadas']:,}")
+    
+    st.markdown("**Cambios de diagnóstico** (filas: producción, columnas: candidato)")
+    st.dataframe(metricas['cambios'], use_container_width=True)
+    st.markdown("**Latencia de inferencia**")
+    st.dataframe(metricas['latencias'].round(3), use_container_width=True)
+
 if __name__ == "__main__":
     main()
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import numpy as np
-import tflite_runtime.interpreter as tflite
+from prediccion_tea import ETIQUETAS, crear_interprete
 import os
 
 class TEAPredictorApp:
@@ -20,8 +20,8 @@ class TEAPredictorApp:
     def load_model(self):
         model_path = 'modelo_autismo.tflite'
         if os.path.exists(model_path):
-            self.interpreter = tflite.Interpreter(model_path=model_path)
-            self.interpreter.allocate_tensors()
+            # Backend e hilos del perfil de autotune.py, si existe
+            self.interpreter = crear_interprete(model_path, uso='interactivo')
             self.input_details = self.interpreter.get_input_details()
             self.output_details = self.interpreter.get_output_details()
         else:
@@ -225,8 +225,7 @@ class TEAPredictorApp:
         pred_idx = int(np.argmax(output_data))
         confianza = float(np.max(output_data)) * 100
         
-        etiquetas = ['Desarrollo típico', 'TEA - Nivel 1', 'TEA - Nivel 2', 'TEA - Nivel 3', 'Indeterminado']
-        resultado = etiquetas[pred_idx] if pred_idx < len(etiquetas) else "Resultado desconocido"
+        resultado = ETIQUETAS[pred_idx] if pred_idx < len(ETIQUETAS) else "Resultado desconocido"
         
         return resultado, confianza
 
@@ -0,0 +1,150 @@
+"""
+Modelos de árboles (DecisionTreeClassifier / RandomForestClassifier) compilados
+a arrays planos de NumPy, para servirlos sin sklearn.
+
+Todos los árboles se concatenan en los mismos arrays:
+
+    caracteristica  variable que se compara en cada nodo (-1 en las hojas)
+    umbral          se va a la izquierda si x[caracteristica] <= umbral
+    izquierda       hijo izquierdo (índice global, -1 en las hojas)
+    derecha         hijo derecho (índice global, -1 en las hojas)
+    valor           probabilidades de cada clase en el nodo (float32)
+    raices          nodo raíz de cada árbol
+
+El recorrido avanza todas las parejas (fila, árbol) a la vez, un nivel por
+iteración, y solo sigue trabajando con las que aún no han llegado a una hoja.
+"""
+
+import numpy as np
+
+
+class ArbolesCompilados:
+    def __init__(self, caracteristica, umbral, izquierda, derecha, valor, raices, n_features, clases=None):
+        self.caracteristica = caracteristica
+        self.umbral = umbral
+        self.izquierda = izquierda
+        self.derecha = derecha
+        self.valor = valor
+        self.raices = raices
+        self.n_features = int(n_features)
+        self.clases = np.arange(valor.shape[1]) if clases is None else np.asarray(clases)
+        # Etiquetas de texto (p. ej. LabelEncoder.classes_) como str: un array object no se puede guardar sin pickle
+        if self.clases.dtype == object:
+            self.clases = self.clases.astype(str)
+        # Hijos intercalados (derecha, izquierda): un solo acceso por nivel
+        self._hijos = np.stack([derecha, izquierda], axis=1).reshape(-1)
+
+    @property
+    def n_nodos(self):
+        return len(self.caracteristica)
+
+    @classmethod
+    def desde_sklearn(cls, modelo, clases=None):
+        """Compila un árbol o un bosque de sklearn ya entrenado"""
+        estimadores = getattr(modelo, 'estimators_', [modelo])
+        partes = {k: [] for k in ('caracteristica', 'umbral', 'izquierda', 'derecha', 'valor')}
+        raices, desplazamiento = [], 0
+
+        for estimador in estimadores:
+            arbol = estimador.tree_
+            hoja = arbol.children_left < 0
+            raices.append(desplazamiento)
+            partes['caracteristica'].append(np.where(hoja, -1, arbol.feature).astype(np.int32))
+            partes['umbral'].append(arbol.threshold.astype(np.float64))
+            partes['izquierda'].append(np.where(hoja, -1, arbol.children_left + desplazamiento).astype(np.int32))
+            partes['derecha'].append(np.where(hoja, -1, arbol.children_right + desplazamiento).astype(np.int32))
+            # Según la versión de sklearn, value guarda conteos o fracciones: se normaliza
+            valor = arbol.value[:, 0, :]
+            partes['valor'].append((valor / valor.sum(axis=1, keepdims=True)).astype(np.float32))
+            desplazamiento += arbol.node_count
+
+        return cls(**{k: np.concatenate(v) for k, v in partes.items()},
+                   raices=np.array(raices, dtype=np.int32),
+                   n_features=modelo.n_features_in_,
+                   clases=modelo.classes_ if clases is None else clases)
+
+    def guardar(self, ruta):
+        np.savez(ruta, caracteristica=self.caracteristica, umbral=self.umbral,
+                 izquierda=self.izquierda, derecha=self.derecha, valor=self.valor,
+                 raices=self.raices, n_features=self.n_features, clases=self.clases)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta, allow_pickle=False) as datos:
+            return cls(**{k: datos[k] for k in datos.files})
+
+    def hojas(self, X):
+        """Hoja alcanzada en cada árbol: array (n_filas, n_arboles)"""
+        # sklearn compara en float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_arboles = len(self.raices)
+        plano = np.tile(self.raices, len(X))
+        inicio_fila = np.repeat(np.arange(len(X)) * X.shape[1], n_arboles)
+        X = X.reshape(-1)
+
+        activos = np.arange(plano.size)
+        while len(activos):
+            actuales = plano[activos]
+            caracteristica = self.caracteristica[actuales]
+            internos = caracteristica >= 0
+            if not internos.all():
+                activos, actuales, caracteristica = activos[internos], actuales[internos], caracteristica[internos]
+            a_la_izquierda = X[inicio_fila[activos] + caracteristica] <= self.umbral[actuales]
+            plano[activos] = self._hijos[2 * actuales + a_la_izquierda]
+        return plano.reshape(-1, n_arboles)
+
+    def predict_proba(self, X, filas_por_bloque=8192):
+        """Media de las probabilidades de las hojas, como predict_proba de sklearn"""
+        X = np.asarray(X)
+        salida = np.empty((len(X), self.valor.shape[1]), dtype=np.float32)
+        for inicio in range(0, len(X), filas_por_bloque):
+            hojas = self.hojas(X[inicio:inicio + filas_por_bloque])
+            salida[inicio:inicio + filas_por_bloque] = self.valor[hojas].mean(axis=1)
+        return salida
+
+    def predict(self, X):
+        return self.clases[self.predict_proba(X).argmax(axis=1)]
+
+
+class InterpreteArboles:
+    """
+    Adaptador con la interfaz del intérprete TFLite (set_tensor / invoke /
+    get_tensor...) para usar los árboles compilados donde se usa el modelo
+    de red neuronal, por ejemplo en predecir_probabilidades.
+    """
+
+    def __init__(self, model_path):
+        self.modelo = ArbolesCompilados.cargar(model_path)
+        self._forma_entrada = np.array([1, self.modelo.n_features], dtype=np.int32)
+        self._entrada = None
+        self._salida = None
+
+    def get_input_details(self):
+        return [{'name': 'entrada', 'index': 0, 'shape': self._forma_entrada.copy(),
+                 'shape_signature': np.array([-1, self.modelo.n_features], dtype=np.int32),
+                 'dtype': np.float32}]
+
+    def get_output_details(self):
+        n_clases = self.modelo.valor.shape[1]
+        return [{'name': 'probabilidades', 'index': 1,
+                 'shape': np.array([self._forma_entrada[0], n_clases], dtype=np.int32),
+                 'shape_signature': np.array([-1, n_clases], dtype=np.int32),
+                 'dtype': np.float32}]
+
+    def resize_tensor_input(self, index, shape):
+        self._forma_entrada = np.array(shape, dtype=np.int32)
+
+    def allocate_tensors(self):
+        pass
+
+    def set_tensor(self, index, value):
+        if tuple(value.shape) != tuple(self._forma_entrada):
+            raise ValueError(f"Se esperaba una entrada de forma {tuple(self._forma_entrada)}, "
+                             f"se recibió {tuple(value.shape)}")
+        self._entrada = value
+
+    def invoke(self):
+        self._salida = self.modelo.predict_proba(self._entrada)
+
+    def get_tensor(self, index):
+        return self._entrada.copy() if index == 0 else self._salida.copy()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Autoajuste de la inferencia para la máquina actual: mide los backends
+disponibles (tflite_runtime, TensorFlow Lite completo y NumPy puro), el número
+de hilos y el tamaño de lote, y guarda la configuración más rápida en un
+perfil junto al modelo (<modelo>_perfil.json).
+
+crear_interprete lee el perfil al cargar el modelo. Se guardan dos
+configuraciones: 'interactivo' (menor latencia de una fila, para las apps) y
+'lotes' (más filas por segundo, para las herramientas de puntuación masiva).
+El perfil guarda el hash del modelo y deja de usarse si el modelo cambia.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import time
+
+_avisados = set()
+
+
+def ruta_perfil(model_path):
+    return os.path.splitext(model_path)[0] + '_perfil.json'
+
+
+def huella_modelo(model_path):
+    with open(model_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cargar_perfil(model_path):
+    """Perfil del modelo o None si no existe o es de otra versión del modelo"""
+    ruta = ruta_perfil(model_path)
+    if not os.path.exists(ruta) or not os.path.exists(model_path):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        perfil = json.load(f)
+    if perfil.get('huella') != huella_modelo(model_path):
+        if ruta not in _avisados:
+            _avisados.add(ruta)
+            print(f"⚠️ {ruta} es de otra versión del modelo; se ignora (python autotune.py --si-cambia)")
+        return None
+    return perfil
+
+
+def backends_disponibles(model_path):
+    backends = []
+    if importlib.util.find_spec('tflite_runtime') is not None:
+        backends.append('tflite_runtime')
+    if importlib.util.find_spec('tensorflow') is not None:
+        backends.append('tensorflow')
+    try:
+        from modelo_tflite import RedNumpy
+        RedNumpy.desde_tflite(model_path)
+        backends.append('numpy')
+    except ValueError as e:
+        print(f"   Backend NumPy no disponible para este modelo: {e}")
+    return backends
+
+
+def medir(interpreter, X, segundos=0.3):
+    """Mediana de la latencia por llamada (ms) y filas por segundo"""
+    from prediccion_tea import predecir_probabilidades
+    import numpy as np
+
+    for _ in range(3):
+        predecir_probabilidades(interpreter, X)
+    muestras = []
+    limite = time.perf_counter() + segundos
+    while time.perf_counter() < limite or len(muestras) < 5:
+        inicio = time.perf_counter()
+        predecir_probabilidades(interpreter, X)
+        muestras.append(time.perf_counter() - inicio)
+    mediana = float(np.median(muestras))
+    return mediana * 1000, len(X) / mediana
+
+
+def afinar(model_path, lotes=(1, 256, 4096, 16384), hilos=None, segundos=0.3):
+    """Mide todas las combinaciones y devuelve (perfil, tabla de mediciones)"""
+    import numpy as np
+    import pandas as pd
+    from prediccion_tea import crear_interprete
+
+    cpus = os.cpu_count() or 1
+    if hilos is None:
+        hilos = sorted({1, cpus} | {2 ** k for k in range(1, 6) if 2 ** k < cpus})
+
+    X_max = np.random.default_rng(0).normal(size=(max(lotes), 1)).astype(np.float32)
+    mediciones = []
+    for backend in backends_disponibles(model_path):
+        # El backend NumPy usa los hilos de BLAS; no se eligen aquí
+        for n_hilos in ([None] if backend == 'numpy' else hilos):
+            interpreter = crear_interprete(model_path, num_threads=n_hilos, backend=backend)
+            n_entradas = int(interpreter.get_input_details()[0]['shape'][-1])
+            X = np.ascontiguousarray(np.repeat(X_max, n_entradas, axis=1))
+            for lote in lotes:
+                latencia, filas = medir(interpreter, X[:lote], segundos)
+                mediciones.append({'backend': backend, 'num_threads': n_hilos, 'tamano_lote': lote,
+                                   'latencia_ms': latencia, 'filas_por_segundo': filas})
+                print(f"   {backend:15s} hilos {str(n_hilos):>4} | lote {lote:6d} | "
+                      f"{latencia:9.3f} ms | {filas:12,.0f} filas/s")
+
+    tabla = pd.DataFrame(mediciones)
+    interactivo = tabla[tabla['tamano_lote'] == min(lotes)].sort_values('latencia_ms').iloc[0]
+    lotes_tabla = tabla[tabla['tamano_lote'] > 1] if (tabla['tamano_lote'] > 1).any() else tabla
+    lotes_mejor = lotes_tabla.sort_values('filas_por_segundo', ascending=False).iloc[0]
+
+    def configuracion(fila):
+        return {'backend': fila['backend'],
+                'num_threads': None if pd.isna(fila['num_threads']) else int(fila['num_threads']),
+                'tamano_lote': int(fila['tamano_lote']),
+                'latencia_ms': float(fila['latencia_ms']),
+                'filas_por_segundo': float(fila['filas_por_segundo'])}
+
+    perfil = {
+        'modelo': os.path.basename(model_path),
+        'huella': huella_modelo(model_path),
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'maquina': {'sistema': platform.platform(), 'procesador': platform.processor() or platform.machine(),
+                    'cpus': cpus, 'python': platform.python_version()},
+        'interactivo': configuracion(interactivo),
+        'lotes': configuracion(lotes_mejor)
+    }
+    return perfil, tabla
+
+
+def main():
+    from prediccion_tea import RUTA_MODELO
+
+    parser = argparse.ArgumentParser(description="Elige backend, hilos y lote de inferencia para esta máquina")
+    parser.add_argument('--modelo', default=RUTA_MODELO)
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 256, 4096, 16384])
+    parser.add_argument('--hilos', type=int, nargs='+', default=None,
+                        help="Hilos a probar (por defecto, potencias de 2 hasta el número de núcleos)")
+    parser.add_argument('--segundos', type=float, default=0.3, help="Tiempo de medición por combinación")
+    parser.add_argument('--si-cambia', action='store_true',
+                        help="Solo volver a medir si no hay perfil o el modelo cambió")
+    args = parser.parse_args()
+
+    print("⚙️ Autoajuste de la inferencia")
+    print("=" * 50)
+
+    if args.si_cambia and cargar_perfil(args.modelo) is not None:
+        print(f"✅ {ruta_perfil(args.modelo)} ya corresponde a este modelo; no hace falta volver a medir")
+        return
+
+    perfil, _ = afinar(args.modelo, sorted(set(args.lotes)), args.hilos, args.segundos)
+    with open(ruta_perfil(args.modelo), 'w', encoding='utf-8') as f:
+        json.dump(perfil, f, ensure_ascii=False, indent=2)
+
+    i, l = perfil['interactivo'], perfil['lotes']
+    print(f"\n🏁 Interactivo: {i['backend']} con {i['num_threads']} hilos ({i['latencia_ms']:.3f} ms por fila)")
+    print(f"🏁 Lotes: {l['backend']} con {l['num_threads']} hilos y lote {l['tamano_lote']} "
+          f"({l['filas_por_segundo']:,.0f} filas/s)")
+    print(f"💾 Perfil guardado en {ruta_perfil(args.modelo)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de hiperparámetros de la red neuronal (anchos, profundidad, dropout y
+tamaño de lote) en varios procesos, con parada temprana y poda por tiempo.
+
+Cada candidato se puntúa por su precisión en un conjunto de selección
+(separado del de validación con el que la parada temprana elige los pesos, para
+no sobrestimarla) y por la latencia de su modelo TFLite (una fila y un lote). El resultado es el frente de Pareto:
+los candidatos que ningún otro supera a la vez en precisión y en latencia.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import crear_interprete, predecir_probabilidades
+from datos_tea import RUTA_DATASET, indices_division, guardar_bundle
+from entrenar import (
+    configurar_hilos, learning_rate_escalado, construir_red, crear_pipeline, cargar_matrices
+)
+
+# Espacio de búsqueda
+ANCHOS = [16, 32, 64, 128]
+PROFUNDIDADES = [1, 2, 3]
+DROPOUTS = [0.0, 0.1, 0.2, 0.3]
+LOTES = [256, 1024, 4096]
+
+# Estado de cada proceso trabajador (se carga una sola vez por proceso)
+_trabajador = {}
+
+
+def muestrear_candidatos(n_candidatos, semilla=42):
+    """
+    Candidatos aleatorios sin repetir. Las capas son decrecientes (como 32→16
+    en el notebook) y el candidato 0 es siempre la arquitectura del notebook.
+    """
+    rng = np.random.default_rng(semilla)
+    candidatos = [{'capas': (32, 16), 'dropout': 0.2, 'lote': 1024}]
+    vistos = {((32, 16), 0.2, 1024)}
+    intentos = 0
+    while len(candidatos) < n_candidatos and intentos < 100 * n_candidatos:
+        intentos += 1
+        profundidad = int(rng.choice(PROFUNDIDADES))
+        capas = tuple(sorted(rng.choice(ANCHOS, profundidad).tolist(), reverse=True))
+        clave = (capas, float(rng.choice(DROPOUTS)), int(rng.choice(LOTES)))
+        if clave not in vistos:
+            vistos.add(clave)
+            candidatos.append(dict(zip(('capas', 'dropout', 'lote'), clave)))
+    return [{'id': i, **c} for i, c in enumerate(candidatos)]
+
+
+def _iniciar_trabajador(carpeta_datos, carpeta_modelos, epocas, paciencia, tiempo_maximo, semilla):
+    # Un hilo por proceso: el paralelismo viene de entrenar varios candidatos a la vez
+    configurar_hilos(1, 1)
+    _trabajador.update(
+        X_fit=np.load(os.path.join(carpeta_datos, 'X_fit.npy'), mmap_mode='r'),
+        y_fit=np.load(os.path.join(carpeta_datos, 'y_fit.npy')),
+        X_val=np.load(os.path.join(carpeta_datos, 'X_val.npy'), mmap_mode='r'),
+        y_val=np.load(os.path.join(carpeta_datos, 'y_val.npy')),
+        X_sel=np.load(os.path.join(carpeta_datos, 'X_sel.npy'), mmap_mode='r'),
+        y_sel=np.load(os.path.join(carpeta_datos, 'y_sel.npy')),
+        carpeta_modelos=carpeta_modelos,
+        epocas=epocas,
+        paciencia=paciencia,
+        tiempo_maximo=tiempo_maximo,
+        semilla=semilla
+    )
+
+
+def _entrenar_candidato(candidato):
+    import tensorflow as tf
+    w = _trabajador
+    tf.keras.utils.set_random_seed(w['semilla'] + candidato['id'])
+
+    class PodaPorTiempo(tf.keras.callbacks.Callback):
+        """Detiene el candidato al terminar la época en la que supera el tiempo máximo"""
+        podado = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            if time.perf_counter() - inicio > w['tiempo_maximo']:
+                self.podado = True
+                self.model.stop_training = True
+
+    model = construir_red(w['X_fit'].shape[1], int(w['y_fit'].max()) + 1, candidato['capas'],
+                          candidato['dropout'], learning_rate_escalado(candidato['lote']))
+    poda = PodaPorTiempo()
+    parada = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=w['paciencia'],
+                                              restore_best_weights=True)
+
+    inicio = time.perf_counter()
+    historia = model.fit(crear_pipeline(np.asarray(w['X_fit']), w['y_fit'], candidato['lote'], barajar=True),
+                         validation_data=crear_pipeline(np.asarray(w['X_val']), w['y_val'], 8192),
+                         epochs=w['epocas'], callbacks=[parada, poda], verbose=0)
+    segundos = time.perf_counter() - inicio
+    _, precision_val = model.evaluate(crear_pipeline(np.asarray(w['X_val']), w['y_val'], 8192), verbose=0)
+    _, precision_sel = model.evaluate(crear_pipeline(np.asarray(w['X_sel']), w['y_sel'], 8192), verbose=0)
+
+    ruta = os.path.join(w['carpeta_modelos'], f"candidato_{candidato['id']:03d}.tflite")
+    with open(ruta, 'wb') as f:
+        f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+    return {
+        **candidato,
+        'capas': '-'.join(map(str, candidato['capas'])),
+        'parametros': model.count_params(),
+        'epocas': len(historia.history['loss']),
+        'segundos': segundos,
+        'podado': poda.podado,
+        'val_accuracy': float(precision_val),
+        'sel_accuracy': float(precision_sel),
+        'modelo': ruta
+    }
+
+
+def medir_latencia(ruta_modelo, X, repeticiones=200, tamano_lote=1024):
+    """
+    Mediana de la latencia (ms) de una fila y de un lote, con un solo hilo.
+    Se mide en serie desde el proceso principal para no competir por CPU.
+    """
+    interpreter = crear_interprete(ruta_modelo, num_threads=1)
+    tiempos = {}
+    for nombre, entrada, n in (('latencia_1_ms', X[:1], repeticiones),
+                               ('latencia_lote_ms', X[:tamano_lote], max(repeticiones // 10, 5))):
+        for _ in range(5):
+            predecir_probabilidades(interpreter, entrada)
+        muestras = []
+        for _ in range(n):
+            inicio = time.perf_counter()
+            predecir_probabilidades(interpreter, entrada)
+            muestras.append(time.perf_counter() - inicio)
+        tiempos[nombre] = float(np.median(muestras) * 1000)
+    return tiempos
+
+
+def frente_pareto(resultados, maximizar=('sel_accuracy',), minimizar=('latencia_1_ms', 'latencia_lote_ms')):
+    """Máscara de los candidatos no dominados"""
+    valores = np.column_stack([resultados[c] for c in maximizar] + [-resultados[c] for c in minimizar])
+    no_peor = (valores[:, None, :] >= valores[None, :, :]).all(axis=2)
+    mejor = (valores[:, None, :] > valores[None, :, :]).any(axis=2)
+    dominado = (no_peor & mejor).any(axis=0)
+    return ~dominado
+
+
+def buscar(ruta_dataset=RUTA_DATASET, n_candidatos=16, procesos=None, epocas=30, paciencia=3,
+           tiempo_maximo=300.0, validacion=0.2, seleccion=0.1, carpeta='busqueda_hiperparametros', semilla=42):
+    """
+    Entrena los candidatos en paralelo y devuelve la tabla de resultados con la
+    columna 'pareto'. Del entrenamiento se reservan `validacion` (parada
+    temprana) y `seleccion` (precisión con la que se comparan los candidatos).
+    """
+    X, y, preprocessor, clases = cargar_matrices(ruta_dataset)
+    idx_train, _ = indices_division(len(y))
+    X_train, y_train = X[idx_train], y[idx_train]
+    n_sel = len(X_train) - int(len(X_train) * seleccion)
+    n_fit = n_sel - int(len(X_train) * validacion)
+
+    os.makedirs(carpeta, exist_ok=True)
+    guardar_bundle(preprocessor, clases, os.path.join(carpeta, 'modelo_autismo_bundle.json'))
+
+    candidatos = muestrear_candidatos(n_candidatos, semilla)
+    resultados = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for nombre, datos in (('X_fit', X_train[:n_fit]), ('y_fit', y_train[:n_fit]),
+                              ('X_val', X_train[n_fit:n_sel]), ('y_val', y_train[n_fit:n_sel]),
+                              ('X_sel', X_train[n_sel:]), ('y_sel', y_train[n_sel:])):
+            np.save(os.path.join(tmp, f'{nombre}.npy'), datos)
+
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=mp.get_context('spawn'),
+                                 initializer=_iniciar_trabajador,
+                                 initargs=(tmp, carpeta, epocas, paciencia, tiempo_maximo, semilla)) as pool:
+            futuros = [pool.submit(_entrenar_candidato, c) for c in candidatos]
+            for futuro in as_completed(futuros):
+                r = futuro.result()
+                resultados.append(r)
+                print(f"   [{len(resultados):2d}/{len(candidatos)}] capas {r['capas']:>10} | dropout {r['dropout']:.1f} "
+                      f"| lote {r['lote']:4d} | {r['epocas']:2d} épocas en {r['segundos']:6.1f} s"
+                      f"{' (podado)' if r['podado'] else ''} | val_accuracy {r['val_accuracy']:.4f} "
+                      f"| sel_accuracy {r['sel_accuracy']:.4f}")
+
+    X_latencia = np.ascontiguousarray(X_train[n_sel:n_sel + 1024])
+    for r in resultados:
+        r.update(medir_latencia(r['modelo'], X_latencia))
+
+    tabla = pd.DataFrame(resultados).sort_values('id').reset_index(drop=True)
+    tabla['pareto'] = frente_pareto(tabla)
+    tabla.to_csv(os.path.join(carpeta, 'resultados.csv'), index=False)
+    return tabla
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros con presupuesto de latencia")
+    parser.add_argument('--dataset', default=RUTA_DATASET)
+    parser.add_argument('--candidatos', type=int, default=16)
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos trabajadores (por defecto, todos los núcleos)")
+    parser.add_argument('--epocas', type=int, default=30)
+    parser.add_argument('--paciencia', type=int, default=3, help="Épocas sin mejora de val_loss antes de parar")
+    parser.add_argument('--tiempo-maximo', type=float, default=300.0, help="Segundos de entrenamiento por candidato")
+    parser.add_argument('--presupuesto-ms', type=float, default=None, help="Latencia máxima por petición (una fila)")
+    parser.add_argument('--carpeta', default='busqueda_hiperparametros', help="Modelos candidatos, bundle y resultados")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    print("🔎 Búsqueda de hiperparámetros")
+    print("=" * 50)
+
+    inicio = time.perf_counter()
+    tabla = buscar(args.dataset, args.candidatos, args.procesos, args.epocas,
+                   args.paciencia, args.tiempo_maximo, carpeta=args.carpeta, semilla=args.semilla)
+
+    columnas = ['id', 'capas', 'dropout', 'lote', 'parametros', 'val_accuracy', 'sel_accuracy',
+                'latencia_1_ms', 'latencia_lote_ms']
+    print("\n🏆 Frente de Pareto (precisión vs. latencia):\n")
+    print(tabla.loc[tabla['pareto'], columnas].sort_values('latencia_1_ms').round(4).to_string(index=False))
+
+    if args.presupuesto_ms is not None:
+        dentro = tabla[tabla['latencia_1_ms'] <= args.presupuesto_ms]
+        if dentro.empty:
+            print(f"\n⚠️ Ningún candidato cumple {args.presupuesto_ms} ms por petición")
+        else:
+            mejor = dentro.loc[dentro['sel_accuracy'].idxmax()]
+            print(f"\n✅ Mejor dentro de {args.presupuesto_ms} ms: candidato {mejor['id']} "
+                  f"({mejor['capas']}, sel_accuracy {mejor['sel_accuracy']:.4f}, "
+                  f"{mejor['latencia_1_ms']:.3f} ms) → {mejor['modelo']}")
+
+    print(f"\n💾 Resultados en {os.path.join(args.carpeta, 'resultados.csv')} "
+          f"({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Caché en disco del dataset ya preprocesado (matriz one-hot/escalada, etiquetas
+codificadas y preprocessor ajustado).
+
+La clave es un hash del contenido del CSV y de la configuración del
+preprocesamiento: si cualquiera de los dos cambia, la entrada anterior deja de
+usarse. Las matrices se guardan como .npy y se abren con mmap, así que una
+entrada ya calculada se carga al instante. Cuando la caché supera el límite de
+tamaño se borran las entradas usadas hace más tiempo.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from prediccion_tea import COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS
+from datos_tea import (
+    RUTA_DATASET, cargar_dataset, crear_preprocesador, ajustar_preprocesamiento,
+    codificar, guardar_bundle, cargar_bundle
+)
+
+CARPETA_CACHE = '.cache_preprocesado'
+LIMITE_CACHE_BYTES = 2 * 1024 ** 3
+
+# Cambiar si cambia el formato de las entradas
+VERSION_CACHE = 1
+
+
+def configuracion_preprocesado():
+    """Todo lo que determina el resultado del preprocesamiento, aparte de los datos"""
+    parametros = crear_preprocesador().get_params(deep=True)
+    return {
+        'version': VERSION_CACHE,
+        'categoricas': COLUMNAS_CATEGORICAS,
+        'numericas': COLUMNAS_NUMERICAS,
+        'preprocesador': {k: v for k, v in sorted(parametros.items())
+                          if v is None or isinstance(v, (str, int, float, bool))}
+    }
+
+
+def clave_cache(ruta_dataset, tamano_bloque=1 << 20):
+    """Hash SHA-256 del contenido del CSV y de la configuración"""
+    h = hashlib.sha256(json.dumps(configuracion_preprocesado(), sort_keys=True).encode())
+    with open(ruta_dataset, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()[:32]
+
+
+def _tamano(carpeta):
+    return sum(e.stat().st_size for e in os.scandir(carpeta) if e.is_file())
+
+
+def _desalojar(carpeta, limite_bytes, conservar):
+    """Borra las entradas usadas hace más tiempo hasta quedar dentro del límite"""
+    entradas = [e for e in os.scandir(carpeta) if e.is_dir() and '.tmp' not in e.name]
+    entradas.sort(key=lambda e: e.stat().st_mtime)
+    total = sum(_tamano(e.path) for e in entradas)
+    for entrada in entradas:
+        if total <= limite_bytes:
+            break
+        if entrada.name != conservar:
+            total -= _tamano(entrada.path)
+            shutil.rmtree(entrada.path, ignore_errors=True)
+
+
+def obtener_preprocesado(ruta_dataset=RUTA_DATASET, carpeta=CARPETA_CACHE, limite_bytes=LIMITE_CACHE_BYTES):
+    """
+    Devuelve (X, y, preprocessor, clases, acierto). X es float32 de solo
+    lectura (mmap), y son las etiquetas codificadas en el orden de clases y
+    acierto indica si venía de la caché.
+    """
+    if not os.path.exists(ruta_dataset):
+        cargar_dataset(ruta_dataset)
+
+    clave = clave_cache(ruta_dataset)
+    destino = os.path.join(carpeta, clave)
+    acierto = os.path.isdir(destino)
+
+    if not acierto:
+        df = cargar_dataset(ruta_dataset)
+        preprocessor, clases = ajustar_preprocesamiento(df)
+        X, y = codificar(df, preprocessor, clases)
+
+        # Se escribe en una carpeta temporal y se renombra: nunca hay entradas a medias
+        temporal = f"{destino}.tmp{os.getpid()}"
+        os.makedirs(temporal, exist_ok=True)
+        np.save(os.path.join(temporal, 'X.npy'), X)
+        np.save(os.path.join(temporal, 'y.npy'), y)
+        guardar_bundle(preprocessor, clases, os.path.join(temporal, 'bundle.json'))
+        try:
+            os.rename(temporal, destino)
+        except OSError:
+            # Otro proceso creó la misma entrada mientras tanto
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    # La fecha de modificación de la carpeta marca el último uso (para el desalojo)
+    os.utime(destino, (time.time(), time.time()))
+    _desalojar(carpeta, limite_bytes, conservar=clave)
+
+    preprocessor, clases = cargar_bundle(os.path.join(destino, 'bundle.json'))
+    X = np.load(os.path.join(destino, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(destino, 'y.npy'))
+    return X, y, preprocessor, clases, acierto
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Captura y repetición del tráfico real de predicciones.
+
+Captura: la app Streamlit llama a CapturaTrafico.capturar(datos_usuario) al
+recibir una petición si la variable de entorno TEA_CAPTURA indica el archivo.
+Se guarda el instante de llegada y la clave uint64 del paciente
+(codec_paciente: edad y las 15 respuestas; el puntaje de riesgo se
+recalcula), sin identificadores: 16 bytes por petición en un archivo de solo
+anexado escrito por un hilo en segundo plano. Los frontends tkinter, PyQt y
+Kivy no capturan: envían al modelo valores de prueba o vectores de
+características ya codificados, no las respuestas de un paciente. También se
+puede construir una captura a partir del registro de auditoría.
+
+Repetición: vuelve a lanzar las peticiones contra el motor de predicción
+local (el mismo camino que la app: DataFrame, preprocessor e intérprete) o
+contra la app en marcha (sesiones sin navegador de prueba_carga), con los
+tiempos originales, acelerados (--velocidad) o con una tasa máxima, y con N
+peticiones a la vez. La latencia se mide desde el instante programado, así que
+incluye la espera si el motor no da abasto.
+"""
+
+import argparse
+import atexit
+import concurrent.futures
+import contextlib
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from codec_paciente import DESPLAZAMIENTOS, empaquetar_paciente, desempaquetar_paciente
+
+VARIABLE_ENTORNO = 'TEA_CAPTURA'
+
+PETICION = np.dtype([('marca_us', '<i8'), ('clave', '<u8')])
+
+# Cabecera: firma, tamaño de la petición y número de variables codificadas
+FIRMA = b'TEACAP01'
+CABECERA = struct.Struct('<8sII')
+N_VARIABLES = len(DESPLAZAMIENTOS) + 1
+
+# Variable del dataset -> etiqueta del widget en la evaluación clínica de la app
+CAMPOS_FORMULARIO = {
+    'Edad (meses)': "Edad (en meses)",
+    'Sexo': "Sexo",
+    'Lenguaje': "Nivel de lenguaje",
+    'Comunicación no verbal': "Comunicación no verbal",
+    'Contacto visual': "Contacto visual",
+    'Respuesta al nombre': "Respuesta al nombre",
+    'Interacción social': "Interacción social",
+    'Estereotipias': "Estereotipias",
+    'Intereses restringidos': "Intereses restringidos",
+    'Regulación emocional': "Regulación emocional",
+    'TDAH': "TDAH",
+    'Discapacidad intelectual': "Discapacidad intelectual",
+    'Hipersensibilidad sensorial': "Hipersensibilidad sensorial",
+    'Trastornos del sueño': "Trastornos del sueño",
+    'Alimentación selectiva': "Alimentación selectiva",
+    'Antecedentes familiares': "Antecedentes familiares"
+}
+
+
+def leer_captura(ruta):
+    """Peticiones de un archivo de captura como array estructurado mapeado en memoria"""
+    with open(ruta, 'rb') as f:
+        firma, tamano, n_variables = CABECERA.unpack(f.read(CABECERA.size))
+    if firma != FIRMA or tamano != PETICION.itemsize or n_variables != N_VARIABLES:
+        raise ValueError(f"{ruta} no es una captura de tráfico compatible")
+    n = (os.path.getsize(ruta) - CABECERA.size) // PETICION.itemsize
+    if n == 0:
+        return np.empty(0, dtype=PETICION)
+    return np.memmap(ruta, dtype=PETICION, mode='r', offset=CABECERA.size, shape=(n,))
+
+
+def escribir_captura(ruta, peticiones):
+    with open(ruta, 'wb') as f:
+        f.write(CABECERA.pack(FIRMA, PETICION.itemsize, N_VARIABLES))
+        f.write(np.ascontiguousarray(peticiones, dtype=PETICION).tobytes())
+
+
+class CapturaTrafico:
+    def __init__(self, ruta, tamano_cola=10000, peticiones_por_tanda=1024):
+        self.ruta = ruta
+        self.peticiones_por_tanda = peticiones_por_tanda
+        self.cola = queue.Queue(maxsize=tamano_cola)
+        self.capturadas = 0
+        self.descartadas = 0
+        self.fallidas = 0
+
+        self._archivo = self._abrir()
+        self._hilo = threading.Thread(target=self._escribir, name='captura_trafico', daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def capturar(self, datos_usuario):
+        """Encola la petición (diccionario de la evaluación) sin bloquear"""
+        try:
+            self.cola.put_nowait((time.time_ns() // 1000, empaquetar_paciente(datos_usuario)))
+        except queue.Full:
+            self.descartadas += 1
+
+    def cerrar(self):
+        """Escribe lo pendiente y cierra el archivo"""
+        if self._hilo.is_alive():
+            self.cola.put(None)
+            self._hilo.join()
+
+    def _abrir(self):
+        if os.path.exists(self.ruta) and os.path.getsize(self.ruta) >= CABECERA.size:
+            n = len(leer_captura(self.ruta))
+            archivo = open(self.ruta, 'r+b')
+            # Descarta una petición a medias (p. ej. tras un corte o un disco lleno)
+            archivo.truncate(CABECERA.size + n * PETICION.itemsize)
+            archivo.seek(0, os.SEEK_END)
+        else:
+            archivo = open(self.ruta, 'wb')
+            archivo.write(CABECERA.pack(FIRMA, PETICION.itemsize, N_VARIABLES))
+        return archivo
+
+    def _escribir(self):
+        terminar = False
+        while not terminar:
+            tanda = [self.cola.get()]
+            while len(tanda) < self.peticiones_por_tanda:
+                try:
+                    tanda.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+            if tanda[-1] is None:
+                terminar = True
+                tanda.pop()
+            if not tanda:
+                continue
+            try:
+                if self._archivo is None:
+                    self._archivo = self._abrir()
+                self._archivo.write(np.array(tanda, dtype=PETICION).tobytes())
+                self._archivo.flush()
+                self.capturadas += len(tanda)
+            except OSError as e:
+                # P. ej. disco lleno: se pierde la tanda, no el hilo; se reabre en la siguiente
+                self.fallidas += len(tanda)
+                print(f"⚠️ No se pudieron capturar {len(tanda)} peticiones en {self.ruta}: {e}")
+                try:
+                    self._archivo.close()
+                except (OSError, AttributeError):
+                    pass
+                self._archivo = None
+        if self._archivo is not None:
+            self._archivo.close()
+
+
+def captura_desde_entorno():
+    """CapturaTrafico en el archivo de TEA_CAPTURA, o None si no está definida"""
+    ruta = os.environ.get(VARIABLE_ENTORNO)
+    return CapturaTrafico(ruta) if ruta else None
+
+
+def desde_auditoria(carpeta, ruta):
+    """Construye una captura con las predicciones del registro de auditoría, por orden de llegada"""
+    from registro_auditoria import archivos_registro, leer_registros
+
+    bloques = []
+    for archivo in archivos_registro(carpeta):
+        registros = leer_registros(archivo)
+        bloque = np.empty(len(registros), dtype=PETICION)
+        bloque['marca_us'] = registros['marca_us']
+        bloque['clave'] = registros['clave']
+        bloques.append(bloque)
+    peticiones = np.concatenate(bloques) if bloques else np.empty(0, dtype=PETICION)
+    peticiones = peticiones[np.argsort(peticiones['marca_us'], kind='stable')]
+    escribir_captura(ruta, peticiones)
+    return len(peticiones)
+
+
+def programar(marcas_us, velocidad=1.0, tasa_maxima=None):
+    """
+    Instante (s desde el inicio) en que se lanza cada petición: los tiempos
+    originales divididos por `velocidad` (0 = sin esperas) y, con
+    `tasa_maxima`, separadas al menos 1 / tasa_maxima segundos.
+    """
+    marcas = np.asarray(marcas_us, dtype=np.int64)
+    if len(marcas) == 0:
+        return np.empty(0)
+    if velocidad:
+        instantes = (marcas - marcas[0]) / 1e6 / velocidad
+    else:
+        instantes = np.zeros(len(marcas))
+    if tasa_maxima:
+        paso = np.arange(len(marcas)) / tasa_maxima
+        # Con separación mínima: cada petición, no antes que la anterior más el paso
+        instantes = np.maximum.accumulate(instantes - paso) + paso
+    return instantes
+
+
+class MotorLocal:
+    """Camino de predicción de la app en este proceso, con un intérprete por hilo"""
+
+    nombre = 'local'
+
+    def __init__(self, model_path=None, ruta_bundle=None):
+        from prediccion_tea import RUTA_MODELO
+        from datos_tea import RUTA_BUNDLE, cargar_bundle
+
+        self.model_path = model_path or RUTA_MODELO
+        self.preprocessor, _ = cargar_bundle(ruta_bundle or RUTA_BUNDLE)
+        self._local = threading.local()
+
+    def preparar(self):
+        """Crea el intérprete del hilo actual (el intérprete TFLite no admite llamadas concurrentes)"""
+        from prediccion_tea import crear_interprete
+
+        if not hasattr(self._local, 'interpreter'):
+            self._local.interpreter = crear_interprete(self.model_path, uso='interactivo')
+
+    def predecir(self, clave):
+        from prediccion_tea import ETIQUETAS, calcular_puntaje_riesgo, predecir_probabilidades
+
+        self.preparar()
+        datos = desempaquetar_paciente(clave)
+        datos['Puntaje riesgo'] = calcular_puntaje_riesgo(datos)
+        X = self.preprocessor.transform(pd.DataFrame([datos]))
+        probabilidades = predecir_probabilidades(self._local.interpreter, X)
+        return ETIQUETAS[int(np.argmax(probabilidades))]
+
+    def cerrar(self):
+        pass
+
+
+class MotorApp:
+    """La app Streamlit en marcha, con una sesión sin navegador por hilo"""
+
+    nombre = 'app'
+
+    def __init__(self, url, tiempo_maximo=60.0):
+        self.url = url
+        self.tiempo_maximo = tiempo_maximo
+        self._local = threading.local()
+        self._conexiones = contextlib.ExitStack()
+
+    def preparar(self):
+        """Abre la sesión del hilo actual y carga la app"""
+        from prueba_carga import SesionStreamlit, conectar
+
+        if not hasattr(self._local, 'sesion'):
+            conexion = self._conexiones.enter_context(conectar(self.url, self.tiempo_maximo))
+            self._local.sesion = SesionStreamlit(conexion, self.tiempo_maximo)
+            self._local.sesion.rerun()
+
+    def predecir(self, clave):
+        from prueba_carga import BOTON_DIAGNOSTICO
+
+        self.preparar()
+        sesion = self._local.sesion
+        for variable, valor in desempaquetar_paciente(clave).items():
+            sesion.elegir(CAMPOS_FORMULARIO[variable], float(valor) if variable == 'Edad (meses)' else valor)
+        sesion.rerun(disparar=next(e for e in sesion.widgets if BOTON_DIAGNOSTICO in e))
+        return sesion.resultado()
+
+    def cerrar(self):
+        self._conexiones.close()
+
+
+def repetir(peticiones, motor, velocidad=1.0, tasa_maxima=None, concurrencia=4):
+    """
+    Lanza las peticiones según programar() con como mucho `concurrencia` a la
+    vez. Devuelve un DataFrame por petición (instante programado, retraso al
+    empezar, latencia desde el instante programado, tiempo de servicio y
+    resultado o error) y los segundos que duró la repetición.
+    """
+    instantes = programar(peticiones['marca_us'], velocidad, tasa_maxima)
+    claves = np.asarray(peticiones['clave'])
+    filas = [None] * len(claves)
+
+    def atender(i, origen):
+        inicio = time.perf_counter()
+        try:
+            resultado = motor.predecir(int(claves[i]))
+        except Exception as e:
+            resultado = f'error: {type(e).__name__}'
+        fin = time.perf_counter()
+        programado = origen + instantes[i]
+        filas[i] = (i, instantes[i], (inicio - programado) * 1000, (fin - programado) * 1000,
+                    (fin - inicio) * 1000, resultado)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='repeticion') as ejecutor:
+        # Cada hilo prepara su intérprete o sesión antes de empezar a medir
+        todos = threading.Barrier(concurrencia)
+        for futuro in [ejecutor.submit(lambda: (motor.preparar(), todos.wait())) for _ in range(concurrencia)]:
+            futuro.result()
+
+        origen = time.perf_counter()
+        for i, instante in enumerate(instantes):
+            espera = origen + instante - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            ejecutor.submit(atender, i, origen)
+    segundos = time.perf_counter() - origen
+
+    return pd.DataFrame(filas, columns=['peticion', 'programado_s', 'retraso_ms', 'latencia_ms',
+                                        'servicio_ms', 'resultado']), segundos
+
+
+def resumir_captura(peticiones):
+    """Periodo, tasa media y sesgo de la mezcla de respuestas"""
+    from codec_paciente import desempaquetar_df
+
+    n = len(peticiones)
+    duracion = (int(peticiones['marca_us'][-1]) - int(peticiones['marca_us'][0])) / 1e6 if n > 1 else 0.0
+    claves, conteos = np.unique(np.asarray(peticiones['clave']), return_counts=True)
+    datos = desempaquetar_df(np.asarray(peticiones['clave']), incluir_puntaje=False)
+    mas_frecuentes = {}
+    for col in datos.columns.drop('Edad (meses)'):
+        frecuencias = datos[col].value_counts(normalize=True)
+        mas_frecuentes[col] = (frecuencias.index[0], float(frecuencias.iloc[0]))
+    return {
+        'peticiones': n,
+        'segundos': duracion,
+        'por_segundo': n / duracion if duracion else float('nan'),
+        'pacientes_distintos': len(claves),
+        'top10_pct': float(np.sort(conteos)[::-1][:10].sum() / n * 100) if n else 0.0,
+        'mas_frecuentes': mas_frecuentes
+    }
+
+
+def resumir_repeticion(filas, duracion):
+    correctas = filas[~filas['resultado'].str.startswith('error')]
+    return {
+        'peticiones': len(filas),
+        'errores': int(len(filas) - len(correctas)),
+        'segundos': duracion,
+        'por_segundo': len(filas) / duracion if duracion else float('nan'),
+        'resultados': {k: int(v) for k, v in filas['resultado'].value_counts().items()},
+        **{f'latencia_p{p}_ms': float(np.percentile(filas['latencia_ms'], p)) for p in (50, 90, 99)},
+        **{f'servicio_p{p}_ms': float(np.percentile(filas['servicio_ms'], p)) for p in (50, 99)},
+        'retraso_p99_ms': float(np.percentile(filas['retraso_ms'], 99))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repite una captura de tráfico real contra un motor de predicción")
+    parser.add_argument('captura', help="Archivo de captura (TEA_CAPTURA=... al lanzar la app)")
+    parser.add_argument('--desde-auditoria', metavar='CARPETA', default=None,
+                        help="Crear la captura a partir del registro de auditoría de esa carpeta")
+    parser.add_argument('--motor', choices=['local', 'app'], default='local',
+                        help="Motor en este proceso o la app Streamlit en --url")
+    parser.add_argument('--url', default='http://localhost:8501')
+    parser.add_argument('--modelo', default=None)
+    parser.add_argument('--bundle', default=None)
+    parser.add_argument('--velocidad', type=float, default=1.0,
+                        help="Multiplicador de los tiempos originales (0 = sin esperas)")
+    parser.add_argument('--tasa-maxima', type=float, default=None, help="Peticiones por segundo como máximo")
+    parser.add_argument('--concurrencia', type=int, default=4, help="Peticiones en curso a la vez")
+    parser.add_argument('--limite', type=int, default=None, help="Repetir solo las primeras N peticiones")
+    parser.add_argument('--solo-resumen', action='store_true', help="Mostrar la mezcla de la captura sin repetirla")
+    parser.add_argument('--salida', default=None, help="Informe JSON de la repetición")
+    args = parser.parse_args()
+
+    print("🔁 Captura y repetición de tráfico")
+    print("=" * 50)
+
+    if args.desde_auditoria:
+        n = desde_auditoria(args.desde_auditoria, args.captura)
+        print(f"💾 {n:,} peticiones del registro de auditoría guardadas en {args.captura}")
+
+    peticiones = leer_captura(args.captura)[:args.limite]
+    if len(peticiones) == 0:
+        print(f"⚠️ {args.captura} no tiene peticiones")
+        return
+    captura = resumir_captura(peticiones)
+    print(f"   Peticiones: {captura['peticiones']:,} en {captura['segundos']:.1f} s "
+          f"({captura['por_segundo']:.2f}/s)")
+    print(f"   Pacientes distintos: {captura['pacientes_distintos']:,} | "
+          f"las 10 combinaciones más repetidas: {captura['top10_pct']:.1f}%")
+    print("   Respuesta más frecuente por variable:")
+    for col, (opcion, fraccion) in captura['mas_frecuentes'].items():
+        print(f"      {col:28s} {opcion:28s} {fraccion:6.1%}")
+    if args.solo_resumen:
+        return
+
+    motor = MotorLocal(args.modelo, args.bundle) if args.motor == 'local' else MotorApp(args.url)
+    ritmo = f"x{args.velocidad:g}" if args.velocidad else "sin esperas"
+    if args.tasa_maxima:
+        ritmo += f", máximo {args.tasa_maxima:g}/s"
+    print(f"\n▶️ Repitiendo contra el motor '{motor.nombre}' ({ritmo}, concurrencia {args.concurrencia})")
+    try:
+        filas, segundos = repetir(peticiones, motor, args.velocidad, args.tasa_maxima, args.concurrencia)
+    finally:
+        motor.cerrar()
+    informe = resumir_repeticion(filas, segundos)
+
+    print(f"   {informe['peticiones']:,} peticiones en {informe['segundos']:.1f} s "
+          f"({informe['por_segundo']:.1f}/s) | errores: {informe['errores']:,}")
+    print(f"   Latencia: p50 {informe['latencia_p50_ms']:.1f} ms | p90 {informe['latencia_p90_ms']:.1f} ms | "
+          f"p99 {informe['latencia_p99_ms']:.1f} ms")
+    print(f"   Servicio: p50 {informe['servicio_p50_ms']:.1f} ms | p99 {informe['servicio_p99_ms']:.1f} ms | "
+          f"retraso p99 al empezar {informe['retraso_p99_ms']:.1f} ms")
+    print(f"   Resultados: {informe['resultados']}")
+
+    if args.salida:
+        informe['captura'] = {k: v for k, v in captura.items() if k != 'mas_frecuentes'}
+        informe['configuracion'] = {'motor': motor.nombre, 'velocidad': args.velocidad,
+                                    'tasa_maxima': args.tasa_maxima, 'concurrencia': args.concurrencia}
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"💾 Informe guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Codificación compacta de un paciente en un entero uint64.
+
+Cada variable categórica tiene como máximo 4 opciones (2 bits) y la edad cabe
+en 6 bits, así que un registro completo ocupa 36 bits:
+
+    bits 0-5    Edad (meses)
+    bits 6-35   15 variables categóricas, 2 bits cada una, en el orden de
+                OPCIONES_VARIABLES (índice de la opción dentro de su lista)
+
+El 'Puntaje riesgo' no se guarda porque se deriva de las respuestas.
+La clave sirve como clave de caché, de deduplicación y formato de almacenamiento.
+"""
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS, calcular_puntaje_riesgo_lote
+
+BITS_EDAD = 6
+BITS_CATEGORIA = 2
+BITS_TOTALES = BITS_EDAD + BITS_CATEGORIA * len(COLUMNAS_CATEGORICAS)
+
+MASCARA_EDAD = (1 << BITS_EDAD) - 1
+MASCARA_CATEGORIA = (1 << BITS_CATEGORIA) - 1
+
+# Desplazamiento de cada variable categórica dentro de la clave
+DESPLAZAMIENTOS = {
+    col: BITS_EDAD + BITS_CATEGORIA * j for j, col in enumerate(COLUMNAS_CATEGORICAS)
+}
+
+# Índice de cada opción para la ruta rápida desde el formulario (texto)
+_INDICE_OPCION = {
+    col: {opcion: i for i, opcion in enumerate(opciones)}
+    for col, opciones in OPCIONES_VARIABLES.items()
+}
+
+
+def empaquetar(edades, codigos):
+    """
+    Empaqueta edades (n,) e índices de opción (n, 15) en claves uint64 (n,).
+    """
+    edades = np.asarray(edades, dtype=np.int64)
+    codigos = np.asarray(codigos, dtype=np.int64).reshape(len(edades), len(COLUMNAS_CATEGORICAS))
+
+    if edades.size and (edades.min() < 0 or edades.max() > MASCARA_EDAD):
+        raise ValueError(f"La edad debe estar entre 0 y {MASCARA_EDAD} meses")
+    limites = np.array([len(OPCIONES_VARIABLES[col]) for col in COLUMNAS_CATEGORICAS])
+    if codigos.size and ((codigos < 0) | (codigos >= limites)).any():
+        raise ValueError("Índice de opción fuera de rango")
+
+    desplazamientos = np.array([DESPLAZAMIENTOS[col] for col in COLUMNAS_CATEGORICAS], dtype=np.uint64)
+    claves = edades.astype(np.uint64)
+    claves |= np.bitwise_or.reduce(codigos.astype(np.uint64) << desplazamientos, axis=1)
+    return claves
+
+
+def desempaquetar(claves):
+    """Operación inversa de empaquetar: devuelve (edades, codigos)"""
+    claves = np.asarray(claves, dtype=np.uint64)
+    edades = (claves & np.uint64(MASCARA_EDAD)).astype(np.int64)
+    desplazamientos = np.array([DESPLAZAMIENTOS[col] for col in COLUMNAS_CATEGORICAS], dtype=np.uint64)
+    codigos = ((claves[:, None] >> desplazamientos) & np.uint64(MASCARA_CATEGORIA)).astype(np.int64)
+    return edades, codigos
+
+
+def codigos_desde_df(df):
+    """Índices de opción (n, 15) a partir de las columnas de texto de un DataFrame"""
+    codigos = np.empty((len(df), len(COLUMNAS_CATEGORICAS)), dtype=np.int64)
+    for j, col in enumerate(COLUMNAS_CATEGORICAS):
+        # factorize agrupa los textos repetidos; solo se traducen los valores distintos.
+        # El -1 final recoge los nulos (código -1 de factorize)
+        codigos_col, valores = pd.factorize(df[col])
+        traduccion = np.array([_INDICE_OPCION[col].get(v, -1) for v in valores] + [-1])
+        codigos[:, j] = traduccion[codigos_col]
+        if (codigos[:, j] < 0).any():
+            desconocidos = sorted({str(v) for v in df[col][codigos[:, j] < 0]})
+            raise ValueError(f"Valores no válidos en '{col}': {desconocidos}")
+    return codigos
+
+
+def empaquetar_df(df):
+    """Claves uint64 de todas las filas de un DataFrame con las variables de entrada"""
+    return empaquetar(df['Edad (meses)'].to_numpy(), codigos_desde_df(df))
+
+
+def desempaquetar_df(claves, incluir_puntaje=True):
+    """DataFrame con las variables en texto (y el puntaje de riesgo recalculado)"""
+    edades, codigos = desempaquetar(claves)
+    datos = {'Edad (meses)': edades}
+    for j, col in enumerate(COLUMNAS_CATEGORICAS):
+        datos[col] = np.asarray(OPCIONES_VARIABLES[col], dtype=object)[codigos[:, j]]
+    df = pd.DataFrame(datos)
+    if incluir_puntaje:
+        df['Puntaje riesgo'] = calcular_puntaje_riesgo_lote(df)
+    return df
+
+
+def empaquetar_paciente(datos):
+    """Ruta rápida para un solo paciente (diccionario de texto) -> int"""
+    edad = int(datos['Edad (meses)'])
+    if not 0 <= edad <= MASCARA_EDAD:
+        raise ValueError(f"La edad debe estar entre 0 y {MASCARA_EDAD} meses")
+    clave = edad
+    for col, desplazamiento in DESPLAZAMIENTOS.items():
+        try:
+            clave |= _INDICE_OPCION[col][datos[col]] << desplazamiento
+        except KeyError:
+            raise ValueError(f"Valor no válido en '{col}': {datos[col]!r}") from None
+    return clave
+
+
+def desempaquetar_paciente(clave):
+    """Diccionario de texto a partir de una clave (sin el puntaje de riesgo)"""
+    clave = int(clave)
+    datos = {'Edad (meses)': clave & MASCARA_EDAD}
+    for col, desplazamiento in DESPLAZAMIENTOS.items():
+        datos[col] = OPCIONES_VARIABLES[col][(clave >> desplazamiento) & MASCARA_CATEGORIA]
+    return datos
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Control de admisión delante del motor de predicción.
+
+Como mucho `concurrencia` peticiones se ejecutan a la vez; el resto espera en
+una cola acotada con reparto justo entre clientes (turno rotatorio: un
+terminal que envía muchas peticiones no retrasa a los demás). Si la cola
+total o la del cliente están llenas, la petición se rechaza al momento con una
+estimación de cuándo reintentar, en lugar de acumularse sin límite.
+"""
+
+import argparse
+import collections
+import contextlib
+import threading
+import time
+
+import numpy as np
+
+
+class PeticionRechazada(Exception):
+    def __init__(self, motivo, reintentar_en):
+        super().__init__(f"{motivo}; reintentar en {reintentar_en:.2f} s")
+        self.motivo = motivo
+        self.reintentar_en = reintentar_en
+
+
+class ControlAdmision:
+    def __init__(self, concurrencia=1, capacidad_cola=32, capacidad_por_cliente=4, espera_maxima=2.0,
+                 muestras=10000):
+        self.concurrencia = concurrencia
+        self.capacidad_cola = capacidad_cola
+        self.capacidad_por_cliente = capacidad_por_cliente
+        self.espera_maxima = espera_maxima
+
+        self.en_curso = 0
+        self.colas = collections.OrderedDict()  # cliente -> deque de turnos (eventos)
+        self.en_cola = 0
+        self.servicio_medio = 0.0  # media móvil exponencial del tiempo de servicio (s)
+        self.contadores = collections.Counter()
+        self.esperas = collections.deque(maxlen=muestras)
+        self.profundidad_maxima = 0
+        self._candado = threading.Lock()
+
+    def reintentar_en(self):
+        """Tiempo estimado hasta que se vacíe la cola actual"""
+        return (self.en_cola + 1) * max(self.servicio_medio, 1e-3) / self.concurrencia
+
+    @contextlib.contextmanager
+    def admitir(self, cliente):
+        """Espera turno (o lanza PeticionRechazada) y libera el hueco al salir"""
+        llegada = time.perf_counter()
+        turno = self._pedir_turno(cliente)
+        if turno is not None and not turno.wait(self.espera_maxima):
+            with self._candado:
+                if not turno.is_set():
+                    self.colas[cliente].remove(turno)
+                    self._quitar_vacia(cliente)
+                    self.en_cola -= 1
+                    self.contadores['rechazadas_espera'] += 1
+                    raise PeticionRechazada("Tiempo de espera agotado", self.reintentar_en())
+
+        inicio = time.perf_counter()
+        with self._candado:
+            self.esperas.append(inicio - llegada)
+            self.contadores['admitidas'] += 1
+        try:
+            yield
+        finally:
+            servicio = time.perf_counter() - inicio
+            with self._candado:
+                self.servicio_medio = servicio if self.servicio_medio == 0 else 0.9 * self.servicio_medio + 0.1 * servicio
+                self._ceder_hueco()
+
+    def _pedir_turno(self, cliente):
+        """None si hay hueco libre; si no, el evento que marcará su turno"""
+        with self._candado:
+            if self.en_curso < self.concurrencia and self.en_cola == 0:
+                self.en_curso += 1
+                return None
+            cola = self.colas.get(cliente, ())
+            if self.en_cola >= self.capacidad_cola or len(cola) >= self.capacidad_por_cliente:
+                self.contadores['rechazadas_cola'] += 1
+                motivo = "Cola llena" if self.en_cola >= self.capacidad_cola else "Demasiadas peticiones del cliente"
+                raise PeticionRechazada(motivo, self.reintentar_en())
+            turno = threading.Event()
+            self.colas.setdefault(cliente, collections.deque()).append(turno)
+            self.en_cola += 1
+            self.profundidad_maxima = max(self.profundidad_maxima, self.en_cola)
+            return turno
+
+    def _ceder_hueco(self):
+        """Pasa el hueco al siguiente cliente en turno rotatorio (con el candado tomado)"""
+        if not self.colas:
+            self.en_curso -= 1
+            return
+        cliente, cola = next(iter(self.colas.items()))
+        turno = cola.popleft()
+        self.en_cola -= 1
+        # El cliente atendido pasa al final de la rueda
+        self.colas.move_to_end(cliente)
+        self._quitar_vacia(cliente)
+        turno.set()
+
+    def _quitar_vacia(self, cliente):
+        if not self.colas[cliente]:
+            del self.colas[cliente]
+
+    def metricas(self):
+        """Profundidad de la cola, contadores y tiempos de espera (ms)"""
+        with self._candado:
+            esperas = np.array(self.esperas) * 1000
+            metricas = {
+                'en_curso': self.en_curso,
+                'en_cola': self.en_cola,
+                'profundidad_maxima': self.profundidad_maxima,
+                'clientes_en_cola': len(self.colas),
+                'servicio_medio_ms': self.servicio_medio * 1000,
+                **{c: self.contadores[c] for c in ('admitidas', 'rechazadas_cola', 'rechazadas_espera')}
+            }
+        metricas['espera_p50_ms'] = float(np.percentile(esperas, 50)) if len(esperas) else float('nan')
+        metricas['espera_p99_ms'] = float(np.percentile(esperas, 99)) if len(esperas) else float('nan')
+        return metricas
+
+
+def simular_carga(control, servicio, clientes, peticiones_por_cliente, pausa=0.0):
+    """
+    Lanza un hilo por cliente que envía peticiones seguidas. Devuelve las
+    latencias (s) de las admitidas y el número de rechazadas.
+    """
+    latencias, rechazadas = [], []
+
+    def cliente(i):
+        for _ in range(peticiones_por_cliente):
+            inicio = time.perf_counter()
+            try:
+                with control.admitir(f'terminal-{i}'):
+                    servicio()
+                latencias.append(time.perf_counter() - inicio)
+            except PeticionRechazada as e:
+                rechazadas.append(e)
+                time.sleep(min(e.reintentar_en, 0.05))
+            time.sleep(pausa)
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return np.array(latencias), len(rechazadas)
+
+
+def main():
+    from prediccion_tea import crear_interprete, predecir_probabilidades
+    from datos_tea import cargar_bundle
+    from codec_paciente import empaquetar
+    from puntuacion_lote import codificar_claves
+    from simulador_poblacion import generar_cohorte
+
+    parser = argparse.ArgumentParser(description="Prueba de sobrecarga con y sin control de admisión")
+    parser.add_argument('--clientes', type=int, default=32, help="Terminales enviando a la vez")
+    parser.add_argument('--peticiones', type=int, default=50, help="Peticiones por terminal")
+    parser.add_argument('--concurrencia', type=int, default=1)
+    parser.add_argument('--cola', type=int, default=8, help="Capacidad total de la cola")
+    parser.add_argument('--por-cliente', type=int, default=2, help="Capacidad de la cola por cliente")
+    parser.add_argument('--servicio-ms', type=float, default=2.0,
+                        help="Tiempo extra por petición (simula preprocesamiento y red)")
+    args = parser.parse_args()
+
+    print("🚦 Control de admisión")
+    print("=" * 50)
+
+    interpreter = crear_interprete(num_threads=1)
+    preprocessor, _ = cargar_bundle()
+    X = codificar_claves(empaquetar(*generar_cohorte(1, np.random.default_rng(0))), preprocessor)
+    candado_modelo = threading.Lock()
+
+    def servicio():
+        # El intérprete no admite llamadas concurrentes
+        with candado_modelo:
+            predecir_probabilidades(interpreter, X)
+            time.sleep(args.servicio_ms / 1000)
+
+    escenarios = {
+        'Sin control (cola ilimitada)': ControlAdmision(args.concurrencia, capacidad_cola=10 ** 9,
+                                                        capacidad_por_cliente=10 ** 9, espera_maxima=None),
+        'Con control de admisión': ControlAdmision(args.concurrencia, args.cola, args.por_cliente)
+    }
+    for nombre, control in escenarios.items():
+        inicio = time.perf_counter()
+        latencias, rechazadas = simular_carga(control, servicio, args.clientes, args.peticiones)
+        duracion = time.perf_counter() - inicio
+        m = control.metricas()
+        print(f"\n{nombre}:")
+        print(f"   Admitidas: {len(latencias):,} | Rechazadas: {rechazadas:,} | {len(latencias) / duracion:,.0f} peticiones/s")
+        print(f"   Latencia admitidas: p50 {np.percentile(latencias, 50) * 1000:.1f} ms | "
+              f"p99 {np.percentile(latencias, 99) * 1000:.1f} ms")
+        print(f"   Cola: profundidad máxima {m['profundidad_maxima']} | espera p99 {m['espera_p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Cubo de conteos precalculado sobre el dataset de entrenamiento: número de
+casos por (edad, puntaje de riesgo, diagnóstico y algunas variables
+categóricas). Se construye en una pasada por bloques y se guarda junto al CSV
+(<dataset>_cubo.npz). Filtrar y agregar el cubo solo cuesta del orden de sus
+celdas, sin importar cuántas filas tenga el dataset.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import OPCIONES_VARIABLES, PUNTOS_RIESGO, EDAD_MINIMA, EDAD_MAXIMA
+from datos_tea import RUTA_DATASET, cargar_dataset
+from datos_streaming import CLASES_FIJAS, leer_bloques
+
+# Variables categóricas que se incluyen por defecto como ejes del cubo
+VARIABLES_CUBO = ['Sexo', 'Antecedentes familiares', 'Lenguaje']
+
+PUNTAJE_MAXIMO = sum(max(puntos.values()) for puntos in PUNTOS_RIESGO.values())
+
+
+def ruta_cubo(ruta_dataset=RUTA_DATASET):
+    return os.path.splitext(ruta_dataset)[0] + '_cubo.npz'
+
+
+class CuboAnalitico:
+    def __init__(self, conteos, ejes, etiquetas):
+        self.conteos = conteos
+        self.ejes = list(ejes)
+        self.etiquetas = [list(e) for e in etiquetas]
+
+    @classmethod
+    def vacio(cls, variables=VARIABLES_CUBO):
+        ejes = ['Edad (meses)', 'Puntaje riesgo', 'Diagnóstico orientativo'] + list(variables)
+        etiquetas = [list(range(EDAD_MINIMA, EDAD_MAXIMA + 1)), list(range(PUNTAJE_MAXIMO + 1)), CLASES_FIJAS]
+        etiquetas += [OPCIONES_VARIABLES[var] for var in variables]
+        return cls(np.zeros([len(e) for e in etiquetas], dtype=np.uint32), ejes, etiquetas)
+
+    @property
+    def total(self):
+        return int(self.conteos.sum())
+
+    def acumular(self, df):
+        """Suma al cubo los casos de un DataFrame con las columnas del dataset"""
+        indice = np.zeros(len(df), dtype=np.int64)
+        for eje, etiquetas, tamano in zip(self.ejes, self.etiquetas, self.conteos.shape):
+            codigos = pd.Categorical(df[eje], categories=etiquetas).codes.astype(np.int64)
+            if (codigos < 0).any():
+                raise ValueError(f"Valores fuera del cubo en '{eje}': {sorted(set(df[eje][codigos < 0]))[:5]}")
+            indice = indice * tamano + codigos
+        self.conteos += np.bincount(indice, minlength=self.conteos.size).reshape(self.conteos.shape).astype(np.uint32)
+
+    def seleccionar(self, filtros):
+        """Subcubo con solo los valores elegidos de cada eje: {eje: [valores]}"""
+        conteos, etiquetas = self.conteos, list(self.etiquetas)
+        for eje, valores in filtros.items():
+            i = self.ejes.index(eje)
+            posiciones = [etiquetas[i].index(v) for v in valores]
+            conteos = np.take(conteos, posiciones, axis=i)
+            etiquetas[i] = [etiquetas[i][p] for p in posiciones]
+        return CuboAnalitico(conteos, self.ejes, etiquetas)
+
+    def marginal(self, *ejes):
+        """Conteos sumando el resto de ejes: Series (un eje) o DataFrame (dos ejes)"""
+        posiciones = [self.ejes.index(e) for e in ejes]
+        otros = tuple(i for i in range(len(self.ejes)) if i not in posiciones)
+        datos = self.conteos.sum(axis=otros, dtype=np.int64)
+        if posiciones != sorted(posiciones):
+            datos = datos.T
+        indices = [pd.Index(self.etiquetas[i], name=self.ejes[i]) for i in posiciones]
+        if len(ejes) == 1:
+            return pd.Series(datos, index=indices[0], name='Casos')
+        return pd.DataFrame(datos, index=indices[0], columns=indices[1])
+
+    def resumen_caja(self, eje_valor, eje_grupo):
+        """Mínimo, cuartiles, máximo y media de un eje numérico para cada grupo"""
+        tabla = self.marginal(eje_grupo, eje_valor)
+        valores = np.asarray(tabla.columns, dtype=float)
+        acumulado = tabla.to_numpy().cumsum(axis=1)
+        total = acumulado[:, -1:]
+
+        def cuantil(q):
+            # Primer valor cuyo acumulado alcanza q del total (como un percentil 'lower')
+            return valores[np.argmax(acumulado >= np.maximum(q * total, 1), axis=1)]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resumen = pd.DataFrame({
+                'Casos': total[:, 0],
+                'Mínimo': cuantil(0.0),
+                'Q1': cuantil(0.25),
+                'Mediana': cuantil(0.5),
+                'Q3': cuantil(0.75),
+                'Máximo': cuantil(1.0),
+                'Media': (tabla.to_numpy() * valores).sum(axis=1) / total[:, 0]
+            }, index=tabla.index)
+        return resumen[resumen['Casos'] > 0]
+
+    def guardar(self, ruta):
+        np.savez_compressed(ruta, conteos=self.conteos, ejes=np.array(self.ejes),
+                            **{f'etiquetas_{i}': np.array(e) for i, e in enumerate(self.etiquetas)})
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta, allow_pickle=False) as datos:
+            ejes = datos['ejes'].tolist()
+            return cls(datos['conteos'], ejes, [datos[f'etiquetas_{i}'].tolist() for i in range(len(ejes))])
+
+
+def construir_cubo(ruta_dataset=RUTA_DATASET, variables=VARIABLES_CUBO, filas_por_bloque=200000):
+    """Recorre el CSV por bloques y acumula los conteos"""
+    if not os.path.exists(ruta_dataset):
+        cargar_dataset(ruta_dataset)
+    cubo = CuboAnalitico.vacio(variables)
+    for bloque in leer_bloques(ruta_dataset, filas_por_bloque):
+        cubo.acumular(bloque)
+    return cubo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el cubo de conteos del dataset para la app")
+    parser.add_argument('--dataset', default=RUTA_DATASET)
+    parser.add_argument('--variables', nargs='+', default=VARIABLES_CUBO, choices=list(OPCIONES_VARIABLES),
+                        help="Variables categóricas que se incluyen como ejes")
+    parser.add_argument('--filas-por-bloque', type=int, default=200000)
+    args = parser.parse_args()
+
+    print("🧊 Construcción del cubo analítico")
+    print("=" * 50)
+
+    inicio = time.perf_counter()
+    cubo = construir_cubo(args.dataset, args.variables, args.filas_por_bloque)
+    ruta = ruta_cubo(args.dataset)
+    cubo.guardar(ruta)
+
+    print(f"   Casos: {cubo.total:,} | Ejes: {', '.join(cubo.ejes)}")
+    print(f"   Celdas: {cubo.conteos.size:,} | Archivo: {os.path.getsize(ruta) / 1024:.0f} KB")
+    print(f"✅ Cubo guardado en {ruta} ({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Preparación del dataset por bloques, para entrenar con datasets que no caben
+en memoria. Solo hay un bloque del CSV en memoria a la vez:
+
+- las categorías del one-hot se fijan desde OPCIONES_VARIABLES (sin recorrer datos)
+- el escalador se ajusta de forma incremental (partial_fit) en una pasada
+- la división entrenamiento/validación/prueba se decide con un hash del ID,
+  así cada fila cae siempre en la misma partición sin guardar índices
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from prediccion_tea import OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS
+from datos_tea import REGLAS_DIAGNOSTICO, separar_variables, preprocesador_fijo
+
+# Mismo orden (alfabético) que OneHotEncoder y LabelEncoder al ajustar sobre el dataset
+CATEGORIAS_FIJAS = [sorted(OPCIONES_VARIABLES[col]) for col in COLUMNAS_CATEGORICAS]
+CLASES_FIJAS = sorted({d for _, diagnosticos, _ in REGLAS_DIAGNOSTICO for d in diagnosticos})
+
+ENTRENAMIENTO, VALIDACION, PRUEBA = 0, 1, 2
+
+
+def leer_bloques(ruta, filas_por_bloque=200000):
+    return pd.read_csv(ruta, chunksize=filas_por_bloque)
+
+
+def particion_hash(ids, validacion=0.16, prueba=0.2, semilla=42):
+    """
+    Partición de cada fila (ENTRENAMIENTO, VALIDACION o PRUEBA) a partir de un
+    hash splitmix64 del ID: no depende del orden ni del tamaño de los bloques.
+    """
+    with np.errstate(over='ignore'):
+        z = np.asarray(ids, dtype=np.uint64) + np.uint64(semilla) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+    u = (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+    return np.where(u < prueba, PRUEBA, np.where(u < prueba + validacion, VALIDACION, ENTRENAMIENTO))
+
+
+def ajustar_preprocesador_streaming(ruta, filas_por_bloque=200000, validacion=0.16, prueba=0.2, semilla=42):
+    """
+    Preprocessor con categorías fijas y escalador ajustado en una pasada por
+    bloques (sobre todas las filas, como el notebook). Devuelve también
+    cuántas filas hay en cada partición.
+    """
+    escalador = StandardScaler()
+    filas = np.zeros(3, dtype=np.int64)
+    for bloque in leer_bloques(ruta, filas_por_bloque):
+        escalador.partial_fit(bloque[COLUMNAS_NUMERICAS])
+        filas += np.bincount(particion_hash(bloque['ID'], validacion, prueba, semilla), minlength=3)
+
+    preprocessor = preprocesador_fijo(CATEGORIAS_FIJAS)
+    destino = preprocessor.named_transformers_['num']
+    for atributo in ('mean_', 'var_', 'scale_', 'n_samples_seen_'):
+        setattr(destino, atributo, getattr(escalador, atributo))
+    return preprocessor, CLASES_FIJAS, dict(zip(('entrenamiento', 'validacion', 'prueba'), filas.tolist()))
+
+
+def generar_lotes(ruta, preprocessor, particion, tamano_lote, filas_por_bloque=200000,
+                  validacion=0.16, prueba=0.2, semilla=42, rng=None):
+    """
+    Lotes (X float32, y int32) de una partición, bloque a bloque. Con rng se
+    barajan las filas dentro de cada bloque. Las filas sobrantes de un bloque
+    pasan al siguiente, así todos los lotes salen completos salvo el último.
+    """
+    resto_X = np.empty((0, sum(len(cats) for cats in CATEGORIAS_FIJAS) + len(COLUMNAS_NUMERICAS)), dtype=np.float32)
+    resto_y = np.empty(0, dtype=np.int32)
+
+    for bloque in leer_bloques(ruta, filas_por_bloque):
+        bloque = bloque[particion_hash(bloque['ID'], validacion, prueba, semilla) == particion]
+        if bloque.empty:
+            continue
+        X, y = separar_variables(bloque)
+        X = preprocessor.transform(X)
+        X = np.asarray(X.toarray() if hasattr(X, 'toarray') else X, dtype=np.float32)
+        y = np.searchsorted(CLASES_FIJAS, y.to_numpy()).astype(np.int32)
+        if rng is not None:
+            orden = rng.permutation(len(X))
+            X, y = X[orden], y[orden]
+
+        X, y = np.concatenate([resto_X, X]), np.concatenate([resto_y, y])
+        completos = len(X) - len(X) % tamano_lote
+        for inicio in range(0, completos, tamano_lote):
+            yield X[inicio:inicio + tamano_lote], y[inicio:inicio + tamano_lote]
+        resto_X, resto_y = X[completos:], y[completos:]
+
+    if len(resto_X):
+        yield resto_X, resto_y
@@ -0,0 +1,234 @@
+"""
+Generación y preparación del dataset clínico sintético, igual que en mark3.ipynb.
+"""
+
+import json
+import os
+import random
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, OneHotEncoder, StandardScaler
+
+from prediccion_tea import (
+    OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS, calcular_puntaje_riesgo
+)
+from codec_paciente import BITS_TOTALES, empaquetar_df
+
+RUTA_DATASET = 'dataset_clinico_autismo.csv'
+RUTA_BUNDLE = 'modelo_autismo_bundle.json'
+
+COLUMNAS_DATASET = ['ID', 'Edad (meses)'] + COLUMNAS_CATEGORICAS + ['Puntaje riesgo', 'Diagnóstico orientativo']
+
+# Pesos de la selección aleatoria ponderada del notebook (None = uniforme)
+PESOS_OPCIONES = {
+    'Lenguaje': [0.15, 0.2, 0.3, 0.35],
+    'Comunicación no verbal': [0.1, 0.2, 0.3, 0.4],
+    'Contacto visual': [0.1, 0.2, 0.3, 0.4],
+    'Interacción social': [0.15, 0.25, 0.3, 0.3],
+    'Respuesta al nombre': [0.2, 0.3, 0.5],
+    'Estereotipias': [0.1, 0.2, 0.4, 0.3],
+    'Intereses restringidos': [0.1, 0.2, 0.3, 0.4],
+    'Regulación emocional': [0.1, 0.2, 0.3, 0.4],
+    'TDAH': [0.15, 0.85],
+    'Discapacidad intelectual': [0.1, 0.9],
+    'Hipersensibilidad sensorial': [0.1, 0.2, 0.3, 0.4],
+    'Trastornos del sueño': [0.1, 0.2, 0.3, 0.4],
+    'Alimentación selectiva': [0.1, 0.2, 0.3, 0.4],
+    'Antecedentes familiares': None,
+    'Sexo': None
+}
+
+# Orden en el que el notebook sortea las variables (afecta a la secuencia aleatoria)
+ORDEN_SORTEO = [
+    'Lenguaje', 'Comunicación no verbal', 'Contacto visual', 'Interacción social',
+    'Respuesta al nombre', 'Estereotipias', 'Intereses restringidos', 'Regulación emocional',
+    'TDAH', 'Discapacidad intelectual', 'Hipersensibilidad sensorial', 'Trastornos del sueño',
+    'Alimentación selectiva', 'Antecedentes familiares', 'Sexo'
+]
+
+# Reglas de diagnóstico: (puntaje mínimo, diagnósticos posibles, pesos)
+REGLAS_DIAGNOSTICO = [
+    (15, ['TEA - Nivel 3', 'Indeterminado'], [0.85, 0.15]),
+    (10, ['TEA - Nivel 2', 'Indeterminado'], [0.7, 0.3]),
+    (6, ['TEA - Nivel 1', 'Indeterminado', 'Desarrollo típico'], [0.6, 0.25, 0.15]),
+    (0, ['Desarrollo típico', 'Indeterminado'], [0.9, 0.1])
+]
+
+
+def generar_bloques(n_casos=499999, semilla=42, filas_por_bloque=100000):
+    """
+    Genera el dataset sintético por bloques (DataFrames de hasta filas_por_bloque
+    filas) con la misma secuencia aleatoria que mark3.ipynb.
+    """
+    rng = random.Random(semilla)
+
+    for inicio in range(1, n_casos + 1, filas_por_bloque):
+        data = []
+        for i in range(inicio, min(inicio + filas_por_bloque, n_casos + 1)):
+            edad = rng.randint(6, 36)
+
+            fila = {}
+            for var in ORDEN_SORTEO:
+                if PESOS_OPCIONES[var] is None:
+                    fila[var] = rng.choice(OPCIONES_VARIABLES[var])
+                else:
+                    fila[var] = rng.choices(OPCIONES_VARIABLES[var], weights=PESOS_OPCIONES[var])[0]
+
+            score = calcular_puntaje_riesgo(fila)
+            for minimo, diagnosticos, pesos in REGLAS_DIAGNOSTICO:
+                if score >= minimo:
+                    diagnostico = rng.choices(diagnosticos, weights=pesos)[0]
+                    break
+
+            data.append([i, edad] + [fila[var] for var in COLUMNAS_CATEGORICAS] + [score, diagnostico])
+
+        yield pd.DataFrame(data, columns=COLUMNAS_DATASET)
+
+
+def generar_dataset(n_casos=499999, semilla=42):
+    """
+    Genera el dataset sintético con la misma secuencia aleatoria que mark3.ipynb,
+    de modo que con los valores por defecto se obtiene exactamente el mismo CSV.
+    """
+    bloques = list(generar_bloques(n_casos, semilla, filas_por_bloque=max(n_casos, 1)))
+    return bloques[0] if bloques else pd.DataFrame(columns=COLUMNAS_DATASET)
+
+
+def escribir_dataset(ruta, n_casos=499999, semilla=42, filas_por_bloque=100000):
+    """Escribe el CSV bloque a bloque, sin tener el dataset completo en memoria"""
+    for i, bloque in enumerate(generar_bloques(n_casos, semilla, filas_por_bloque)):
+        bloque.to_csv(ruta, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+
+
+def cargar_dataset(ruta=RUTA_DATASET):
+    """Lee el CSV del notebook o lo regenera (y guarda) si no existe"""
+    if os.path.exists(ruta):
+        return pd.read_csv(ruta)
+
+    print(f"📋 No se encontró {ruta}, generando dataset sintético...")
+    df = generar_dataset()
+    df.to_csv(ruta, index=False)
+    return df
+
+
+def crear_preprocesador(categorias='auto'):
+    """ColumnTransformer sin entrenar, igual al del entrenamiento"""
+    return ColumnTransformer(transformers=[
+        ('cat', OneHotEncoder(categories=categorias, handle_unknown='ignore'), COLUMNAS_CATEGORICAS),
+        ('num', StandardScaler(), COLUMNAS_NUMERICAS)
+    ])
+
+
+def separar_variables(df):
+    """Separa X (variables) e y (etiqueta) como en el notebook"""
+    X = df.drop(columns=["ID", "Diagnóstico orientativo"])
+    y = df["Diagnóstico orientativo"]
+    return X, y
+
+
+def indices_division(n_filas, test_size=0.2, random_state=42):
+    """
+    Índices de entrenamiento y prueba. Coinciden con el train_test_split del
+    notebook porque la permutación solo depende de n_filas y random_state.
+    """
+    return train_test_split(np.arange(n_filas), test_size=test_size, random_state=random_state)
+
+
+def ajustar_preprocesamiento(df):
+    """
+    Ajusta el preprocessor sobre todo el dataset (como el notebook) y devuelve
+    también las clases en el orden del LabelEncoder, que es el de la salida del modelo.
+    """
+    X, y = separar_variables(df)
+    preprocessor = crear_preprocesador().fit(X)
+    clases = list(LabelEncoder().fit(y).classes_)
+    return preprocessor, clases
+
+
+def codificar(df, preprocessor, clases):
+    """Matriz preprocesada (float32) y etiquetas codificadas en el orden de clases"""
+    X, y = separar_variables(df)
+    desconocidas = set(y) - set(clases)
+    if desconocidas:
+        raise ValueError(f"Diagnósticos que el modelo no conoce: {sorted(desconocidas)}")
+    X_proc = preprocessor.transform(X)
+    X_proc = np.asarray(X_proc.toarray() if hasattr(X_proc, 'toarray') else X_proc, dtype=np.float32)
+    return X_proc, np.searchsorted(clases, y.to_numpy()).astype(np.int32)
+
+
+def comprimir_unicos(X, y, semilla=42):
+    """
+    Posiciones de las filas (variables, etiqueta) únicas de X/y y cuántas veces
+    aparece cada una. Entrenar solo con esas filas y sample_weight=conteos
+    optimiza la misma pérdida que entrenar con todas.
+
+    X son las variables originales (antes del one-hot) e y las etiquetas
+    codificadas. El 'Puntaje riesgo' no forma parte de la clave porque se
+    deriva de las respuestas.
+
+    Las posiciones se devuelven barajadas (con `semilla`): np.unique las ordena
+    por clave, es decir, por clase, y un validation_split tomaría el final.
+    """
+    claves = empaquetar_df(X)
+    # La etiqueta va en los bits libres por encima de la clave del paciente
+    claves |= np.asarray(y).astype(np.uint64) << np.uint64(BITS_TOTALES)
+    _, posiciones, conteos = np.unique(claves, return_index=True, return_counts=True)
+    orden = np.random.default_rng(semilla).permutation(len(posiciones))
+    return posiciones[orden], conteos[orden]
+
+
+def guardar_bundle(preprocessor, clases, ruta=RUTA_BUNDLE):
+    """
+    Guarda en JSON todo lo que hace falta para preparar la entrada del modelo:
+    orden y categorías del one-hot, parámetros del escalador y clases de salida.
+    """
+    categorias = preprocessor.named_transformers_['cat'].categories_
+    escalador = preprocessor.named_transformers_['num']
+    bundle = {
+        'columnas_categoricas': COLUMNAS_CATEGORICAS,
+        'categorias': {col: [str(c) for c in cats] for col, cats in zip(COLUMNAS_CATEGORICAS, categorias)},
+        'columnas_numericas': COLUMNAS_NUMERICAS,
+        'media': escalador.mean_.tolist(),
+        'escala': escalador.scale_.tolist(),
+        'clases': [str(c) for c in clases],
+        'n_caracteristicas': sum(len(c) for c in categorias) + len(COLUMNAS_NUMERICAS)
+    }
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f, ensure_ascii=False, indent=2)
+    return bundle
+
+
+def preprocesador_fijo(categorias):
+    """
+    Preprocessor con las categorías dadas, ajustado sobre una muestra mínima
+    solo para crear sus atributos: el escalador se debe sobrescribir después.
+    """
+    preprocessor = crear_preprocesador(categorias)
+    n_filas = max(len(cats) for cats in categorias)
+    muestra = pd.DataFrame({col: [cats[i % len(cats)] for i in range(n_filas)]
+                            for col, cats in zip(COLUMNAS_CATEGORICAS, categorias)})
+    for col in COLUMNAS_NUMERICAS:
+        muestra[col] = np.arange(n_filas, dtype=float)
+    return preprocessor.fit(muestra)
+
+
+def ruta_bundle_modelo(ruta_modelo):
+    """Bundle exportado junto al modelo (<modelo>_bundle.json) o, si no hay, el de producción"""
+    ruta = os.path.splitext(ruta_modelo)[0] + '_bundle.json'
+    return ruta if os.path.exists(ruta) else RUTA_BUNDLE
+
+
+def cargar_bundle(ruta=RUTA_BUNDLE):
+    """Reconstruye el preprocessor ajustado y las clases a partir del bundle"""
+    with open(ruta, encoding='utf-8') as f:
+        bundle = json.load(f)
+
+    preprocessor = preprocesador_fijo([bundle['categorias'][col] for col in COLUMNAS_CATEGORICAS])
+    escalador = preprocessor.named_transformers_['num']
+    escalador.mean_ = np.array(bundle['media'])
+    escalador.scale_ = np.array(bundle['escala'])
+    escalador.var_ = escalador.scale_ ** 2
+    return preprocessor, bundle['clases']
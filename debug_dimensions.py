@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Script para debuggear las dimensiones del modelo y preprocessing
+
+Para comprobar rápido que modelo, bundle y clases coinciden (sin TensorFlow),
+usar validar_contrato.py.
 """
 
 import pandas as pd
@@ -9,6 +12,8 @@ import tensorflow as tf
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
 
+from prediccion_tea import ETIQUETAS
+
 def debug_modelo_dimensiones():
     """Debuggea las dimensiones del modelo y preprocessing"""
     print("🔍 Debugging dimensiones del modelo...")
@@ -182,8 +187,7 @@ def debug_modelo_dimensiones():
             pred_idx = int(np.argmax(output_data))
             confianza = float(np.max(output_data))
             
-            etiquetas = ['Desarrollo típico', 'TEA - Nivel 1', 'TEA - Nivel 2', 'TEA - Nivel 3', 'Indeterminado']
-            resultado = etiquetas[pred_idx]
+            resultado = ETIQUETAS[pred_idx]
             
             print(f"✅ Predicción exitosa: {resultado} (confianza: {confianza:.3f})")
             
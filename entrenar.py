@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Entrenamiento de la red neuronal sin notebook (misma arquitectura que mark3.ipynb),
+con un pipeline tf.data y exportación del modelo .h5, el .tflite y el bundle
+de preprocesamiento.
+
+Con --streaming el CSV se lee por bloques (ver datos_streaming) y la memoria
+no depende del tamaño del dataset.
+
+Con --continuar se parte de un modelo .h5 ya entrenado y se ajusta solo con
+los casos nuevos más una muestra de repetición de los antiguos; el modelo
+anterior y el nuevo se comparan sobre los mismos conjuntos reservados.
+"""
+
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from datos_tea import (
+    RUTA_DATASET, RUTA_BUNDLE, cargar_dataset, escribir_dataset, separar_variables, indices_division,
+    ajustar_preprocesamiento, codificar, guardar_bundle, cargar_bundle
+)
+from prediccion_tea import COLUMNAS_NUMERICAS, RUTA_MODELO
+from cache_preprocesado import obtener_preprocesado
+import datos_streaming
+
+# Lote y learning rate de Adam con los que se entrenó el notebook
+LOTE_BASE = 16
+LR_BASE = 0.001
+
+
+def configurar_hilos(intra=None, inter=None):
+    """Hilos de TensorFlow; debe llamarse antes de ejecutar cualquier operación"""
+    import tensorflow as tf
+    if intra:
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+    if inter:
+        tf.config.threading.set_inter_op_parallelism_threads(inter)
+
+
+def learning_rate_escalado(tamano_lote, escalado='raiz'):
+    """Escala el learning rate con el tamaño de lote (regla lineal o raíz cuadrada)"""
+    factor = tamano_lote / LOTE_BASE
+    return LR_BASE * (factor if escalado == 'lineal' else np.sqrt(factor))
+
+
+def construir_red(n_entradas, n_clases, capas=(32, 16), dropout=0.2, learning_rate=LR_BASE):
+    """Red del notebook (build_nn_model) con anchos, profundidad y dropout configurables"""
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    model = tf.keras.Sequential([layers.Input(shape=(n_entradas,))])
+    for unidades in capas:
+        model.add(layers.Dense(unidades, activation='relu'))
+        model.add(layers.Dropout(dropout))
+    model.add(layers.Dense(n_clases, activation='softmax'))
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def crear_pipeline(X, y, tamano_lote, barajar=False, semilla=42):
+    """
+    Dataset de lotes: se cachea tras el primer recorrido, se baraja en cada
+    época y se prepara el siguiente lote mientras se entrena el actual.
+    """
+    import tensorflow as tf
+    ds = tf.data.Dataset.from_tensor_slices((X, y)).cache()
+    if barajar:
+        ds = ds.shuffle(len(X), seed=semilla, reshuffle_each_iteration=True)
+    return ds.batch(tamano_lote).prefetch(tf.data.AUTOTUNE)
+
+
+def crear_callback_tiempos(n_muestras):
+    """Callback que imprime el tiempo de cada época y las muestras por segundo"""
+    import tensorflow as tf
+
+    class TiempoPorEpoca(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.epocas = []
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self._inicio = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            segundos = time.perf_counter() - self._inicio
+            logs = logs or {}
+            self.epocas.append({'epoca': epoch + 1, 'segundos': segundos,
+                                'muestras_por_segundo': n_muestras / segundos, **logs})
+            print(f"   Época {epoch + 1:3d}: {segundos:6.2f} s | {n_muestras / segundos:10,.0f} muestras/s"
+                  f" | loss {logs.get('loss', float('nan')):.4f} | val_loss {logs.get('val_loss', float('nan')):.4f}"
+                  f" | val_accuracy {logs.get('val_accuracy', float('nan')):.4f}")
+
+    return TiempoPorEpoca()
+
+
+def cargar_matrices(ruta_dataset, usar_cache=True):
+    """Matriz float32, etiquetas, preprocessor y clases del dataset completo"""
+    if usar_cache:
+        X, y, preprocessor, clases, acierto = obtener_preprocesado(ruta_dataset)
+        print(f"   Preprocesado: {'desde la caché' if acierto else 'calculado y guardado en la caché'}")
+        return X, y, preprocessor, clases
+    df = cargar_dataset(ruta_dataset)
+    preprocessor, clases = ajustar_preprocesamiento(df)
+    return (*codificar(df, preprocessor, clases), preprocessor, clases)
+
+
+def datos_en_memoria(args):
+    """Dataset completo en memoria; la validación es el tramo final, como validation_split"""
+    X, y, preprocessor, clases = cargar_matrices(args.dataset, not args.sin_cache)
+    idx_train, idx_test = indices_division(len(y))
+    X_train, y_train, X_test, y_test = X[idx_train], y[idx_train], X[idx_test], y[idx_test]
+
+    n_fit = len(X_train) - int(len(X_train) * args.validacion)
+    filas = {'entrenamiento': n_fit, 'validacion': len(X_train) - n_fit, 'prueba': len(X_test)}
+    return (preprocessor, clases, filas,
+            crear_pipeline(X_train[:n_fit], y_train[:n_fit], args.lote, barajar=True, semilla=args.semilla),
+            crear_pipeline(X_train[n_fit:], y_train[n_fit:], args.lote),
+            crear_pipeline(X_test, y_test, args.lote))
+
+
+def datos_por_bloques(args):
+    """Dataset leído por bloques del CSV, con división por hash del ID"""
+    import tensorflow as tf
+
+    if not os.path.exists(args.dataset):
+        print(f"📋 Generando {args.casos:,} casos en {args.dataset} por bloques...")
+        escribir_dataset(args.dataset, args.casos, filas_por_bloque=args.filas_por_bloque)
+
+    # Mismas proporciones que la división del notebook (20% prueba y validation_split)
+    division = {'validacion': (1 - 0.2) * args.validacion, 'prueba': 0.2, 'semilla': args.semilla}
+    preprocessor, clases, filas = datos_streaming.ajustar_preprocesador_streaming(
+        args.dataset, args.filas_por_bloque, **division)
+
+    n_entradas = sum(len(cats) for cats in datos_streaming.CATEGORIAS_FIJAS) + len(COLUMNAS_NUMERICAS)
+    firma = (tf.TensorSpec((None, n_entradas), tf.float32), tf.TensorSpec((None,), tf.int32))
+    epocas = itertools.count()
+    nombres = {datos_streaming.ENTRENAMIENTO: 'entrenamiento', datos_streaming.VALIDACION: 'validacion',
+               datos_streaming.PRUEBA: 'prueba'}
+
+    def dataset(particion, barajar=False):
+        def lotes():
+            rng = np.random.default_rng([args.semilla, next(epocas)]) if barajar else None
+            yield from datos_streaming.generar_lotes(
+                args.dataset, preprocessor, particion, args.lote, args.filas_por_bloque, rng=rng, **division)
+        n_lotes = -(-filas[nombres[particion]] // args.lote)
+        ds = tf.data.Dataset.from_generator(lotes, output_signature=firma)
+        return ds.apply(tf.data.experimental.assert_cardinality(n_lotes)).prefetch(tf.data.AUTOTUNE)
+
+    return (preprocessor, clases, filas,
+            dataset(datos_streaming.ENTRENAMIENTO, barajar=True),
+            dataset(datos_streaming.VALIDACION),
+            dataset(datos_streaming.PRUEBA))
+
+
+def exportar_modelo(model, preprocessor, clases, prefijo):
+    """Guarda <prefijo>.h5, <prefijo>.tflite y <prefijo>_bundle.json"""
+    import tensorflow as tf
+
+    model.save(f"{prefijo}.h5")
+    tflite_model = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+    with open(f"{prefijo}.tflite", "wb") as f:
+        f.write(tflite_model)
+    guardar_bundle(preprocessor, clases, f"{prefijo}_bundle.json")
+    return [f"{prefijo}.h5", f"{prefijo}.tflite", f"{prefijo}_bundle.json"]
+
+
+def entrenar_incremental(args):
+    """
+    Ajuste fino del modelo anterior con los casos nuevos y una muestra de
+    repetición de los antiguos (para no olvidar lo aprendido). El preprocessor
+    es el del bundle anterior: la entrada del modelo no cambia.
+    """
+    import tensorflow as tf
+
+    preprocessor, clases = cargar_bundle(args.bundle)
+    model = tf.keras.models.load_model(args.continuar, compile=False)
+
+    df_antiguo = cargar_dataset(args.dataset)
+    idx_train, idx_test = indices_division(len(df_antiguo))
+    df_nuevos = pd.read_csv(args.nuevos)
+
+    # Parte de los casos nuevos se reserva siempre igual (hash del ID) para la comparación
+    reservados = datos_streaming.particion_hash(
+        df_nuevos['ID'], validacion=0.0, prueba=0.2, semilla=args.semilla) == datos_streaming.PRUEBA
+    rng = np.random.default_rng(args.semilla)
+    n_repeticion = min(int(round(args.replay * (~reservados).sum())), len(idx_train))
+    repeticion = df_antiguo.iloc[rng.choice(idx_train, n_repeticion, replace=False)]
+
+    X, y = codificar(pd.concat([df_nuevos[~reservados], repeticion]), preprocessor, clases)
+    orden = rng.permutation(len(X))
+    X, y = X[orden], y[orden]
+    n_fit = len(X) - int(len(X) * args.validacion)
+
+    conjuntos = {
+        'Prueba original': codificar(df_antiguo.iloc[idx_test], preprocessor, clases),
+        'Casos nuevos reservados': codificar(df_nuevos[reservados], preprocessor, clases)
+    }
+
+    def precisiones():
+        return {nombre: float(np.mean(model.predict(Xc, batch_size=8192, verbose=0).argmax(axis=1) == yc))
+                for nombre, (Xc, yc) in conjuntos.items() if len(yc)}
+
+    antes = precisiones()
+
+    # Learning rate más bajo que en un entrenamiento desde cero
+    learning_rate = args.learning_rate or learning_rate_escalado(args.lote, args.escalado_lr) / 10
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+
+    print(f"   Casos nuevos: {(~reservados).sum():,} (+{reservados.sum():,} reservados) | "
+          f"Repetición: {n_repeticion:,} | Learning rate: {learning_rate:.5f}")
+    tiempos = crear_callback_tiempos(n_fit)
+    inicio = time.perf_counter()
+    model.fit(crear_pipeline(X[:n_fit], y[:n_fit], args.lote, barajar=True, semilla=args.semilla),
+              validation_data=crear_pipeline(X[n_fit:], y[n_fit:], args.lote),
+              epochs=args.epocas, verbose=0,
+              callbacks=[tiempos, tf.keras.callbacks.EarlyStopping(
+                  monitor='val_loss', patience=args.paciencia, restore_best_weights=True)])
+    duracion = time.perf_counter() - inicio
+
+    despues = precisiones()
+    comparacion = pd.DataFrame({'Modelo anterior': antes, 'Modelo nuevo': despues})
+    comparacion['Diferencia'] = comparacion['Modelo nuevo'] - comparacion['Modelo anterior']
+    print(f"\n   Épocas: {len(tiempos.epocas)} | Tiempo total: {duracion:.1f} s")
+    print("\n📊 Precisión en los conjuntos reservados:\n")
+    print(comparacion.round(4).to_string())
+    return model, preprocessor, clases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrenamiento de la red neuronal de predicción de TEA")
+    parser.add_argument('--dataset', default=RUTA_DATASET)
+    parser.add_argument('--salida', default='modelo_entrenado', help="Prefijo de los archivos exportados")
+    parser.add_argument('--sobrescribir', action='store_true',
+                        help=f"Permite exportar sobre el modelo en uso ({RUTA_MODELO} y su bundle)")
+    parser.add_argument('--epocas', type=int, default=50)
+    parser.add_argument('--lote', type=int, default=1024, help="Tamaño de lote")
+    parser.add_argument('--escalado-lr', choices=['raiz', 'lineal'], default='raiz',
+                        help=f"Cómo escalar el learning rate respecto al lote {LOTE_BASE} del notebook")
+    parser.add_argument('--learning-rate', type=float, default=None, help="Fija el learning rate (ignora el escalado)")
+    parser.add_argument('--paciencia', type=int, default=5, help="Épocas sin mejora de val_loss antes de parar")
+    parser.add_argument('--validacion', type=float, default=0.2, help="Fracción final del entrenamiento para validación")
+    parser.add_argument('--hilos-intra', type=int, default=None, help="Hilos dentro de cada operación")
+    parser.add_argument('--hilos-inter', type=int, default=None, help="Operaciones independientes en paralelo")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="No usar la caché del dataset preprocesado (cache_preprocesado)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Lee el CSV por bloques en lugar de cargarlo entero en memoria")
+    parser.add_argument('--filas-por-bloque', type=int, default=200000, help="Filas por bloque en --streaming")
+    parser.add_argument('--casos', type=int, default=499999,
+                        help="Casos a generar si el dataset no existe (--streaming)")
+    parser.add_argument('--continuar', metavar='MODELO_H5', help="Ajusta este modelo en lugar de entrenar desde cero")
+    parser.add_argument('--nuevos', help="CSV con los casos nuevos etiquetados (--continuar)")
+    parser.add_argument('--bundle', default=RUTA_BUNDLE, help="Bundle del modelo anterior (--continuar)")
+    parser.add_argument('--replay', type=float, default=1.0,
+                        help="Casos antiguos de repetición por cada caso nuevo (--continuar)")
+    args = parser.parse_args()
+
+    if args.continuar and not args.nuevos:
+        parser.error("--continuar necesita --nuevos")
+    if os.path.abspath(f"{args.salida}.tflite") == os.path.abspath(RUTA_MODELO) and not args.sobrescribir:
+        parser.error(f"--salida {args.salida} reemplazaría el modelo en uso; añade --sobrescribir")
+
+    configurar_hilos(args.hilos_intra, args.hilos_inter)
+    import tensorflow as tf
+    tf.keras.utils.set_random_seed(args.semilla)
+
+    if args.continuar:
+        print(f"🔁 Reentrenamiento incremental desde {args.continuar}")
+        print("=" * 50)
+        model, preprocessor, clases = entrenar_incremental(args)
+        for archivo in exportar_modelo(model, preprocessor, clases, args.salida):
+            print(f"✅ Guardado {archivo}")
+        return
+
+    print("🧠 Entrenamiento de la red neuronal" + (" (por bloques)" if args.streaming else ""))
+    print("=" * 50)
+
+    preparar = datos_por_bloques if args.streaming else datos_en_memoria
+    preprocessor, clases, filas, ds_fit, ds_val, ds_test = preparar(args)
+    n_entradas = ds_fit.element_spec[0].shape[1]
+
+    learning_rate = args.learning_rate or learning_rate_escalado(args.lote, args.escalado_lr)
+    print(f"   Entrenamiento: {filas['entrenamiento']:,} | Validación: {filas['validacion']:,} "
+          f"| Prueba: {filas['prueba']:,}")
+    print(f"   Lote: {args.lote} | Learning rate: {learning_rate:.5f} | "
+          f"Hilos intra/inter: {tf.config.threading.get_intra_op_parallelism_threads() or 'auto'}/"
+          f"{tf.config.threading.get_inter_op_parallelism_threads() or 'auto'}")
+
+    model = construir_red(n_entradas, len(clases), learning_rate=learning_rate)
+    tiempos = crear_callback_tiempos(filas['entrenamiento'])
+    callbacks = [tiempos, tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=args.paciencia, restore_best_weights=True)]
+
+    inicio = time.perf_counter()
+    model.fit(ds_fit, validation_data=ds_val, epochs=args.epocas, callbacks=callbacks, verbose=0)
+    duracion = time.perf_counter() - inicio
+
+    _, precision = model.evaluate(ds_test, verbose=0)
+    media = np.mean([e['muestras_por_segundo'] for e in tiempos.epocas])
+    print(f"\n   Épocas: {len(tiempos.epocas)} | Tiempo total: {duracion:.1f} s | Media: {media:,.0f} muestras/s")
+    print(f"   Precisión en prueba: {precision:.4f}")
+
+    carpeta = os.path.dirname(args.salida)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    for archivo in exportar_modelo(model, preprocessor, clases, args.salida):
+        print(f"✅ Guardado {archivo}")
+
+
+if __name__ == "__main__":
+    main()
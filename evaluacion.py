@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Evaluación de modelos: matriz de confusión y métricas por clase en una sola
+pasada vectorizada, intervalos de confianza por bootstrap y curva de
+calibración de la confianza (probabilidad máxima del softmax).
+
+Todas las métricas dependen solo de la matriz de confusión, y remuestrear las
+filas con reemplazo equivale a sacar la matriz de una multinomial con las
+frecuencias observadas de cada celda. Así cada remuestreo cuesta O(clases²)
+en lugar de O(filas).
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def matriz_confusion(y_true, y_pred, n_clases):
+    """Filas: clase real; columnas: clase predicha"""
+    codigos = np.asarray(y_true, dtype=np.int64) * n_clases + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(codigos, minlength=n_clases * n_clases).reshape(n_clases, n_clases)
+
+
+def metricas_desde_matrices(matrices):
+    """
+    Métricas de una o varias matrices de confusión (..., k, k), vectorizadas
+    sobre las dimensiones iniciales. Las divisiones por cero dan 0, como
+    zero_division=0 en sklearn.
+    """
+    matrices = np.asarray(matrices, dtype=np.float64)
+    aciertos = np.diagonal(matrices, axis1=-2, axis2=-1)
+    soporte = matrices.sum(axis=-1)
+    predichos = matrices.sum(axis=-2)
+    total = soporte.sum(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predichos > 0, aciertos / predichos, 0.0)
+        recall = np.where(soporte > 0, aciertos / soporte, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    return {
+        'accuracy': aciertos.sum(axis=-1) / total,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'f1_macro': f1.mean(axis=-1),
+        'soporte': soporte
+    }
+
+
+def tabla_metricas(matriz, clases):
+    """Equivalente a classification_report como DataFrame"""
+    m = metricas_desde_matrices(matriz)
+    return pd.DataFrame({
+        'Precisión': m['precision'],
+        'Recall': m['recall'],
+        'F1': m['f1'],
+        'Soporte': m['soporte'].astype(int)
+    }, index=list(clases))
+
+
+def _remuestrear(tarea):
+    matriz, repeticiones, semilla = tarea
+    rng = np.random.default_rng(semilla)
+    frecuencias = matriz.ravel() / matriz.sum()
+    muestras = rng.multinomial(int(matriz.sum()), frecuencias, size=repeticiones)
+    return muestras.reshape(repeticiones, *matriz.shape)
+
+
+def bootstrap_matrices(matriz, repeticiones=1000, semilla=42, procesos=1):
+    """
+    Matrices de confusión de `repeticiones` remuestreos bootstrap. Con
+    procesos > 1 los remuestreos se reparten entre varios procesos.
+    """
+    semillas = np.random.SeedSequence(semilla).spawn(max(procesos, 1))
+    partes = np.array_split(np.arange(repeticiones), len(semillas))
+    tareas = [(np.asarray(matriz), len(p), s) for p, s in zip(partes, semillas) if len(p)]
+
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=mp.get_context('spawn')) as pool:
+            return np.concatenate(list(pool.map(_remuestrear, tareas)))
+    return np.concatenate([_remuestrear(t) for t in tareas])
+
+
+def intervalos_bootstrap(matriz, clases, repeticiones=1000, confianza=0.95, semilla=42, procesos=1):
+    """
+    Estimación e intervalo percentil de accuracy, F1 macro y precisión, recall
+    y F1 de cada clase.
+    """
+    puntual = metricas_desde_matrices(matriz)
+    remuestreos = metricas_desde_matrices(bootstrap_matrices(matriz, repeticiones, semilla, procesos))
+    colas = [(1 - confianza) / 2 * 100, (1 + confianza) / 2 * 100]
+
+    filas = []
+    for nombre in ('accuracy', 'f1_macro'):
+        inferior, superior = np.percentile(remuestreos[nombre], colas)
+        filas.append((nombre, '', puntual[nombre], inferior, superior))
+    for nombre in ('precision', 'recall', 'f1'):
+        inferiores, superiores = np.percentile(remuestreos[nombre], colas, axis=0)
+        for i, clase in enumerate(clases):
+            filas.append((nombre, clase, puntual[nombre][i], inferiores[i], superiores[i]))
+
+    return pd.DataFrame(filas, columns=['Métrica', 'Clase', 'Estimación', 'IC inferior', 'IC superior'])
+
+
+def curva_calibracion(probabilidades, y_true, n_bins=10):
+    """
+    Confianza media frente a precisión real en bins de la confianza (la
+    "Confianza del modelo" que muestra la app). Devuelve la tabla y el ECE.
+    """
+    probabilidades = np.asarray(probabilidades)
+    confianza = probabilidades.max(axis=1)
+    acierto = probabilidades.argmax(axis=1) == np.asarray(y_true)
+    bins = np.minimum((confianza * n_bins).astype(np.int64), n_bins - 1)
+
+    n = np.bincount(bins, minlength=n_bins)
+    suma_confianza = np.bincount(bins, weights=confianza, minlength=n_bins)
+    suma_aciertos = np.bincount(bins, weights=acierto, minlength=n_bins)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tabla = pd.DataFrame({
+            'Desde': np.arange(n_bins) / n_bins,
+            'Hasta': np.arange(1, n_bins + 1) / n_bins,
+            'Casos': n,
+            'Confianza media': suma_confianza / n,
+            'Precisión real': suma_aciertos / n
+        })
+    ece = float(np.abs(suma_aciertos - suma_confianza).sum() / n.sum())
+    return tabla[tabla['Casos'] > 0].reset_index(drop=True), ece
+
+
+def main():
+    from prediccion_tea import RUTA_MODELO, crear_interprete, predecir_por_bloques
+    from datos_tea import RUTA_DATASET, RUTA_BUNDLE, cargar_dataset, cargar_bundle, codificar, indices_division
+
+    parser = argparse.ArgumentParser(description="Evaluación del modelo con intervalos bootstrap y calibración")
+    parser.add_argument('--dataset', default=RUTA_DATASET)
+    parser.add_argument('--modelo', default=RUTA_MODELO, help="Modelo .tflite (o árboles .npz)")
+    parser.add_argument('--bundle', default=RUTA_BUNDLE, help="Bundle de preprocesamiento del modelo")
+    parser.add_argument('--repeticiones', type=int, default=1000, help="Remuestreos bootstrap")
+    parser.add_argument('--procesos', type=int, default=1, help="Procesos para el bootstrap")
+    parser.add_argument('--bins', type=int, default=10, help="Bins de la curva de calibración")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    print("📏 Evaluación del modelo")
+    print("=" * 50)
+
+    preprocessor, clases = cargar_bundle(args.bundle)
+    df = cargar_dataset(args.dataset)
+    _, idx_test = indices_division(len(df))
+    X_test, y_test = codificar(df.iloc[idx_test], preprocessor, clases)
+    probabilidades = predecir_por_bloques(crear_interprete(args.modelo), X_test)
+
+    inicio = time.perf_counter()
+    matriz = matriz_confusion(y_test, probabilidades.argmax(axis=1), len(clases))
+    intervalos = intervalos_bootstrap(matriz, clases, args.repeticiones, semilla=args.semilla, procesos=args.procesos)
+    calibracion, ece = curva_calibracion(probabilidades, y_test, args.bins)
+    duracion = time.perf_counter() - inicio
+
+    print(f"\nConjunto de prueba: {len(y_test):,} casos\n")
+    print("Matriz de confusión (filas: real, columnas: predicción):")
+    print(pd.DataFrame(matriz, index=clases, columns=clases).to_string())
+    print(f"\nMétricas con IC 95% ({args.repeticiones} remuestreos bootstrap):")
+    print(intervalos.round(4).to_string(index=False))
+    print(f"\nCalibración de la confianza (ECE = {ece:.4f}):")
+    print(calibracion.round(4).to_string(index=False))
+    print(f"\n✅ Métricas, bootstrap y calibración en {duracion * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
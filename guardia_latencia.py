@@ -0,0 +1,115 @@
+"""
+Guardia de latencia para la inferencia: tiempo máximo por llamada e
+interruptor de circuito.
+
+Las llamadas al modelo se ejecutan en un hilo dedicado (el intérprete TFLite
+no admite llamadas concurrentes) y se espera su resultado como mucho
+`tiempo_maximo` segundos. Tras `fallos_para_abrir` llamadas seguidas lentas o
+con error, el circuito se abre: durante `segundos_abierto` ya no se llama al
+modelo y se responde al momento con la estimación por puntaje de riesgo.
+Pasado ese tiempo se deja pasar una llamada de prueba (semiabierto); si va
+bien, el circuito se cierra.
+"""
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
+
+from prediccion_tea import calcular_puntaje_riesgo, nivel_riesgo
+
+CERRADO, ABIERTO, SEMIABIERTO = 'cerrado', 'abierto', 'semiabierto'
+
+# Prefijo del resultado cuando no se usó el modelo
+PREFIJO_RESPALDO = "Estimación por puntaje (sin modelo)"
+
+
+class ModeloNoDisponible(Exception):
+    """El modelo no respondió a tiempo, falló o el circuito está abierto"""
+
+
+def prediccion_respaldo(datos_usuario):
+    """
+    Resultado determinista a partir del puntaje de riesgo, con la misma forma
+    que predecir_tea: (resultado, confianza, probabilidades). No hay confianza
+    ni probabilidades del modelo.
+    """
+    puntaje = calcular_puntaje_riesgo(datos_usuario)
+    return f"{PREFIJO_RESPALDO}: riesgo {nivel_riesgo(puntaje).lower()}", float('nan'), []
+
+
+def es_respaldo(resultado):
+    return resultado.startswith(PREFIJO_RESPALDO)
+
+
+class GuardiaLatencia:
+    def __init__(self, tiempo_maximo=0.5, fallos_para_abrir=3, segundos_abierto=30.0, muestras_latencia=10000):
+        self.tiempo_maximo = tiempo_maximo
+        self.fallos_para_abrir = fallos_para_abrir
+        self.segundos_abierto = segundos_abierto
+
+        self.estado = CERRADO
+        self.abierto_desde = 0.0
+        self.fallos_seguidos = 0
+        self.contadores = collections.Counter()
+        self.latencias = collections.deque(maxlen=muestras_latencia)
+        self._candado = threading.Lock()
+        self._ejecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='guardia_latencia')
+
+    def ejecutar(self, funcion, *args):
+        """Devuelve funcion(*args) o lanza ModeloNoDisponible"""
+        with self._candado:
+            self.contadores['llamadas'] += 1
+            if self.estado == ABIERTO:
+                if time.monotonic() - self.abierto_desde < self.segundos_abierto:
+                    self.contadores['rechazadas'] += 1
+                    raise ModeloNoDisponible("Circuito abierto")
+                self.estado = SEMIABIERTO
+
+        inicio = time.perf_counter()
+        futuro = self._ejecutor.submit(funcion, *args)
+        try:
+            valor = futuro.result(timeout=self.tiempo_maximo)
+        except concurrent.futures.TimeoutError:
+            # Si aún no empezó (cola detrás de una llamada colgada), no llega a ejecutarse
+            futuro.cancel()
+            self._fallo('lentas')
+            raise ModeloNoDisponible(f"El modelo tardó más de {self.tiempo_maximo * 1000:.0f} ms") from None
+        except Exception as e:
+            self._fallo('errores')
+            raise ModeloNoDisponible(f"Error del modelo: {e}") from e
+
+        with self._candado:
+            self.latencias.append(time.perf_counter() - inicio)
+            self.contadores['exitos'] += 1
+            self.fallos_seguidos = 0
+            if self.estado == SEMIABIERTO:
+                self.estado = CERRADO
+        return valor
+
+    def _fallo(self, tipo):
+        with self._candado:
+            self.contadores[tipo] += 1
+            self.fallos_seguidos += 1
+            if self.estado == SEMIABIERTO or self.fallos_seguidos >= self.fallos_para_abrir:
+                if self.estado != ABIERTO:
+                    self.contadores['aperturas'] += 1
+                self.estado = ABIERTO
+                self.abierto_desde = time.monotonic()
+
+    def metricas(self):
+        """Estado del circuito, contadores y latencia (ms) de las llamadas correctas"""
+        with self._candado:
+            latencias = np.array(self.latencias) * 1000
+            metricas = {
+                'estado': self.estado,
+                'fallos_seguidos': self.fallos_seguidos,
+                'segundos_para_reintento': (max(self.segundos_abierto - (time.monotonic() - self.abierto_desde), 0.0)
+                                            if self.estado == ABIERTO else 0.0),
+                **{c: self.contadores[c] for c in ('llamadas', 'exitos', 'lentas', 'errores', 'rechazadas', 'aperturas')}
+            }
+        metricas['latencia_p50_ms'] = float(np.percentile(latencias, 50)) if len(latencias) else float('nan')
+        metricas['latencia_p99_ms'] = float(np.percentile(latencias, 99)) if len(latencias) else float('nan')
+        return metricas
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Importancia por permutación de las 17 variables originales (antes del one-hot)
+sobre el conjunto de prueba del notebook, repartida entre varios procesos.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from prediccion_tea import RUTA_MODELO, crear_interprete, bloques_columnas, predecir_por_bloques
+from datos_tea import (
+    RUTA_DATASET, cargar_dataset, ajustar_preprocesamiento, cargar_bundle, codificar,
+    separar_variables, indices_division, ruta_bundle_modelo
+)
+
+# Estado de cada proceso trabajador (se carga una sola vez por proceso)
+_trabajador = {}
+
+
+def _iniciar_trabajador(ruta_X, ruta_y, model_path, columnas, bloques, tamano_lote):
+    X_base = np.load(ruta_X, mmap_mode='r')
+    _trabajador.update(
+        X_base=X_base,
+        X_trabajo=np.array(X_base),
+        y=np.load(ruta_y),
+        interpreter=crear_interprete(model_path, num_threads=1),
+        columnas=columnas,
+        bloques=bloques,
+        tamano_lote=tamano_lote
+    )
+
+
+def _precision_permutada(tarea):
+    """
+    Baraja una columna original y vuelve a puntuar. Como el one-hot se aplica
+    fila a fila, barajar la columna equivale a barajar su bloque ya codificado,
+    así que no hace falta volver a pasar por el preprocessor.
+    """
+    col, repeticion, semilla = tarea
+    w = _trabajador
+    bloque = w['bloques'][col]
+
+    rng = np.random.default_rng([semilla, w['columnas'].index(col), repeticion])
+    perm = rng.permutation(len(w['y']))
+
+    w['X_trabajo'][:, bloque] = w['X_base'][perm, bloque]
+    probabilidades = predecir_por_bloques(w['interpreter'], w['X_trabajo'], w['tamano_lote'])
+    w['X_trabajo'][:, bloque] = w['X_base'][:, bloque]
+
+    return col, repeticion, float(np.mean(probabilidades.argmax(axis=1) == w['y']))
+
+
+def calcular_importancia(df, model_path=RUTA_MODELO, repeticiones=5, procesos=None,
+                         semilla=42, tamano_lote=16384, confianza=0.95, ruta_bundle=None):
+    """
+    Devuelve (precisión base, tabla de importancias con intervalos de confianza).
+    La importancia es la caída de precisión al barajar cada columna. La entrada
+    se prepara con el bundle del modelo; sin bundle, con un preprocessor
+    ajustado sobre todo el dataset, como en el notebook.
+    """
+    ruta_bundle = ruta_bundle or ruta_bundle_modelo(model_path)
+    if os.path.exists(ruta_bundle):
+        preprocessor, clases = cargar_bundle(ruta_bundle)
+    else:
+        print(f"⚠️ No se encontró {ruta_bundle}: se ajusta el preprocessor sobre el dataset")
+        preprocessor, clases = ajustar_preprocesamiento(df)
+    _, idx_test = indices_division(len(df))
+
+    X_test, y_test = codificar(df.iloc[idx_test], preprocessor, clases)
+    columnas = list(separar_variables(df)[0].columns)
+    bloques = bloques_columnas(preprocessor)
+
+    interpreter = crear_interprete(model_path)
+    precision_base = float(np.mean(
+        predecir_por_bloques(interpreter, X_test, tamano_lote).argmax(axis=1) == y_test))
+
+    tareas = [(col, r, semilla) for col in columnas for r in range(repeticiones)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_X = os.path.join(tmp, 'X_test.npy')
+        ruta_y = os.path.join(tmp, 'y_test.npy')
+        np.save(ruta_X, X_test)
+        np.save(ruta_y, y_test)
+
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=mp.get_context('spawn'),
+                                 initializer=_iniciar_trabajador,
+                                 initargs=(ruta_X, ruta_y, model_path, columnas, bloques, tamano_lote)) as pool:
+            resultados = list(pool.map(_precision_permutada, tareas))
+
+    caidas = pd.DataFrame(resultados, columns=['Variable', 'Repetición', 'Precisión'])
+    caidas['Importancia'] = precision_base - caidas['Precisión']
+
+    tabla = caidas.groupby('Variable', sort=False)['Importancia'].agg(['mean', 'std', 'count'])
+    margen = stats.t.ppf((1 + confianza) / 2, tabla['count'] - 1) * tabla['std'] / np.sqrt(tabla['count'])
+    tabla = pd.DataFrame({
+        'Importancia media': tabla['mean'],
+        'Desv. estándar': tabla['std'],
+        'IC inferior': tabla['mean'] - margen,
+        'IC superior': tabla['mean'] + margen
+    }).sort_values('Importancia media', ascending=False)
+
+    return precision_base, tabla
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importancia por permutación del modelo TFLite")
+    parser.add_argument('--dataset', default=RUTA_DATASET, help="CSV generado por mark3.ipynb")
+    parser.add_argument('--modelo', default=RUTA_MODELO, help="Modelo TFLite a evaluar")
+    parser.add_argument('--bundle', default=None,
+                        help="Bundle de preprocesamiento (por defecto, <modelo>_bundle.json o el de producción)")
+    parser.add_argument('--repeticiones', type=int, default=5, help="Permutaciones por columna")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos trabajadores (por defecto, todos los núcleos)")
+    parser.add_argument('--lote', type=int, default=16384, help="Filas por inferencia")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help="Guardar la tabla en este CSV")
+    args = parser.parse_args()
+
+    print("📊 Importancia por permutación")
+    print("=" * 50)
+
+    inicio = time.perf_counter()
+    df = cargar_dataset(args.dataset)
+    precision_base, tabla = calcular_importancia(
+        df, args.modelo, args.repeticiones, args.procesos, args.semilla, args.lote, ruta_bundle=args.bundle)
+
+    print(f"\nPrecisión base en prueba: {precision_base:.4f}")
+    print(f"Caída de precisión al barajar cada variable (IC 95%, {args.repeticiones} repeticiones):\n")
+    print(tabla.round(4).to_string())
+    print(f"\n✅ Completado en {time.perf_counter() - inicio:.1f} s")
+
+    if args.salida:
+        tabla.to_csv(args.salida)
+        print(f"💾 Tabla guardada en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
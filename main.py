@@ -5,6 +5,7 @@ from kivy.uix.label import Label
 import numpy as np
 import tflite_runtime.interpreter as tflite
 from kivy.utils import platform
+from prediccion_tea import ETIQUETAS
 import os
 
 # Ruta correcta para Android o PC
@@ -43,8 +44,7 @@ class TEAPredictor(BoxLayout):
         output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
 
         pred_idx = int(np.argmax(output_data))
-        etiquetas = ['Desarrollo típico', 'TEA - Nivel 1', 'TEA - Nivel 2', 'TEA - Nivel 3', 'Indeterminado']
-        resultado = etiquetas[pred_idx] if pred_idx < len(etiquetas) else "Resultado desconocido"
+        resultado = ETIQUETAS[pred_idx] if pred_idx < len(ETIQUETAS) else "Resultado desconocido"
         self.result_label.text = f"Diagnóstico: {resultado}"
 
 class AutismoApp(App):
@@ -0,0 +1,256 @@
+"""
+Lectura de modelos .tflite sin TensorFlow y ejecución de la red densa con
+NumPy.
+
+El archivo .tflite es un FlatBuffer con el esquema de TensorFlow Lite
+(schema.fbs). Aquí solo se leen las tablas necesarias: tensores (forma, tipo,
+nombre y datos constantes), operadores con sus opciones, entradas/salidas del
+subgrafo principal y metadatos. Con eso, una red de capas FULLY_CONNECTED
+(con su activación fusionada) y SOFTMAX se evalúa como productos de matrices,
+sin tflite_runtime ni TensorFlow.
+"""
+
+import struct
+
+import numpy as np
+
+# Códigos de BuiltinOperator (schema.fbs) de los operadores que se entienden
+OPERADORES = {9: 'FULLY_CONNECTED', 14: 'LOGISTIC', 19: 'RELU', 21: 'RELU6', 22: 'RESHAPE', 25: 'SOFTMAX', 28: 'TANH'}
+
+# TensorType -> dtype de NumPy
+TIPOS = {0: np.float32, 1: np.float16, 2: np.int32, 3: np.uint8, 4: np.int64, 6: np.bool_, 7: np.int16, 9: np.int8}
+
+# ActivationFunctionType de las opciones de FULLY_CONNECTED
+ACTIVACIONES = {0: None, 1: 'RELU', 3: 'RELU6', 4: 'TANH'}
+
+
+class _Tabla:
+    """Acceso a los campos de una tabla FlatBuffer por su número de campo"""
+
+    def __init__(self, datos, posicion):
+        self.datos = datos
+        self.posicion = posicion
+        self.vtabla = posicion - struct.unpack_from('<i', datos, posicion)[0]
+        self.tamano_vtabla = struct.unpack_from('<H', datos, self.vtabla)[0]
+
+    def _campo(self, i):
+        desplazamiento = 4 + 2 * i
+        if desplazamiento >= self.tamano_vtabla:
+            return None
+        relativo = struct.unpack_from('<H', self.datos, self.vtabla + desplazamiento)[0]
+        return self.posicion + relativo if relativo else None
+
+    def escalar(self, i, formato, defecto=0):
+        p = self._campo(i)
+        return struct.unpack_from('<' + formato, self.datos, p)[0] if p is not None else defecto
+
+    def _destino(self, i):
+        p = self._campo(i)
+        return None if p is None else p + struct.unpack_from('<I', self.datos, p)[0]
+
+    def tabla(self, i):
+        p = self._destino(i)
+        return None if p is None else _Tabla(self.datos, p)
+
+    def vector(self, i, formato):
+        p = self._destino(i)
+        if p is None:
+            return []
+        n = struct.unpack_from('<I', self.datos, p)[0]
+        return list(struct.unpack_from(f'<{n}{formato}', self.datos, p + 4))
+
+    def bytes(self, i):
+        p = self._destino(i)
+        if p is None:
+            return b''
+        n = struct.unpack_from('<I', self.datos, p)[0]
+        return bytes(self.datos[p + 4:p + 4 + n])
+
+    def texto(self, i):
+        return self.bytes(i).decode('utf-8')
+
+    def tablas(self, i):
+        p = self._destino(i)
+        if p is None:
+            return []
+        n = struct.unpack_from('<I', self.datos, p)[0]
+        elementos = [p + 4 + 4 * k for k in range(n)]
+        return [_Tabla(self.datos, e + struct.unpack_from('<I', self.datos, e)[0]) for e in elementos]
+
+
+def leer_modelo(ruta):
+    """
+    Estructura del modelo como diccionarios y listas: versión, descripción,
+    tensores, operadores, entradas/salidas del primer subgrafo y metadatos
+    ({nombre: bytes}).
+    """
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    if len(datos) < 8 or datos[4:8] != b'TFL3':
+        raise ValueError(f"{ruta} no es un modelo TFLite (falta el identificador TFL3)")
+
+    modelo = _Tabla(datos, struct.unpack_from('<I', datos, 0)[0])
+
+    buffers = []
+    for b in modelo.tablas(4):
+        desplazamiento, tamano = b.escalar(1, 'Q'), b.escalar(2, 'Q')
+        # Modelos grandes guardan los datos fuera del FlatBuffer (offset/size)
+        buffers.append(datos[desplazamiento:desplazamiento + tamano] if desplazamiento > 1 else b.bytes(0))
+
+    codigos = [max(c.escalar(0, 'b'), c.escalar(3, 'i')) for c in modelo.tablas(1)]
+
+    subgrafos = modelo.tablas(2)
+    if not subgrafos:
+        raise ValueError(f"{ruta} no tiene subgrafos")
+    subgrafo = subgrafos[0]
+
+    tensores = [{
+        'nombre': t.texto(3),
+        'forma': t.vector(0, 'i'),
+        'forma_firma': t.vector(7, 'i'),
+        'tipo': TIPOS.get(t.escalar(1, 'b')),
+        'buffer': t.escalar(2, 'I')
+    } for t in subgrafo.tablas(0)]
+
+    operadores = []
+    for op in subgrafo.tablas(3):
+        codigo = codigos[op.escalar(0, 'I')]
+        opciones = op.tabla(4)
+        operadores.append({
+            'operador': OPERADORES.get(codigo, f'OPERADOR_{codigo}'),
+            'entradas': op.vector(1, 'i'),
+            'salidas': op.vector(2, 'i'),
+            # Primer campo de las opciones: activación fusionada (FULLY_CONNECTED) o beta (SOFTMAX)
+            'activacion': (ACTIVACIONES.get(opciones.escalar(0, 'b'), 'OTRA')
+                           if opciones is not None and codigo == 9 else None),
+            'beta': opciones.escalar(0, 'f', 1.0) if opciones is not None and codigo == 25 else 1.0
+        })
+
+    return {
+        'version': modelo.escalar(0, 'I'),
+        'descripcion': modelo.texto(3),
+        'tensores': tensores,
+        'operadores': operadores,
+        'entradas': subgrafo.vector(1, 'i'),
+        'salidas': subgrafo.vector(2, 'i'),
+        'buffers': buffers,
+        'metadatos': {m.texto(0): buffers[m.escalar(1, 'I')] for m in modelo.tablas(6)}
+    }
+
+
+def datos_tensor(modelo, indice):
+    """Contenido constante de un tensor (pesos, sesgos) o None si se calcula en ejecución"""
+    tensor = modelo['tensores'][indice]
+    datos = modelo['buffers'][tensor['buffer']]
+    if not datos:
+        return None
+    return np.frombuffer(datos, dtype=tensor['tipo']).reshape(tensor['forma'])
+
+
+def _activar(x, activacion):
+    if activacion == 'RELU':
+        return np.maximum(x, 0, out=x)
+    if activacion == 'RELU6':
+        return np.clip(x, 0, 6, out=x)
+    if activacion == 'TANH':
+        return np.tanh(x, out=x)
+    if activacion == 'LOGISTIC':
+        return 1 / (1 + np.exp(-x))
+    return x
+
+
+class RedNumpy:
+    """Red del .tflite compilada a una lista de pasos de NumPy"""
+
+    def __init__(self, pasos, n_entradas, n_salidas):
+        self.pasos = pasos
+        self.n_entradas = n_entradas
+        self.n_salidas = n_salidas
+
+    @classmethod
+    def desde_tflite(cls, ruta):
+        modelo = leer_modelo(ruta)
+        if len(modelo['entradas']) != 1 or len(modelo['salidas']) != 1:
+            raise ValueError("Solo se admiten modelos con una entrada y una salida")
+
+        pasos = []
+        for op in modelo['operadores']:
+            nombre = op['operador']
+            if nombre == 'FULLY_CONNECTED':
+                pesos = datos_tensor(modelo, op['entradas'][1])
+                sesgo = datos_tensor(modelo, op['entradas'][2]) if len(op['entradas']) > 2 and op['entradas'][2] >= 0 else None
+                if pesos is None or pesos.dtype != np.float32 or op['activacion'] == 'OTRA':
+                    raise ValueError("FULLY_CONNECTED con pesos no constantes, cuantizados o activación no admitida")
+                # TFLite guarda los pesos como (salidas, entradas)
+                pasos.append(('densa', np.ascontiguousarray(pesos.T), sesgo, op['activacion']))
+            elif nombre == 'SOFTMAX':
+                pasos.append(('softmax', op['beta']))
+            elif nombre in ('RELU', 'RELU6', 'TANH', 'LOGISTIC'):
+                pasos.append(('activacion', nombre))
+            elif nombre == 'RESHAPE':
+                continue
+            else:
+                raise ValueError(f"Operador no admitido por el backend NumPy: {nombre}")
+
+        entrada = modelo['tensores'][modelo['entradas'][0]]['forma'][-1]
+        salida = modelo['tensores'][modelo['salidas'][0]]['forma'][-1]
+        return cls(pasos, entrada, salida)
+
+    def predict_proba(self, X):
+        x = np.asarray(X, dtype=np.float32)
+        for paso in self.pasos:
+            if paso[0] == 'densa':
+                _, pesos, sesgo, activacion = paso
+                x = x @ pesos
+                if sesgo is not None:
+                    x += sesgo
+                x = _activar(x, activacion)
+            elif paso[0] == 'softmax':
+                x = x * paso[1] if paso[1] != 1.0 else x
+                x = np.exp(x - x.max(axis=1, keepdims=True))
+                x /= x.sum(axis=1, keepdims=True)
+            else:
+                x = _activar(x, paso[1])
+        return x
+
+
+class InterpreteNumpy:
+    """
+    Adaptador con la interfaz del intérprete TFLite para usar RedNumpy donde
+    se usa tflite_runtime (como InterpreteArboles para los árboles).
+    """
+
+    def __init__(self, model_path):
+        self.modelo = RedNumpy.desde_tflite(model_path)
+        self._forma_entrada = np.array([1, self.modelo.n_entradas], dtype=np.int32)
+        self._entrada = None
+        self._salida = None
+
+    def get_input_details(self):
+        return [{'name': 'entrada', 'index': 0, 'shape': self._forma_entrada.copy(),
+                 'shape_signature': np.array([-1, self.modelo.n_entradas], dtype=np.int32),
+                 'dtype': np.float32}]
+
+    def get_output_details(self):
+        return [{'name': 'probabilidades', 'index': 1,
+                 'shape': np.array([self._forma_entrada[0], self.modelo.n_salidas], dtype=np.int32),
+                 'shape_signature': np.array([-1, self.modelo.n_salidas], dtype=np.int32),
+                 'dtype': np.float32}]
+
+    def resize_tensor_input(self, index, shape):
+        self._forma_entrada = np.array(shape, dtype=np.int32)
+
+    def allocate_tensors(self):
+        pass
+
+    def set_tensor(self, index, value):
+        if tuple(value.shape) != tuple(self._forma_entrada):
+            raise ValueError(f"Se esperaba una entrada de forma {tuple(self._forma_entrada)}, "
+                             f"se recibió {tuple(value.shape)}")
+        self._entrada = value
+
+    def invoke(self):
+        self._salida = self.modelo.predict_proba(self._entrada)
+
+    def get_tensor(self, index):
+        return self._entrada.copy() if index == 0 else self._salida.copy()
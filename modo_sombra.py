@@ -0,0 +1,107 @@
+"""
+Modo sombra: cada predicción de la app se vuelve a puntuar, en un hilo aparte
+y fuera del camino de la respuesta, con un modelo candidato.
+
+Se acumulan la tasa de acuerdo, la matriz de cambios por clase (filas: modelo
+en producción, columnas: candidato) y la latencia de ambos modelos. La cola es
+pequeña y acotada: si el hilo no da abasto, las peticiones sombra se descartan
+(y se cuentan) en lugar de esperar, así que la latencia del usuario no cambia.
+"""
+
+import collections
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import ETIQUETAS, crear_interprete, predecir_probabilidades
+from datos_tea import RUTA_BUNDLE, cargar_bundle
+from codec_paciente import empaquetar_paciente
+from puntuacion_lote import codificar_claves
+
+RUTA_CANDIDATO = 'modelo_candidato.tflite'
+
+
+def ruta_bundle_candidato(ruta_modelo):
+    """Bundle exportado junto al candidato (entrenar.py) o, si no hay, el de producción"""
+    ruta = os.path.splitext(ruta_modelo)[0] + '_bundle.json'
+    return ruta if os.path.exists(ruta) else RUTA_BUNDLE
+
+
+def inferencia_cronometrada(interpreter, X):
+    """
+    Probabilidades y segundos de la inferencia, medidos igual para los dos
+    modelos: solo predecir_probabilidades, sin colas ni hilos alrededor.
+    """
+    inicio = time.perf_counter()
+    probabilidades = predecir_probabilidades(interpreter, X)
+    return probabilidades, time.perf_counter() - inicio
+
+
+class ModoSombra:
+    def __init__(self, ruta_candidato=RUTA_CANDIDATO, ruta_bundle=None, tamano_cola=32, muestras_latencia=10000):
+        self.ruta_candidato = ruta_candidato
+        self.preprocessor, clases = cargar_bundle(ruta_bundle or ruta_bundle_candidato(ruta_candidato))
+        if list(clases) != ETIQUETAS:
+            raise ValueError(f"Las clases del candidato {list(clases)} no coinciden con {ETIQUETAS}")
+        self.interpreter = crear_interprete(ruta_candidato, num_threads=1)
+
+        self.cola = queue.Queue(maxsize=tamano_cola)
+        self.cambios = np.zeros((len(ETIQUETAS), len(ETIQUETAS)), dtype=np.int64)
+        self.latencias_produccion = collections.deque(maxlen=muestras_latencia)
+        self.latencias_candidato = collections.deque(maxlen=muestras_latencia)
+        self.descartadas = 0
+        self.errores = 0
+        self._candado = threading.Lock()
+
+        self._hilo = threading.Thread(target=self._puntuar, name='modo_sombra', daemon=True)
+        self._hilo.start()
+
+    def enviar(self, datos_usuario, probabilidades, latencia_produccion):
+        """
+        Encola la petición para el candidato; nunca espera. Las latencias son
+        solo de la inferencia, para comparar los dos modelos en igualdad.
+        """
+        try:
+            self.cola.put_nowait((datos_usuario, int(np.argmax(probabilidades)), latencia_produccion))
+        except queue.Full:
+            self.descartadas += 1
+
+    def _puntuar(self):
+        while True:
+            datos_usuario, clase_produccion, latencia_produccion = self.cola.get()
+            try:
+                X = codificar_claves(np.array([empaquetar_paciente(datos_usuario)], dtype=np.uint64),
+                                     self.preprocessor)
+                probabilidades, latencia_candidato = inferencia_cronometrada(self.interpreter, X)
+                clase_candidato = int(probabilidades.argmax())
+            except Exception:
+                self.errores += 1
+                continue
+            with self._candado:
+                self.cambios[clase_produccion, clase_candidato] += 1
+                self.latencias_produccion.append(latencia_produccion)
+                self.latencias_candidato.append(latencia_candidato)
+
+    def metricas(self):
+        """Acuerdo, matriz de cambios y percentiles de latencia (ms) de ambos modelos"""
+        with self._candado:
+            cambios = self.cambios.copy()
+            latencias = {'Producción': np.array(self.latencias_produccion) * 1000,
+                         'Candidato': np.array(self.latencias_candidato) * 1000}
+        evaluadas = int(cambios.sum())
+        return {
+            'evaluadas': evaluadas,
+            'descartadas': self.descartadas,
+            'errores': self.errores,
+            'acuerdo': float(np.trace(cambios) / evaluadas) if evaluadas else float('nan'),
+            'cambios': pd.DataFrame(cambios, index=ETIQUETAS, columns=ETIQUETAS),
+            'latencias': pd.DataFrame({
+                nombre: ([np.percentile(valores, 50), np.percentile(valores, 99), valores.mean()]
+                         if len(valores) else [np.nan] * 3)
+                for nombre, valores in latencias.items()
+            }, index=['p50 (ms)', 'p99 (ms)', 'media (ms)'])
+        }
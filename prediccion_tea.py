@@ -0,0 +1,228 @@
+"""
+Definiciones compartidas del predictor de TEA: variables clínicas, puntaje de
+riesgo e inferencia por lotes con el modelo TFLite.
+
+Solo depende de NumPy al importarse: pandas se importa dentro de las funciones
+que lo usan, para que los frontends ligeros (Kivy, tkinter, PyQt con
+tflite_runtime) no lo necesiten.
+"""
+
+import numpy as np
+
+try:
+    import tflite_runtime.interpreter as tflite
+except ImportError:
+    tflite = None
+
+# Opciones de cada variable categórica (basadas en el dataset de entrenamiento)
+OPCIONES_VARIABLES = {
+    'Sexo': ['Masculino', 'Femenino'],
+    'Lenguaje': ['No verbal', 'Ecolalia', 'Frases simples', 'Lenguaje funcional'],
+    'Comunicación no verbal': ['Ausente', 'Muy limitada', 'Limitada', 'Adecuada'],
+    'Contacto visual': ['Evitativo', 'Intermitente', 'Sostenido', 'Natural'],
+    'Interacción social': ['Ausente', 'Pasiva', 'Inapropiada', 'Adecuada'],
+    'Respuesta al nombre': ['Nunca', 'A veces', 'Siempre'],
+    'Estereotipias': ['Muy frecuentes', 'Frecuentes', 'Ocasionales', 'Ausentes'],
+    'Intereses restringidos': ['Muy intensos', 'Persistentes', 'Leves', 'Ausentes'],
+    'Regulación emocional': ['Autolesiva', 'Crisis frecuentes', 'Ocasionales', 'Adecuada'],
+    'TDAH': ['Sí', 'No'],
+    'Discapacidad intelectual': ['Sí', 'No'],
+    'Hipersensibilidad sensorial': ['Alta', 'Moderada', 'Leve', 'Ninguna'],
+    'Trastornos del sueño': ['Severo', 'Moderado', 'Leve', 'Normal'],
+    'Alimentación selectiva': ['Alta', 'Moderada', 'Leve', 'Ninguna'],
+    'Antecedentes familiares': ['TEA', 'TDAH', 'Discapacidad intelectual', 'Ninguno']
+}
+
+# Columnas categóricas y numéricas (igual que en el entrenamiento)
+COLUMNAS_CATEGORICAS = list(OPCIONES_VARIABLES)
+COLUMNAS_NUMERICAS = ['Edad (meses)', 'Puntaje riesgo']
+
+EDAD_MINIMA, EDAD_MAXIMA = 3, 36
+
+RUTA_MODELO = 'modelo_autismo.tflite'
+
+# Etiquetas en el orden de la salida del modelo: el del LabelEncoder del
+# entrenamiento (alfabético), guardado en 'clases' del bundle
+ETIQUETAS = ['Desarrollo típico', 'Indeterminado', 'TEA - Nivel 1', 'TEA - Nivel 2', 'TEA - Nivel 3']
+
+# Puntos que suma cada respuesta al puntaje de riesgo (máximo 24, ver mark3.ipynb)
+PUNTOS_RIESGO = {
+    'Lenguaje': {'No verbal': 3, 'Ecolalia': 2, 'Frases simples': 1},
+    'Comunicación no verbal': {'Ausente': 3, 'Muy limitada': 2, 'Limitada': 1},
+    'Contacto visual': {'Evitativo': 2, 'Intermitente': 1},
+    'Interacción social': {'Ausente': 3, 'Pasiva': 2, 'Inapropiada': 1},
+    'Respuesta al nombre': {'Nunca': 2, 'A veces': 1},
+    'Estereotipias': {'Muy frecuentes': 3, 'Frecuentes': 2, 'Ocasionales': 1},
+    'Intereses restringidos': {'Muy intensos': 2, 'Persistentes': 1},
+    'Regulación emocional': {'Autolesiva': 3, 'Crisis frecuentes': 2, 'Ocasionales': 1},
+    'Discapacidad intelectual': {'Sí': 2},
+    'TDAH': {'Sí': 1}
+}
+
+# Niveles del puntaje de riesgo (puntaje mínimo de cada nivel, de mayor a menor)
+NIVELES_RIESGO = [(18, 'Muy alto'), (15, 'Alto'), (10, 'Moderado'), (6, 'Leve'), (0, 'Muy bajo')]
+
+
+def calcular_puntaje_riesgo(datos):
+    """Calcula el puntaje de riesgo basado en las respuestas clínicas"""
+    return sum(puntos.get(datos[var], 0) for var, puntos in PUNTOS_RIESGO.items())
+
+
+def nivel_riesgo(puntaje):
+    """Nombre del nivel de riesgo de un puntaje"""
+    return next(nombre for minimo, nombre in NIVELES_RIESGO if puntaje >= minimo)
+
+
+def calcular_puntaje_riesgo_lote(df):
+    """Versión vectorizada de calcular_puntaje_riesgo para un DataFrame de pacientes"""
+    puntaje = np.zeros(len(df), dtype=np.int64)
+    for var, puntos in PUNTOS_RIESGO.items():
+        puntaje += df[var].map(puntos).fillna(0).to_numpy(dtype=np.int64)
+    return puntaje
+
+
+def crear_interprete(model_path=RUTA_MODELO, num_threads=None, backend=None, uso='lotes'):
+    """
+    Carga el modelo TFLite con el backend indicado: 'tflite_runtime',
+    'tensorflow' o 'numpy' (sin dependencias, ver modelo_tflite.py). Sin
+    backend se usa la configuración de `uso` ('interactivo' o 'lotes') del
+    perfil de autotune.py si existe y, si no, tflite_runtime o TensorFlow.
+    Los árboles compilados (.npz) se cargan con la misma interfaz.
+    """
+    if str(model_path).endswith('.npz'):
+        from arboles_compilados import InterpreteArboles
+        return InterpreteArboles(model_path)
+
+    tamano_lote = None
+    if backend is None:
+        from autotune import cargar_perfil
+        perfil = cargar_perfil(model_path)
+        if perfil is not None:
+            backend = perfil[uso]['backend']
+            num_threads = num_threads or perfil[uso]['num_threads']
+            tamano_lote = perfil[uso]['tamano_lote']
+
+    if backend == 'numpy':
+        from modelo_tflite import InterpreteNumpy
+        interpreter = InterpreteNumpy(model_path)
+    elif backend != 'tensorflow' and tflite is not None:
+        interpreter = tflite.Interpreter(model_path=model_path, num_threads=num_threads)
+    else:
+        import tensorflow as tf
+        interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    # Lote preferido del perfil (lo usa predecir_por_bloques si no se indica otro)
+    if tamano_lote and tamano_lote > 1:
+        interpreter.tamano_lote = tamano_lote
+    return interpreter
+
+
+def bloques_columnas(preprocessor):
+    """
+    Posición de cada columna original dentro de la matriz preprocesada:
+    {columna: slice}. El bloque 'cat' va primero y los numéricos al final.
+    """
+    bloques = {}
+    inicio = 0
+    categorias = preprocessor.named_transformers_['cat'].categories_
+    for col, cats in zip(COLUMNAS_CATEGORICAS, categorias):
+        bloques[col] = slice(inicio, inicio + len(cats))
+        inicio += len(cats)
+    for col in COLUMNAS_NUMERICAS:
+        bloques[col] = slice(inicio, inicio + 1)
+        inicio += 1
+    return bloques
+
+
+def predecir_probabilidades(interpreter, X):
+    """
+    Ejecuta una sola inferencia TFLite sobre todas las filas de X.
+    Redimensiona el tensor de entrada cuando cambia el tamaño del lote.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    input_details = interpreter.get_input_details()
+    output_details = interpreter.get_output_details()
+
+    if tuple(input_details[0]['shape']) != X.shape:
+        interpreter.resize_tensor_input(input_details[0]['index'], X.shape)
+        interpreter.allocate_tensors()
+
+    interpreter.set_tensor(input_details[0]['index'], X)
+    interpreter.invoke()
+    return interpreter.get_tensor(output_details[0]['index'])
+
+
+def predecir_por_bloques(interpreter, X, tamano_lote=None):
+    """
+    Inferencia por lotes de tamaño acotado sobre una matriz grande. Por
+    defecto, el lote del perfil de autotune.py o 16384 filas.
+    """
+    tamano_lote = tamano_lote or getattr(interpreter, 'tamano_lote', 16384)
+    if len(X) <= tamano_lote:
+        return predecir_probabilidades(interpreter, X)
+    return np.concatenate([
+        predecir_probabilidades(interpreter, X[inicio:inicio + tamano_lote])
+        for inicio in range(0, len(X), tamano_lote)
+    ])
+
+
+def generar_variantes(datos_usuario):
+    """
+    Construye las variantes de un solo campo del paciente: cada opción alternativa
+    de las variables categóricas y cada edad entre EDAD_MINIMA y EDAD_MAXIMA.
+    La primera fila es el paciente original. Devuelve (variantes, cambios).
+    """
+    import pandas as pd
+
+    base = {var: datos_usuario[var] for var in COLUMNAS_NUMERICAS[:1] + COLUMNAS_CATEGORICAS}
+    filas = [base]
+    cambios = [('Original', '')]
+
+    for var, opciones in OPCIONES_VARIABLES.items():
+        for opcion in opciones:
+            if opcion != base[var]:
+                filas.append({**base, var: opcion})
+                cambios.append((var, opcion))
+
+    for edad in range(EDAD_MINIMA, EDAD_MAXIMA + 1):
+        filas.append({**base, 'Edad (meses)': edad})
+        cambios.append(('Edad (meses)', edad))
+
+    variantes = pd.DataFrame(filas)
+    # El puntaje de riesgo depende de las respuestas, así que se recalcula por variante
+    variantes['Puntaje riesgo'] = calcular_puntaje_riesgo_lote(variantes)
+    return variantes, pd.DataFrame(cambios, columns=['Variable', 'Valor'])
+
+
+def analizar_contrafactuales(interpreter, preprocessor, datos_usuario, predecir=predecir_probabilidades):
+    """
+    Evalúa en una única inferencia por lotes todas las variantes de un campo del
+    paciente. Devuelve la tabla de sensibilidad (variables categóricas) y la
+    curva de probabilidades por edad. `predecir(interpreter, X)` permite pasar
+    la inferencia por una guardia (ver guardia_latencia.py).
+    """
+    import pandas as pd
+
+    variantes, cambios = generar_variantes(datos_usuario)
+    probabilidades = predecir(interpreter, preprocessor.transform(variantes))
+
+    pred_idx = probabilidades.argmax(axis=1)
+    idx_original = pred_idx[0]
+
+    resultados = cambios.assign(**{
+        'Puntaje riesgo': variantes['Puntaje riesgo'].to_numpy(),
+        'Diagnóstico': [ETIQUETAS[i] for i in pred_idx],
+        'Confianza': probabilidades.max(axis=1),
+        'Δ prob. diagnóstico actual': probabilidades[:, idx_original] - probabilidades[0, idx_original],
+        'Cambia diagnóstico': pred_idx != idx_original
+    })
+
+    es_edad = (resultados['Variable'] == 'Edad (meses)').to_numpy()
+    sensibilidad = (resultados.iloc[1:][~es_edad[1:]]
+                    .sort_values(['Cambia diagnóstico', 'Δ prob. diagnóstico actual'],
+                                 ascending=[False, True])
+                    .reset_index(drop=True))
+
+    curva_edad = pd.DataFrame(probabilidades[es_edad], columns=ETIQUETAS)
+    curva_edad.insert(0, 'Edad (meses)', variantes.loc[es_edad, 'Edad (meses)'].to_numpy())
+    return sensibilidad, curva_edad
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de app_streamlit.py con sesiones simuladas.
+
+Arranca la app con `streamlit run` en modo headless (o usa un servidor ya en
+marcha con --url) y abre N sesiones como clientes sin navegador: cada una se
+conecta al websocket de Streamlit, recibe el formulario de la evaluación
+clínica, elige respuestas aleatorias y pulsa "Realizar diagnóstico" siguiendo
+llegadas de Poisson, de modo que el total de envíos por segundo de todas las
+sesiones sea --tasa.
+
+Se mide la latencia de cada rerun tal como la ve el navegador (desde el envío
+hasta el fin del script) y, en paralelo, la CPU y la memoria residente del
+proceso servidor. El informe JSON (con las series en CSV) guarda el commit y la
+versión del modelo para comparar entre versiones con --comparar.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+RUTA_APP = 'app_streamlit.py'
+CARPETA_INFORMES = 'informes_carga'
+BOTON_DIAGNOSTICO = "Realizar diagnóstico"
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class ServidorStreamlit:
+    """`streamlit run` en un subproceso, en un puerto libre, mientras dura el bloque with"""
+
+    def __init__(self, ruta_app=RUTA_APP, puerto=None, espera_maxima=120.0):
+        self.ruta_app = ruta_app
+        self.puerto = puerto or self._puerto_libre()
+        self.espera_maxima = espera_maxima
+        self.url = f'http://localhost:{self.puerto}'
+        self.proceso = None
+
+    @staticmethod
+    def _puerto_libre():
+        with socket.socket() as s:
+            s.bind(('localhost', 0))
+            return s.getsockname()[1]
+
+    def __enter__(self):
+        self.proceso = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', self.ruta_app, '--server.headless', 'true',
+             '--server.port', str(self.puerto), '--server.fileWatcherType', 'none',
+             '--browser.gatherUsageStats', 'false'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        limite = time.monotonic() + self.espera_maxima
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                raise RuntimeError(f"streamlit run terminó con código {self.proceso.returncode}")
+            try:
+                with urllib.request.urlopen(f'{self.url}/_stcore/health', timeout=1) as r:
+                    if r.status == 200:
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"El servidor no respondió en {self.espera_maxima:.0f} s")
+
+    def __exit__(self, *exc):
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+
+
+def _recursos_proceso(pid):
+    """(segundos de CPU, memoria residente en MB) del proceso; psutil o /proc"""
+    try:
+        import psutil
+        proceso = psutil.Process(pid)
+        cpu = proceso.cpu_times()
+        return cpu.user + cpu.system, proceso.memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    with open(f'/proc/{pid}/stat') as f:
+        # Los campos tras el nombre (entre paréntesis); utime y stime son el 14 y 15
+        campos = f.read().rsplit(')', 1)[1].split()
+    with open(f'/proc/{pid}/statm') as f:
+        paginas = int(f.read().split()[1])
+    return ((int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK'),
+            paginas * os.sysconf('SC_PAGE_SIZE') / 2 ** 20)
+
+
+class MonitorRecursos:
+    """Muestrea CPU (% de un núcleo) y memoria residente de un proceso cada `intervalo` segundos"""
+
+    def __init__(self, pid, intervalo=0.5):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.muestras = []
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name='monitor_recursos', daemon=True)
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+
+    def _muestrear(self):
+        try:
+            pared, (cpu, _) = time.perf_counter(), _recursos_proceso(self.pid)
+        except OSError:
+            print(f"⚠️ No se pueden leer los recursos del proceso {self.pid} (instala psutil)")
+            return
+        while not self._parar.wait(self.intervalo):
+            try:
+                pared_act, (cpu_act, rss) = time.perf_counter(), _recursos_proceso(self.pid)
+            except OSError:
+                return
+            self.muestras.append({'segundo': pared_act - self._inicio, 'cpu_s': cpu_act - cpu,
+                                  'cpu_pct': (cpu_act - cpu) / (pared_act - pared) * 100, 'rss_mb': rss})
+            pared, cpu = pared_act, cpu_act
+
+
+def conectar(url, tiempo_maximo=60.0):
+    """Conexión websocket de una sesión nueva (usar con with)"""
+    from websockets.sync.client import connect
+
+    return connect(url.replace('http', 'ws', 1) + '/_stcore/stream', subprotocols=['streamlit'],
+                   max_size=None, open_timeout=tiempo_maximo)
+
+
+class SesionStreamlit:
+    """
+    Cliente sin navegador de una sesión de la app: envía reruns con el estado
+    de los widgets y recoge los elementos que dibuja el script.
+    """
+
+    def __init__(self, conexion, tiempo_maximo=60.0):
+        self.conexion = conexion
+        self.tiempo_maximo = tiempo_maximo
+        self.widgets = {}  # etiqueta -> (tipo, proto del widget)
+        self.estados = {}  # id -> WidgetState que persiste entre reruns
+        self.elementos = []
+
+    def rerun(self, disparar=None):
+        """Ejecuta el script (pulsando el botón `disparar`, si se indica) y espera a que termine"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        mensaje = BackMsg()
+        mensaje.rerun_script.query_string = ''
+        mensaje.rerun_script.widget_states.widgets.extend(self.estados.values())
+        if disparar is not None:
+            boton = mensaje.rerun_script.widget_states.widgets.add()
+            boton.id = self.widgets[disparar][1].id
+            boton.trigger_value = True
+        self.conexion.send(mensaje.SerializeToString())
+
+        self.elementos = []
+        while True:
+            respuesta = ForwardMsg()
+            respuesta.ParseFromString(self.conexion.recv(self.tiempo_maximo))
+            tipo = respuesta.WhichOneof('type')
+            if tipo == 'delta' and respuesta.delta.WhichOneof('type') == 'new_element':
+                elemento = respuesta.delta.new_element
+                self.elementos.append(elemento)
+                clase = elemento.WhichOneof('type')
+                if clase in ('selectbox', 'slider', 'button', 'text_input'):
+                    widget = getattr(elemento, clase)
+                    self.widgets[widget.label] = (clase, widget)
+            elif tipo == 'script_finished':
+                return respuesta.script_finished
+
+    def elegir(self, etiqueta, valor):
+        """
+        Fija el valor de un selectbox, slider o campo de texto para los
+        próximos reruns. Devuelve True si un navegador haría un rerun ahora:
+        el valor cambia y el widget no está dentro de un st.form. El formato
+        del estado sale del esquema de la versión de Streamlit instalada, que
+        es la del servidor que arranca ServidorStreamlit.
+        """
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        clase, widget = self.widgets[etiqueta]
+        estado = WidgetState(id=widget.id)
+        if clase == 'slider':
+            estado.double_array_value.data.extend([valor])
+        elif clase == 'selectbox' and 'raw_value' not in widget.DESCRIPTOR.fields_by_name:
+            # Streamlit anterior a raw_value (p. ej. la 1.28 de requirements.txt) espera el índice
+            estado.int_value = list(widget.options).index(valor)
+        else:
+            estado.string_value = valor
+        anterior = self.estados.get(widget.id)
+        if anterior is None:
+            cambia = valor != self._valor_inicial(clase, widget)
+        else:
+            cambia = anterior != estado
+        self.estados[widget.id] = estado
+        return cambia and not widget.form_id
+
+    @staticmethod
+    def _valor_inicial(clase, widget):
+        if clase == 'selectbox':
+            return widget.options[widget.default] if widget.HasField('default') else None
+        if clase == 'slider':
+            return widget.default[0]
+        return widget.default
+
+    def respuestas_aleatorias(self, rng):
+        """(etiqueta, valor) aleatorios para todos los selectbox y sliders de la página"""
+        for etiqueta, (clase, widget) in list(self.widgets.items()):
+            if clase == 'selectbox':
+                yield etiqueta, widget.options[rng.integers(len(widget.options))]
+            elif clase == 'slider':
+                yield etiqueta, float(rng.integers(widget.min, widget.max + 1))
+
+    def resultado(self):
+        """Qué vio el usuario tras el último rerun"""
+        from streamlit.proto.Alert_pb2 import Alert
+
+        alertas = [(e.alert.format, e.alert.body) for e in self.elementos if e.WhichOneof('type') == 'alert']
+        if any(e.WhichOneof('type') == 'exception' for e in self.elementos):
+            return 'excepcion'
+        if any(cuerpo.startswith("⏳") for _, cuerpo in alertas):
+            return 'rechazada'
+        if any("Estimación por puntaje" in cuerpo for _, cuerpo in alertas):
+            return 'respaldo'
+        if any(formato == Alert.ERROR for formato, _ in alertas):
+            return 'error'
+        return 'ok'
+
+
+def sesion(indice, url, intervalo_medio, salida, duracion, semilla, paciente, tiempo_maximo, resultados):
+    """
+    Una sesión simulada: carga la app, espera a que todas estén cargadas
+    (`salida`, una Barrier) y envía evaluaciones durante `duracion` segundos.
+    Como un navegador, cada respuesta que cambia fuera de un st.form provoca
+    un rerun ('cambio') antes del envío.
+    """
+    rng = np.random.default_rng([semilla, indice])
+    try:
+        with conectar(url, tiempo_maximo) as conexion:
+            cliente = SesionStreamlit(conexion, tiempo_maximo)
+
+            def medir(tipo, disparar=None):
+                inicio = time.perf_counter()
+                try:
+                    cliente.rerun(disparar)
+                    resultado = cliente.resultado()
+                except TimeoutError:
+                    resultado = 'tiempo_agotado'
+                resultados.append({'sesion': indice, 'tipo': tipo, 'instante': inicio,
+                                   'latencia_ms': (time.perf_counter() - inicio) * 1000, 'resultado': resultado})
+                return resultado
+
+            medir('carga')
+            boton = next(e for e in cliente.widgets if BOTON_DIAGNOSTICO in e)
+
+            try:
+                salida.wait()
+            except threading.BrokenBarrierError:
+                return
+            fin = time.perf_counter() + duracion
+            proximo = time.perf_counter() + rng.exponential(intervalo_medio)
+            while proximo < fin:
+                time.sleep(max(proximo - time.perf_counter(), 0))
+                respuestas = list(cliente.respuestas_aleatorias(rng))
+                if paciente:
+                    respuestas.append((next(e for e in cliente.widgets if e.startswith("Identificador del paciente")),
+                                       f'{paciente}-{indice}'))
+                for etiqueta, valor in respuestas:
+                    if cliente.elegir(etiqueta, valor):
+                        medir('cambio')
+                if medir('envio', disparar=boton) == 'tiempo_agotado':
+                    break
+                # Si la app va más lenta que la tasa, el siguiente envío sale al terminar este
+                proximo = max(proximo + rng.exponential(intervalo_medio), time.perf_counter())
+    except Exception:
+        # Que las demás sesiones no se queden esperando a esta
+        salida.abort()
+        raise
+
+
+def ejecutar_prueba(url, pid=None, sesiones=8, tasa=4.0, duracion=60.0, semilla=42, paciente=None,
+                    intervalo_muestreo=0.5, tiempo_maximo=60.0):
+    """
+    Lanza las sesiones contra el servidor y devuelve (envíos, serie de
+    recursos del proceso `pid`) como DataFrames. `tasa` es el total de envíos
+    por segundo entre todas las sesiones; la duración cuenta desde que todas
+    cargaron la app.
+    """
+    resultados = []
+    salida = threading.Barrier(sesiones)
+    hilos = [threading.Thread(target=sesion, name=f'sesion-{i}',
+                              args=(i, url, sesiones / tasa, salida, duracion, semilla, paciente,
+                                    tiempo_maximo, resultados))
+             for i in range(sesiones)]
+    origen = time.perf_counter()
+    monitor = MonitorRecursos(pid, intervalo_muestreo) if pid is not None else contextlib.nullcontext()
+    with monitor:
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+    envios = pd.DataFrame(resultados, columns=['sesion', 'tipo', 'instante', 'latencia_ms', 'resultado'])
+    envios['instante'] -= origen
+    recursos = pd.DataFrame(getattr(monitor, 'muestras', []), columns=['segundo', 'cpu_s', 'cpu_pct', 'rss_mb'])
+    return envios.sort_values('instante', ignore_index=True), recursos
+
+
+def _percentiles(latencias):
+    if len(latencias) == 0:
+        return {f'p{p}_ms': None for p in PERCENTILES}
+    return {f'p{p}_ms': float(np.percentile(latencias, p)) for p in PERCENTILES}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def resumir(envios, recursos, configuracion):
+    """Informe comparable entre versiones"""
+    from registro_auditoria import version_modelo
+    from prediccion_tea import RUTA_MODELO
+
+    cargas = envios[envios['tipo'] == 'carga']
+    reruns = envios[envios['tipo'] == 'envio']
+    cambios = envios[envios['tipo'] == 'cambio']
+    hay_recursos = len(recursos) > 0
+    # CPU del servidor desde que todas las sesiones cargaron la app
+    interaccion = envios.loc[envios['tipo'] != 'carga', 'instante'].min()
+    cpu_interaccion = recursos.loc[recursos['segundo'] > interaccion, 'cpu_s'].sum() if hay_recursos else None
+    return {
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _commit(),
+        'version_modelo': f'{version_modelo(RUTA_MODELO):08x}' if os.path.exists(RUTA_MODELO) else None,
+        'maquina': {'sistema': platform.platform(), 'cpus': os.cpu_count(), 'python': platform.python_version()},
+        'configuracion': configuracion,
+        'envios': {
+            'total': len(reruns),
+            'por_segundo': len(reruns) / configuracion['duracion'],
+            'resultados': {k: int(v) for k, v in reruns['resultado'].value_counts().items()},
+            'media_ms': float(reruns['latencia_ms'].mean()) if len(reruns) else None,
+            'max_ms': float(reruns['latencia_ms'].max()) if len(reruns) else None,
+            **_percentiles(reruns['latencia_ms']),
+            'cambios_por_envio': len(cambios) / len(reruns) if len(reruns) else None
+        },
+        'carga_inicial': _percentiles(cargas['latencia_ms']),
+        'recursos': {
+            'cpu_media_pct': float(recursos['cpu_pct'].mean()) if hay_recursos else None,
+            'cpu_max_pct': float(recursos['cpu_pct'].max()) if hay_recursos else None,
+            'cpu_s_por_envio': float(cpu_interaccion / len(reruns)) if hay_recursos and len(reruns) else None,
+            'rss_inicial_mb': float(recursos['rss_mb'].iloc[0]) if hay_recursos else None,
+            'rss_max_mb': float(recursos['rss_mb'].max()) if hay_recursos else None,
+            'rss_final_mb': float(recursos['rss_mb'].iloc[-1]) if hay_recursos else None
+        }
+    }
+
+
+def comparar(anterior, actual):
+    """Métricas principales de dos informes con la variación porcentual"""
+    metricas = ([('envios', 'por_segundo'), ('envios', 'media_ms')] +
+                [('envios', f'p{p}_ms') for p in PERCENTILES] +
+                [('envios', 'cambios_por_envio'), ('carga_inicial', 'p50_ms'), ('recursos', 'cpu_media_pct'),
+                 ('recursos', 'cpu_s_por_envio'), ('recursos', 'rss_max_mb')])
+    filas = []
+    for seccion, clave in metricas:
+        a, b = anterior[seccion].get(clave), actual[seccion].get(clave)
+        cambio = (b - a) / a * 100 if a and b is not None else float('nan')
+        filas.append((f'{seccion}.{clave}', a, b, cambio))
+    return pd.DataFrame(filas, columns=['Métrica', f"Anterior ({anterior.get('commit')})",
+                                        f"Actual ({actual.get('commit')})", '% cambio'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la app Streamlit con sesiones simuladas")
+    parser.add_argument('--sesiones', type=int, default=8, help="Sesiones (clínicos) simultáneas")
+    parser.add_argument('--tasa', type=float, default=4.0, help="Envíos por segundo entre todas las sesiones")
+    parser.add_argument('--duracion', type=float, default=60.0, help="Segundos de envíos")
+    parser.add_argument('--app', default=RUTA_APP)
+    parser.add_argument('--url', default=None,
+                        help="Servidor ya en marcha (p. ej. http://localhost:8501); por defecto se arranca uno")
+    parser.add_argument('--pid', type=int, default=None, help="Proceso del servidor de --url para medir sus recursos")
+    parser.add_argument('--paciente', default=None,
+                        help="Prefijo de identificador de paciente (guarda las evaluaciones en el historial)")
+    parser.add_argument('--muestreo', type=float, default=0.5, help="Segundos entre muestras de CPU y memoria")
+    parser.add_argument('--salida', default=None, help="Informe JSON (por defecto, en informes_carga/)")
+    parser.add_argument('--comparar', default=None, help="Informe JSON anterior con el que comparar")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    print("🏋️ Prueba de carga de la app")
+    print("=" * 50)
+    print(f"   {args.sesiones} sesiones | {args.tasa:g} envíos/s | {args.duracion:g} s")
+
+    configuracion = {'sesiones': args.sesiones, 'tasa': args.tasa, 'duracion': args.duracion,
+                     'paciente': args.paciente is not None, 'semilla': args.semilla}
+    if args.url:
+        envios, recursos = ejecutar_prueba(args.url, args.pid, args.sesiones, args.tasa, args.duracion,
+                                           args.semilla, args.paciente, args.muestreo)
+    else:
+        with ServidorStreamlit(args.app) as servidor:
+            print(f"   Servidor en {servidor.url} (pid {servidor.proceso.pid})")
+            envios, recursos = ejecutar_prueba(servidor.url, servidor.proceso.pid, args.sesiones, args.tasa,
+                                               args.duracion, args.semilla, args.paciente, args.muestreo)
+    informe = resumir(envios, recursos, configuracion)
+
+    e, r = informe['envios'], informe['recursos']
+    print(f"\n   Envíos: {e['total']:,} ({e['por_segundo']:.2f}/s) | {e['resultados']}")
+    if e['cambios_por_envio']:
+        print(f"   Reruns por cambios de respuesta: {e['cambios_por_envio']:.1f} por envío")
+    if e['total']:
+        print("   Latencia del rerun: " + " | ".join(f"p{p} {e[f'p{p}_ms']:.0f} ms" for p in PERCENTILES))
+    if informe['carga_inicial']['p50_ms'] is not None:
+        print(f"   Carga inicial de la app: p50 {informe['carga_inicial']['p50_ms']:.0f} ms")
+    if r['cpu_media_pct'] is not None:
+        print(f"   CPU del servidor: media {r['cpu_media_pct']:.0f}% | máx {r['cpu_max_pct']:.0f}% | "
+              f"{r['cpu_s_por_envio'] * 1000:.0f} ms por envío")
+        print(f"   Memoria residente: {r['rss_inicial_mb']:.0f} → {r['rss_final_mb']:.0f} MB "
+              f"(máx {r['rss_max_mb']:.0f} MB)")
+
+    salida = args.salida
+    if salida is None:
+        os.makedirs(CARPETA_INFORMES, exist_ok=True)
+        salida = os.path.join(CARPETA_INFORMES, time.strftime('carga_%Y%m%d_%H%M%S.json'))
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    base = os.path.splitext(salida)[0]
+    recursos.to_csv(base + '_recursos.csv', index=False)
+    envios.to_csv(base + '_envios.csv', index=False)
+    print(f"💾 Informe guardado en {salida} (series en {base}_recursos.csv y {base}_envios.csv)")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        print(f"\nComparación con {args.comparar}:")
+        print(comparar(anterior, informe).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Puntuación masiva de pacientes: se deduplican las filas por su clave uint64
+(codec_paciente) y solo se ejecuta la inferencia sobre las filas únicas.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import (
+    OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS, PUNTOS_RIESGO, RUTA_MODELO,
+    crear_interprete, predecir_por_bloques
+)
+from codec_paciente import empaquetar_df, desempaquetar
+from datos_tea import RUTA_DATASET, cargar_dataset, ajustar_preprocesamiento, cargar_bundle, ruta_bundle_modelo
+
+# Puntos de riesgo por índice de opción, para calcular el puntaje desde los códigos
+PUNTOS_POR_INDICE = np.array([
+    [PUNTOS_RIESGO.get(col, {}).get(opcion, 0) for opcion in OPCIONES_VARIABLES[col]] + [0] * (4 - len(OPCIONES_VARIABLES[col]))
+    for col in COLUMNAS_CATEGORICAS
+])
+
+
+def codificar_claves(claves, preprocessor):
+    """
+    Matriz preprocesada (float32) construida directamente desde las claves, sin
+    pasar por texto. Equivale a preprocessor.transform(desempaquetar_df(claves)).
+    """
+    edades, codigos = desempaquetar(claves)
+    categorias = preprocessor.named_transformers_['cat'].categories_
+    escalador = preprocessor.named_transformers_['num']
+
+    n_cat = sum(len(cats) for cats in categorias)
+    X = np.zeros((len(edades), n_cat + 2), dtype=np.float32)
+    filas = np.arange(len(edades))
+
+    inicio = 0
+    for j, (col, cats) in enumerate(zip(COLUMNAS_CATEGORICAS, categorias)):
+        # Columna del one-hot para cada índice de opción (-1 si el encoder no la vio)
+        posicion = {cat: i for i, cat in enumerate(cats)}
+        destino = np.array([posicion.get(opcion, -1) for opcion in OPCIONES_VARIABLES[col]])[codigos[:, j]]
+        conocidas = destino >= 0
+        X[filas[conocidas], inicio + destino[conocidas]] = 1.0
+        inicio += len(cats)
+
+    puntaje = PUNTOS_POR_INDICE[np.arange(len(COLUMNAS_CATEGORICAS)), codigos].sum(axis=1)
+    X[:, inicio:] = (np.column_stack([edades, puntaje]) - escalador.mean_) / escalador.scale_
+    return X
+
+
+def _estadisticas(filas, filas_unicas, duracion):
+    return {
+        'filas': filas,
+        'filas_unicas': filas_unicas,
+        'ratio_deduplicacion': filas / max(filas_unicas, 1),
+        'segundos': duracion,
+        'filas_por_segundo': filas / duracion if duracion > 0 else float('inf')
+    }
+
+
+def puntuar_claves(interpreter, preprocessor, claves, tamano_lote=None):
+    """
+    Probabilidades (n, clases) para cada clave de paciente en su orden
+    original; la inferencia se hace solo sobre las claves únicas.
+    """
+    inicio = time.perf_counter()
+    unicas, inversa = np.unique(claves, return_inverse=True)
+    probabilidades = predecir_por_bloques(interpreter, codificar_claves(unicas, preprocessor), tamano_lote)
+    estadisticas = _estadisticas(len(claves), len(unicas), time.perf_counter() - inicio)
+    return probabilidades[inversa.ravel()], estadisticas
+
+
+def puntuar_pacientes(interpreter, preprocessor, df, tamano_lote=None):
+    """
+    Probabilidades (n, clases) para cada fila de df en su orden original.
+    Devuelve también las estadísticas de deduplicación.
+    """
+    inicio = time.perf_counter()
+    probabilidades, estadisticas = puntuar_claves(interpreter, preprocessor, empaquetar_df(df), tamano_lote)
+    estadisticas = _estadisticas(estadisticas['filas'], estadisticas['filas_unicas'], time.perf_counter() - inicio)
+    return probabilidades, estadisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntuación masiva de pacientes con deduplicación")
+    parser.add_argument('entrada', help="CSV con las variables de entrada de cada paciente")
+    parser.add_argument('--salida', default='predicciones.csv', help="CSV de salida")
+    parser.add_argument('--modelo', default=RUTA_MODELO)
+    parser.add_argument('--bundle', default=None,
+                        help="Bundle de preprocesamiento (por defecto, <modelo>_bundle.json o el de producción)")
+    parser.add_argument('--dataset', default=RUTA_DATASET, help="Dataset para ajustar el preprocessor si no hay bundle")
+    parser.add_argument('--lote', type=int, default=None, help="Filas por inferencia (por defecto, las del perfil o 16384)")
+    args = parser.parse_args()
+
+    print("📦 Puntuación masiva")
+    print("=" * 50)
+
+    # El mismo preprocesamiento que la app: el bundle exportado con el modelo
+    ruta_bundle = args.bundle or ruta_bundle_modelo(args.modelo)
+    if os.path.exists(ruta_bundle):
+        preprocessor, clases = cargar_bundle(ruta_bundle)
+        print(f"   Preprocessor: {ruta_bundle}")
+    else:
+        print(f"⚠️ No se encontró {ruta_bundle}: se ajusta el preprocessor sobre {args.dataset}")
+        preprocessor, clases = ajustar_preprocesamiento(cargar_dataset(args.dataset))
+    interpreter = crear_interprete(args.modelo)
+    df = pd.read_csv(args.entrada)
+
+    probabilidades, est = puntuar_pacientes(interpreter, preprocessor, df, args.lote)
+
+    df['Predicción'] = np.asarray(clases)[probabilidades.argmax(axis=1)]
+    df['Confianza'] = probabilidades.max(axis=1)
+    for i, clase in enumerate(clases):
+        df[f'P({clase})'] = probabilidades[:, i]
+    df.to_csv(args.salida, index=False)
+
+    print(f"   Filas: {est['filas']:,} | Únicas: {est['filas_unicas']:,} "
+          f"| Ratio de deduplicación: {est['ratio_deduplicacion']:.2f}x")
+    print(f"   Tiempo: {est['segundos']:.2f} s ({est['filas_por_segundo']:,.0f} filas/s)")
+    print(f"✅ Predicciones guardadas en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
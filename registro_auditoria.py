@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Registro de auditoría de predicciones en archivos binarios de solo anexado.
+
+Cada predicción es un registro de 32 bytes (REGISTRO): clave uint64 del
+paciente (codec_paciente), instante en microsegundos, versión del modelo
+(hash del archivo), probabilidades en float16 y clase predicha. Los archivos
+empiezan con una cabecera de 16 bytes y se leen con np.memmap sin copiar.
+
+La app solo encola el registro (registrar no bloquea nunca); un hilo en
+segundo plano los escribe por tandas y rota de archivo al llegar al límite de
+registros. Si la cola está llena el registro se descarta y se cuenta; si
+falla la escritura (p. ej. disco lleno), se cuenta la tanda perdida y el hilo
+vuelve a abrir el archivo en la siguiente.
+
+La herramienta de repetición vuelve a puntuar el histórico con otro modelo y
+cuenta cuántos diagnósticos cambiarían.
+"""
+
+import argparse
+import atexit
+import glob
+import hashlib
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import ETIQUETAS, RUTA_MODELO
+
+CARPETA_AUDITORIA = 'auditoria'
+REGISTROS_POR_ARCHIVO = 1_000_000
+
+N_CLASES = len(ETIQUETAS)
+
+REGISTRO = np.dtype([
+    ('clave', '<u8'),
+    ('marca_us', '<i8'),
+    ('version', '<u4'),
+    ('probabilidades', '<f2', (N_CLASES,)),
+    ('clase', 'u1'),
+    ('reserva', 'u1')
+])
+
+# Cabecera: firma, tamaño del registro y número de clases
+FIRMA = b'TEAAUD01'
+CABECERA = struct.Struct('<8sII')
+
+
+def version_modelo(ruta_modelo=RUTA_MODELO):
+    """Identificador uint32 del modelo: primeros 4 bytes del SHA-256 del archivo"""
+    with open(ruta_modelo, 'rb') as f:
+        return int.from_bytes(hashlib.sha256(f.read()).digest()[:4], 'little')
+
+
+def archivos_registro(carpeta=CARPETA_AUDITORIA):
+    return sorted(glob.glob(os.path.join(carpeta, 'auditoria_*.bin')))
+
+
+def leer_registros(ruta):
+    """Registros de un archivo como array estructurado mapeado en memoria"""
+    with open(ruta, 'rb') as f:
+        firma, tamano, n_clases = CABECERA.unpack(f.read(CABECERA.size))
+    if firma != FIRMA or tamano != REGISTRO.itemsize or n_clases != N_CLASES:
+        raise ValueError(f"{ruta} no es un registro de auditoría compatible")
+    n = (os.path.getsize(ruta) - CABECERA.size) // REGISTRO.itemsize
+    if n == 0:
+        return np.empty(0, dtype=REGISTRO)
+    return np.memmap(ruta, dtype=REGISTRO, mode='r', offset=CABECERA.size, shape=(n,))
+
+
+class RegistroAuditoria:
+    def __init__(self, version, carpeta=CARPETA_AUDITORIA, registros_por_archivo=REGISTROS_POR_ARCHIVO,
+                 tamano_cola=10000, registros_por_tanda=1024):
+        self.version = version
+        self.carpeta = carpeta
+        self.registros_por_archivo = registros_por_archivo
+        self.registros_por_tanda = registros_por_tanda
+        self.cola = queue.Queue(maxsize=tamano_cola)
+        self.escritos = 0
+        self.descartados = 0
+        self.fallidos = 0
+
+        os.makedirs(carpeta, exist_ok=True)
+        self._archivo, self._en_archivo = self._abrir()
+        self._hilo = threading.Thread(target=self._escribir, name='registro_auditoria', daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def registrar(self, clave, probabilidades):
+        """Encola una predicción sin bloquear"""
+        try:
+            self.cola.put_nowait((clave, time.time_ns() // 1000, probabilidades))
+        except queue.Full:
+            self.descartados += 1
+
+    def cerrar(self):
+        """Escribe lo pendiente y cierra el archivo actual"""
+        if self._hilo.is_alive():
+            self.cola.put(None)
+            self._hilo.join()
+
+    def _abrir(self):
+        """Continúa el último archivo si no está lleno; si no, crea el siguiente"""
+        existentes = archivos_registro(self.carpeta)
+        if existentes:
+            ruta = existentes[-1]
+            n = (os.path.getsize(ruta) - CABECERA.size) // REGISTRO.itemsize
+            if 0 <= n < self.registros_por_archivo:
+                leer_registros(ruta)
+                archivo = open(ruta, 'r+b')
+                # Descarta un registro a medias (p. ej. tras un corte)
+                archivo.truncate(CABECERA.size + n * REGISTRO.itemsize)
+                archivo.seek(0, os.SEEK_END)
+                return archivo, n
+            siguiente = int(os.path.basename(ruta)[len('auditoria_'):-len('.bin')]) + 1
+        else:
+            siguiente = 1
+        archivo = open(os.path.join(self.carpeta, f'auditoria_{siguiente:06d}.bin'), 'wb')
+        archivo.write(CABECERA.pack(FIRMA, REGISTRO.itemsize, N_CLASES))
+        return archivo, 0
+
+    def _escribir(self):
+        terminar = False
+        while not terminar:
+            tanda = [self.cola.get()]
+            while len(tanda) < self.registros_por_tanda:
+                try:
+                    tanda.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+            if tanda[-1] is None:
+                terminar = True
+                tanda.pop()
+
+            registros = np.zeros(len(tanda), dtype=REGISTRO)
+            if tanda:
+                claves, marcas, probabilidades = zip(*tanda)
+                registros['clave'] = claves
+                registros['marca_us'] = marcas
+                registros['version'] = self.version
+                registros['probabilidades'] = np.asarray(probabilidades, dtype=np.float32).reshape(-1, N_CLASES)
+                registros['clase'] = registros['probabilidades'].argmax(axis=1)
+
+            escritos = self.escritos
+            try:
+                if self._archivo is None:
+                    self._archivo, self._en_archivo = self._abrir()
+                self._anexar(registros)
+            except OSError as e:
+                # P. ej. disco lleno o rotación fallida: se pierde el resto de la tanda, no el hilo
+                perdidos = len(registros) - (self.escritos - escritos)
+                self.fallidos += perdidos
+                print(f"⚠️ No se pudieron escribir {perdidos} registros de auditoría: {e}")
+                self._descartar_archivo()
+        if self._archivo is not None:
+            self._archivo.close()
+
+    def _anexar(self, registros):
+        # Rotación: el resto de la tanda pasa al archivo siguiente
+        while len(registros):
+            cabe = self.registros_por_archivo - self._en_archivo
+            self._archivo.write(registros[:cabe].tobytes())
+            self._en_archivo += len(registros[:cabe])
+            self.escritos += len(registros[:cabe])
+            registros = registros[cabe:]
+            if self._en_archivo >= self.registros_por_archivo:
+                self._archivo.close()
+                self._archivo, self._en_archivo = self._abrir()
+        self._archivo.flush()
+
+    def _descartar_archivo(self):
+        # Se vuelve a abrir en la siguiente tanda; _abrir recorta el registro a medias que haya quedado
+        try:
+            self._archivo.close()
+        except (OSError, AttributeError):
+            pass
+        self._archivo = None
+
+
+def reproducir(carpeta=CARPETA_AUDITORIA, model_path=RUTA_MODELO, ruta_bundle=None, tamano_lote=None):
+    """
+    Vuelve a puntuar todos los registros con otro modelo. Devuelve la matriz
+    de transiciones (clase registrada × clase nueva), el resumen por versión
+    de modelo y las clases.
+    """
+    from prediccion_tea import crear_interprete
+    from datos_tea import RUTA_BUNDLE, cargar_bundle
+    from puntuacion_lote import puntuar_claves
+    from evaluacion import matriz_confusion
+
+    preprocessor, clases = cargar_bundle(ruta_bundle or RUTA_BUNDLE)
+    if len(clases) != N_CLASES:
+        raise ValueError(f"El modelo nuevo tiene {len(clases)} clases y el registro {N_CLASES}")
+    interpreter = crear_interprete(model_path)
+
+    transiciones = np.zeros((N_CLASES, N_CLASES), dtype=np.int64)
+    por_version = {}
+    for ruta in archivos_registro(carpeta):
+        registros = leer_registros(ruta)
+        for desde in range(0, len(registros), 1_000_000):
+            bloque = registros[desde:desde + 1_000_000]
+            probabilidades, _ = puntuar_claves(interpreter, preprocessor, np.asarray(bloque['clave']), tamano_lote)
+            nueva = probabilidades.argmax(axis=1)
+            transiciones += matriz_confusion(bloque['clase'], nueva, N_CLASES)
+
+            cambia = nueva != bloque['clase']
+            versiones, inversa = np.unique(bloque['version'], return_inverse=True)
+            totales = np.bincount(inversa, minlength=len(versiones))
+            cambios = np.bincount(inversa, weights=cambia, minlength=len(versiones))
+            for v, total, n in zip(versiones, totales, cambios):
+                previo = por_version.get(int(v), (0, 0))
+                por_version[int(v)] = (previo[0] + int(total), previo[1] + int(n))
+
+    resumen = pd.DataFrame(
+        [(f'{v:08x}', total, n, n / total * 100) for v, (total, n) in sorted(por_version.items())],
+        columns=['Versión', 'Registros', 'Cambian', '% cambian']
+    )
+    return transiciones, resumen, clases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repite el registro de auditoría con otro modelo")
+    parser.add_argument('--carpeta', default=CARPETA_AUDITORIA)
+    parser.add_argument('--modelo', default=RUTA_MODELO, help="Modelo nuevo .tflite (o árboles .npz)")
+    parser.add_argument('--bundle', default=None, help="Bundle de preprocesamiento del modelo nuevo")
+    parser.add_argument('--lote', type=int, default=None, help="Filas por inferencia (por defecto, las del perfil o 16384)")
+    args = parser.parse_args()
+
+    print("🗂️ Repetición del registro de auditoría")
+    print("=" * 50)
+
+    inicio = time.perf_counter()
+    transiciones, resumen, clases = reproducir(args.carpeta, args.modelo, args.bundle, args.lote)
+    total = int(transiciones.sum())
+    if total == 0:
+        print(f"⚠️ No hay registros en {args.carpeta}")
+        return
+    cambian = total - int(np.trace(transiciones))
+
+    print(f"   Registros: {total:,} en {len(archivos_registro(args.carpeta))} archivos")
+    print(f"   Diagnósticos que cambian: {cambian:,} ({cambian / total:.2%})")
+    print("\nTransiciones (filas: registrado, columnas: modelo nuevo):")
+    print(pd.DataFrame(transiciones, index=clases, columns=clases).to_string())
+    print("\nPor versión del modelo registrado:")
+    print(resumen.round(2).to_string(index=False))
+    print(f"\n✅ Repetición en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
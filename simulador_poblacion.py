@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Simulador de cribado poblacional: genera cohortes de pacientes sintéticos con
+las distribuciones ponderadas del notebook y las puntúa con la ruta de
+puntuación masiva (claves uint64 deduplicadas + inferencia por lotes).
+
+Cada corrida de Monte Carlo es una cohorte independiente generada en un
+proceso trabajador; al final se resumen el rendimiento, la mezcla de
+diagnósticos predichos y la distribución del puntaje de riesgo con su
+variabilidad entre corridas.
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from prediccion_tea import OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS, NIVELES_RIESGO, RUTA_MODELO, crear_interprete
+from codec_paciente import empaquetar
+from datos_tea import RUTA_BUNDLE, PESOS_OPCIONES, cargar_bundle
+from puntuacion_lote import PUNTOS_POR_INDICE, puntuar_claves
+from cubo_analitico import PUNTAJE_MAXIMO
+
+# Estado de cada proceso trabajador (se carga una sola vez por proceso)
+_trabajador = {}
+
+
+def generar_cohorte(n, rng):
+    """Edades e índices de opción (n, 15) con las probabilidades del notebook"""
+    edades = rng.integers(6, 37, n)
+    codigos = np.empty((n, len(COLUMNAS_CATEGORICAS)), dtype=np.int64)
+    for j, col in enumerate(COLUMNAS_CATEGORICAS):
+        pesos = PESOS_OPCIONES[col]
+        p = None if pesos is None else np.asarray(pesos) / np.sum(pesos)
+        codigos[:, j] = rng.choice(len(OPCIONES_VARIABLES[col]), size=n, p=p)
+    return edades, codigos
+
+
+def _iniciar_trabajador(model_path, ruta_bundle, tamano_lote, filas_por_bloque):
+    preprocessor, clases = cargar_bundle(ruta_bundle)
+    _trabajador.update(
+        interpreter=crear_interprete(model_path, num_threads=1),
+        preprocessor=preprocessor,
+        n_clases=len(clases),
+        tamano_lote=tamano_lote,
+        filas_por_bloque=filas_por_bloque
+    )
+
+
+def _simular_corrida(tarea):
+    """Genera y puntúa una cohorte por bloques; solo devuelve conteos"""
+    corrida, tamano_cohorte, semilla = tarea
+    w = _trabajador
+    rng = np.random.default_rng([semilla, corrida])
+
+    diagnosticos = np.zeros(w['n_clases'], dtype=np.int64)
+    puntajes = np.zeros(PUNTAJE_MAXIMO + 1, dtype=np.int64)
+    filas_unicas = 0
+    segundos_puntuacion = 0.0
+
+    inicio = time.perf_counter()
+    for desde in range(0, tamano_cohorte, w['filas_por_bloque']):
+        edades, codigos = generar_cohorte(min(w['filas_por_bloque'], tamano_cohorte - desde), rng)
+        probabilidades, est = puntuar_claves(w['interpreter'], w['preprocessor'],
+                                             empaquetar(edades, codigos), w['tamano_lote'])
+        diagnosticos += np.bincount(probabilidades.argmax(axis=1), minlength=w['n_clases'])
+        puntaje = PUNTOS_POR_INDICE[np.arange(len(COLUMNAS_CATEGORICAS)), codigos].sum(axis=1)
+        puntajes += np.bincount(puntaje, minlength=PUNTAJE_MAXIMO + 1)
+        filas_unicas += est['filas_unicas']
+        segundos_puntuacion += est['segundos']
+
+    return {
+        'corrida': corrida,
+        'filas': tamano_cohorte,
+        'filas_unicas': filas_unicas,
+        'segundos': time.perf_counter() - inicio,
+        'segundos_puntuacion': segundos_puntuacion,
+        'diagnosticos': diagnosticos,
+        'puntajes': puntajes
+    }
+
+
+def simular(tamano_cohorte=1_000_000, corridas=8, procesos=None, model_path=RUTA_MODELO,
+            ruta_bundle=RUTA_BUNDLE, tamano_lote=None, filas_por_bloque=1_000_000, semilla=42):
+    """Ejecuta las corridas en paralelo y devuelve (resultados por corrida, clases, segundos totales)"""
+    _, clases = cargar_bundle(ruta_bundle)
+    tareas = [(corrida, tamano_cohorte, semilla) for corrida in range(corridas)]
+
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=mp.get_context('spawn'),
+                             initializer=_iniciar_trabajador,
+                             initargs=(model_path, ruta_bundle, tamano_lote, filas_por_bloque)) as pool:
+        resultados = list(pool.map(_simular_corrida, tareas))
+    return resultados, clases, time.perf_counter() - inicio
+
+
+def resumir(resultados, clases):
+    """Tablas de media, desviación estándar y rango entre corridas"""
+    filas = np.array([r['filas'] for r in resultados])[:, None]
+    mezcla = np.array([r['diagnosticos'] for r in resultados]) / filas * 100
+    puntajes = np.array([r['puntajes'] for r in resultados])
+
+    valores = np.arange(puntajes.shape[1])
+    niveles = {nombre: puntajes[:, valores >= minimo].sum(axis=1) - puntajes[:, valores >= techo].sum(axis=1)
+               for (minimo, nombre), techo in zip(NIVELES_RIESGO, [len(valores)] + [m for m, _ in NIVELES_RIESGO])}
+    distribucion = {'Puntaje medio': (puntajes * valores).sum(axis=1) / filas[:, 0]}
+    distribucion.update({f'% riesgo {nombre.lower()}': n / filas[:, 0] * 100 for nombre, n in niveles.items()})
+
+    def tabla(columnas, nombres):
+        datos = np.column_stack(columnas)
+        return pd.DataFrame({
+            'Media': datos.mean(axis=0),
+            'Desv. estándar': datos.std(axis=0, ddof=1) if len(datos) > 1 else np.zeros(datos.shape[1]),
+            'Mínimo': datos.min(axis=0),
+            'Máximo': datos.max(axis=0)
+        }, index=nombres)
+
+    return (tabla([mezcla[:, i] for i in range(len(clases))], [f'% {c}' for c in clases]),
+            tabla(list(distribucion.values()), list(distribucion)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulación de cribado poblacional (Monte Carlo)")
+    parser.add_argument('--tamano-cohorte', type=int, default=1_000_000, help="Pacientes por corrida")
+    parser.add_argument('--corridas', type=int, default=8, help="Corridas de Monte Carlo")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos trabajadores (por defecto, todos los núcleos)")
+    parser.add_argument('--lote', type=int, default=None, help="Filas por inferencia (por defecto, las del perfil o 16384)")
+    parser.add_argument('--filas-por-bloque', type=int, default=1_000_000,
+                        help="Pacientes generados a la vez en cada proceso (limita la memoria)")
+    parser.add_argument('--modelo', default=RUTA_MODELO)
+    parser.add_argument('--bundle', default=RUTA_BUNDLE)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    print("🏙️ Simulación de cribado poblacional")
+    print("=" * 50)
+
+    resultados, clases, duracion = simular(args.tamano_cohorte, args.corridas, args.procesos, args.modelo,
+                                           args.bundle, args.lote, args.filas_por_bloque, args.semilla)
+    mezcla, distribucion = resumir(resultados, clases)
+
+    total = sum(r['filas'] for r in resultados)
+    unicas = sum(r['filas_unicas'] for r in resultados)
+    por_corrida = np.array([r['filas'] / r['segundos'] for r in resultados])
+    print(f"   Pacientes: {total:,} en {len(resultados)} corridas | Tiempo: {duracion:.1f} s "
+          f"({total / duracion:,.0f} pacientes/s en total)")
+    print(f"   Por corrida: {por_corrida.mean():,.0f} ± {por_corrida.std():,.0f} pacientes/s | "
+          f"Filas únicas puntuadas: {unicas / total:.1%}")
+    print("\n📊 Diagnósticos predichos (% de la cohorte):\n")
+    print(mezcla.round(3).to_string())
+    print("\n📈 Puntaje de riesgo:\n")
+    print(distribucion.round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
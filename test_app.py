@@ -69,6 +69,18 @@ def verificar_modelo():
         print("   Ejecuta el notebook mark3.ipynb para generar el modelo")
         return False
 
+def verificar_contrato():
+    """Verifica que el modelo y el bundle coincidan (sin TensorFlow)"""
+    print("\n📐 Verificando contrato modelo/bundle...")
+    
+    from validar_contrato import validar_contrato
+    diferencias = validar_contrato()
+    for diferencia in diferencias:
+        print(f"❌ {diferencia}")
+    if not diferencias:
+        print("✅ Formas, categorías, escalado y clases coinciden")
+    return not diferencias
+
 def verificar_app_streamlit():
     """Verifica que el archivo de la app esté presente"""
     print("\n📱 Verificando aplicación...")
@@ -99,6 +111,445 @@ def verificar_app_streamlit():
         print(f"❌ Aplicación no encontrada: {app_path}")
         return False
 
+def verificar_codec_paciente():
+    """Verifica la ida y vuelta del codec uint64 sobre todo el espacio de opciones"""
+    print("\n🔢 Verificando codec de pacientes...")
+    
+    from prediccion_tea import OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS
+    import codec_paciente as codec
+    
+    rng = np.random.default_rng(0)
+    limites = np.array([len(OPCIONES_VARIABLES[col]) for col in COLUMNAS_CATEGORICAS])
+    errores = []
+    
+    # Cada campo ocupa bits propios: se recorre cada edad posible y cada opción de
+    # cada variable (con el resto de campos al azar), lo que cubre todos los valores
+    # que puede tomar cada posición de la clave
+    edades = np.repeat(np.arange(codec.MASCARA_EDAD + 1), len(COLUMNAS_CATEGORICAS) * 4)
+    codigos = rng.integers(0, limites, size=(len(edades), len(limites)))
+    for j in range(len(limites)):
+        filas = np.arange(j * 4, len(edades), len(limites) * 4)
+        for opcion in range(limites[j]):
+            codigos[filas + opcion, j] = opcion
+    
+    # Más un millón de registros aleatorios
+    edades = np.concatenate([edades, rng.integers(0, codec.MASCARA_EDAD + 1, 1_000_000)])
+    codigos = np.concatenate([codigos, rng.integers(0, limites, size=(1_000_000, len(limites)))])
+    
+    claves = codec.empaquetar(edades, codigos)
+    edades_2, codigos_2 = codec.desempaquetar(claves)
+    if not (np.array_equal(edades, edades_2) and np.array_equal(codigos, codigos_2)):
+        errores.append("empaquetar/desempaquetar no es reversible")
+    if claves.max() >> np.uint64(codec.BITS_TOTALES):
+        errores.append(f"las claves usan más de {codec.BITS_TOTALES} bits")
+    
+    # Ruta de texto: DataFrame y diccionario deben dar las mismas claves
+    muestra = claves[:5000]
+    df = codec.desempaquetar_df(muestra)
+    if not np.array_equal(codec.empaquetar_df(df), muestra):
+        errores.append("empaquetar_df/desempaquetar_df no es reversible")
+    for clave, fila in zip(muestra, df.to_dict('records')):
+        datos = codec.desempaquetar_paciente(clave)
+        if codec.empaquetar_paciente(fila) != int(clave) or any(datos[k] != fila[k] for k in datos):
+            errores.append(f"ruta de un paciente no coincide para la clave {clave}")
+            break
+    
+    # Valores fuera del espacio de opciones deben rechazarse
+    fila = dict(df.iloc[0])
+    for campo, valor in [('Lenguaje', 'Inventado'), ('Edad (meses)', 64)]:
+        try:
+            codec.empaquetar_paciente({**fila, campo: valor})
+            errores.append(f"se aceptó {campo}={valor!r}")
+        except ValueError:
+            pass
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print(f"✅ {len(claves):,} claves verificadas ({codec.BITS_TOTALES} bits por paciente)")
+    return True
+
+def verificar_arboles_compilados():
+    """Verifica guardar/cargar de los árboles compilados con clases de texto (como el notebook)"""
+    print("\n🌳 Verificando árboles compilados...")
+    
+    import tempfile
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder
+    from arboles_compilados import ArbolesCompilados
+    from prediccion_tea import ETIQUETAS
+    
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 6)).astype(np.float32)
+    # Ajustado sobre una Series, como en el notebook: classes_ queda con dtype object
+    diagnosticos = pd.Series(rng.choice(ETIQUETAS, size=len(X)), dtype=object)
+    le = LabelEncoder().fit(diagnosticos)
+    y = le.transform(diagnosticos)
+    bosque = RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0).fit(X, y)
+    
+    # le.classes_ es un array object: debe poder cargarse sin pickle
+    compilado = ArbolesCompilados.desde_sklearn(bosque, clases=le.classes_)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'arboles.npz')
+        compilado.guardar(ruta)
+        try:
+            cargado = ArbolesCompilados.cargar(ruta)
+        except ValueError as e:
+            print(f"❌ No se pudo cargar {ruta}: {e}")
+            return False
+    
+    errores = []
+    if list(cargado.clases) != list(le.classes_):
+        errores.append(f"clases cargadas {list(cargado.clases)}, se esperaba {list(le.classes_)}")
+    if not np.allclose(cargado.predict_proba(X), bosque.predict_proba(X), atol=1e-6):
+        errores.append("predict_proba no coincide con sklearn tras cargar")
+    if not np.array_equal(cargado.predict(X), le.inverse_transform(bosque.predict(X))):
+        errores.append("predict no coincide con sklearn tras cargar")
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print(f"✅ Ida y vuelta .npz con {len(cargado.clases)} clases de texto")
+    return True
+
+def verificar_comprimir_unicos():
+    """Verifica que las filas únicas conserven el total y la mezcla de clases en cualquier tramo"""
+    print("\n🗜️ Verificando compresión de filas únicas...")
+    
+    from datos_tea import generar_dataset, separar_variables, comprimir_unicos
+    from sklearn.preprocessing import LabelEncoder
+    
+    X, y = separar_variables(generar_dataset(n_casos=50000))
+    y = LabelEncoder().fit_transform(y)
+    posiciones, conteos = comprimir_unicos(X, y)
+    y_u = y[posiciones]
+    errores = []
+    
+    if conteos.sum() != len(y):
+        errores.append(f"los conteos suman {conteos.sum():,} y hay {len(y):,} filas")
+    if not np.array_equal(np.bincount(y_u, weights=conteos, minlength=y.max() + 1), np.bincount(y)):
+        errores.append("los conteos ponderados por clase no coinciden con los originales")
+    
+    # El validation_split de Keras toma el último 20%: debe tener las mismas clases que el resto
+    corte = int(len(y_u) * 0.8)
+    proporciones = [np.bincount(tramo, minlength=y.max() + 1) / len(tramo) for tramo in (y_u[:corte], y_u[corte:])]
+    if np.abs(proporciones[0] - proporciones[1]).max() > 0.05:
+        errores.append(f"mezcla de clases distinta: 80% inicial {np.round(proporciones[0], 3).tolist()}, "
+                       f"20% final {np.round(proporciones[1], 3).tolist()}")
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print(f"✅ {len(y):,} filas → {len(posiciones):,} únicas con la misma mezcla de clases")
+    return True
+
+def verificar_contrafactuales():
+    """Verifica el barrido contrafactual: fila 0 = paciente y cada variante cambia un solo campo"""
+    print("\n🔀 Verificando análisis contrafactual...")
+    
+    from prediccion_tea import (
+        OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS, EDAD_MINIMA, EDAD_MAXIMA, RUTA_MODELO,
+        calcular_puntaje_riesgo, generar_variantes, analizar_contrafactuales,
+        crear_interprete, predecir_probabilidades
+    )
+    
+    rng = np.random.default_rng(0)
+    campos = ['Edad (meses)'] + COLUMNAS_CATEGORICAS
+    n_categoricas = sum(len(opciones) - 1 for opciones in OPCIONES_VARIABLES.values())
+    errores = []
+    
+    pacientes = []
+    for _ in range(20):
+        datos = {col: OPCIONES_VARIABLES[col][rng.integers(len(OPCIONES_VARIABLES[col]))] for col in COLUMNAS_CATEGORICAS}
+        datos['Edad (meses)'] = int(rng.integers(EDAD_MINIMA, EDAD_MAXIMA + 1))
+        datos['Puntaje riesgo'] = calcular_puntaje_riesgo(datos)
+        pacientes.append(datos)
+    
+    for datos in pacientes:
+        variantes, cambios = generar_variantes(datos)
+        filas = variantes.to_dict('records')
+        if any(filas[0][campo] != datos[campo] for campo in campos + ['Puntaje riesgo']):
+            errores.append("la fila 0 no es el paciente original")
+        if len(variantes) != 1 + n_categoricas + (EDAD_MAXIMA - EDAD_MINIMA + 1):
+            errores.append(f"{len(variantes)} variantes, se esperaban {1 + n_categoricas + EDAD_MAXIMA - EDAD_MINIMA + 1}")
+        for fila, (variable, valor) in zip(filas[1:], cambios.iloc[1:].itertuples(index=False)):
+            distintos = [campo for campo in campos if fila[campo] != datos[campo]]
+            # La edad del propio paciente aparece en la curva sin cambios
+            if distintos not in ([variable], []) or fila[variable] != valor:
+                errores.append(f"la variante {variable}={valor!r} cambia {distintos}")
+                break
+            if fila['Puntaje riesgo'] != calcular_puntaje_riesgo(fila):
+                errores.append(f"puntaje de riesgo no recalculado en {variable}={valor!r}")
+                break
+        if errores:
+            break
+    
+    if not errores and os.path.exists(RUTA_MODELO):
+        from datos_tea import cargar_bundle
+        preprocessor, _ = cargar_bundle()
+        interpreter = crear_interprete(RUTA_MODELO)
+        lotes = []
+        
+        def predecir(interpreter, X):
+            lotes.append(len(X))
+            return predecir_probabilidades(interpreter, X)
+        
+        datos = pacientes[0]
+        sensibilidad, curva_edad = analizar_contrafactuales(interpreter, preprocessor, datos, predecir=predecir)
+        individual = predecir_probabilidades(interpreter, preprocessor.transform(pd.DataFrame([datos])))[0]
+        edad = curva_edad.set_index('Edad (meses)').loc[datos['Edad (meses)']].to_numpy()
+        if len(lotes) != 1:
+            errores.append(f"el barrido hizo {len(lotes)} inferencias en lugar de una")
+        if not np.allclose(edad, individual, atol=1e-5):
+            errores.append("la curva de edad en la edad del paciente no coincide con la predicción individual")
+        if len(curva_edad) != EDAD_MAXIMA - EDAD_MINIMA + 1 or len(sensibilidad) != n_categoricas:
+            errores.append(f"curva de {len(curva_edad)} edades y sensibilidad de {len(sensibilidad)} filas")
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print(f"✅ {len(pacientes)} pacientes: variantes de un solo campo y una sola inferencia igual a la individual")
+    return True
+
+def verificar_puntuacion_lote():
+    """Verifica que la puntuación deduplicada coincida fila a fila con la inferencia sin deduplicar"""
+    print("\n📦 Verificando puntuación masiva deduplicada...")
+    
+    from prediccion_tea import RUTA_MODELO, crear_interprete, predecir_probabilidades
+    from codec_paciente import empaquetar_df, desempaquetar_df
+    from puntuacion_lote import puntuar_claves
+    from datos_tea import RUTA_BUNDLE, cargar_bundle, generar_dataset, separar_variables
+    
+    if not (os.path.exists(RUTA_MODELO) and os.path.exists(RUTA_BUNDLE)):
+        print("⚠️ Falta el modelo o el bundle: no se puede verificar")
+        return False
+    
+    preprocessor, _ = cargar_bundle()
+    interpreter = crear_interprete(RUTA_MODELO)
+    
+    # Pocas claves distintas repetidas y desordenadas, para que la dispersión importe
+    rng = np.random.default_rng(0)
+    distintas = empaquetar_df(separar_variables(generar_dataset(n_casos=300))[0])
+    claves = distintas[rng.integers(len(distintas), size=3000)]
+    
+    probabilidades, estadisticas = puntuar_claves(interpreter, preprocessor, claves)
+    esperadas = predecir_probabilidades(interpreter, preprocessor.transform(desempaquetar_df(claves)))
+    
+    errores = []
+    if probabilidades.shape != esperadas.shape:
+        errores.append(f"forma {probabilidades.shape}, se esperaba {esperadas.shape}")
+    elif not np.allclose(probabilidades, esperadas, atol=1e-5):
+        filas = np.flatnonzero(~np.isclose(probabilidades, esperadas, atol=1e-5).all(axis=1))
+        errores.append(f"{len(filas)} filas no coinciden con la inferencia fila a fila (p. ej. la {filas[0]})")
+    if estadisticas['filas_unicas'] != len(np.unique(claves)):
+        errores.append(f"{estadisticas['filas_unicas']} filas únicas, hay {len(np.unique(claves))}")
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print(f"✅ {len(claves):,} filas ({estadisticas['filas_unicas']} únicas) iguales a la inferencia sin deduplicar")
+    return True
+
+def verificar_knn_hamming():
+    """Verifica que HammingKNN encuentre los mismos vecinos que KNeighborsClassifier"""
+    print("\n📍 Verificando kNN con índice Hamming...")
+    
+    from sklearn.neighbors import KNeighborsClassifier
+    from knn_hamming import HammingKNN
+    from datos_tea import ajustar_preprocesamiento, codificar, generar_dataset
+    
+    df = generar_dataset(n_casos=4000)
+    preprocessor, clases = ajustar_preprocesamiento(df)
+    X, y = codificar(df, preprocessor, clases)
+    X_train, y_train, X_test = X[:3500], y[:3500], X[3500:]
+    
+    k = 5
+    hamming = HammingKNN(n_neighbors=k).fit(X_train, y_train)
+    referencia = KNeighborsClassifier(n_neighbors=k).fit(X_train, y_train)
+    d_hamming, _ = hamming.kneighbors(X_test)
+    d_referencia, _ = referencia.kneighbors(X_test, n_neighbors=k + 1)
+    
+    errores = []
+    if not np.allclose(np.sort(d_hamming, axis=1), d_referencia[:, :k], atol=1e-6):
+        filas = np.flatnonzero(~np.isclose(np.sort(d_hamming, axis=1), d_referencia[:, :k], atol=1e-6).all(axis=1))
+        errores.append(f"{len(filas)} consultas con distancias distintas (p. ej. la {filas[0]})")
+    
+    # Con un empate en la k-ésima distancia cada uno elige vecinos distintos
+    # (HammingKNN el índice menor): las predicciones solo se comparan sin empate
+    sin_empate = d_referencia[:, k - 1] < d_referencia[:, k] - 1e-6
+    distintas = hamming.predict(X_test[sin_empate]) != referencia.predict(X_test[sin_empate])
+    if distintas.any():
+        errores.append(f"{distintas.sum()} predicciones distintas sin empate en el vecino {k}")
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print(f"✅ {len(X_test)} consultas con las mismas distancias; "
+          f"{sin_empate.sum()} sin empate con la misma predicción")
+    return True
+
+def verificar_guardia_latencia():
+    """Verifica que el interruptor se abra tras N llamadas lentas, pase a semiabierto y se cierre"""
+    print("\n⏱️ Verificando guardia de latencia...")
+    
+    import time
+    from guardia_latencia import GuardiaLatencia, ModeloNoDisponible, CERRADO, ABIERTO
+    
+    guardia = GuardiaLatencia(tiempo_maximo=0.05, fallos_para_abrir=3, segundos_abierto=0.3)
+    llamadas_rapidas = []
+    
+    def lenta():
+        time.sleep(0.2)
+    
+    def rapida():
+        llamadas_rapidas.append(1)
+        return 'ok'
+    
+    def falla(funcion):
+        try:
+            guardia.ejecutar(funcion)
+        except ModeloNoDisponible:
+            return True
+        return False
+    
+    errores = []
+    for i in range(3):
+        if not falla(lenta):
+            errores.append(f"la llamada lenta {i + 1} no lanzó ModeloNoDisponible")
+        esperado = ABIERTO if i == 2 else CERRADO
+        if guardia.estado != esperado:
+            errores.append(f"tras {i + 1} llamadas lentas el circuito está {guardia.estado}, se esperaba {esperado}")
+    
+    # Abierto: se rechaza al momento sin llamar al modelo
+    inicio = time.perf_counter()
+    if not falla(rapida) or llamadas_rapidas:
+        errores.append("con el circuito abierto se llamó al modelo")
+    if time.perf_counter() - inicio > 0.01:
+        errores.append("con el circuito abierto el rechazo no fue inmediato")
+    
+    # Semiabierto: una prueba lenta vuelve a abrirlo, una correcta lo cierra
+    time.sleep(0.35)
+    falla(lenta)
+    if guardia.estado != ABIERTO:
+        errores.append(f"tras una prueba lenta el circuito está {guardia.estado}, se esperaba {ABIERTO}")
+    time.sleep(0.35)
+    if guardia.ejecutar(rapida) != 'ok' or guardia.estado != CERRADO:
+        errores.append(f"tras una prueba correcta el circuito está {guardia.estado}, se esperaba {CERRADO}")
+    
+    metricas = guardia.metricas()
+    esperadas = {'lentas': 4, 'rechazadas': 1, 'aperturas': 2, 'exitos': 1}
+    for clave, valor in esperadas.items():
+        if metricas[clave] != valor:
+            errores.append(f"métrica {clave}: {metricas[clave]}, se esperaba {valor}")
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print("✅ Abre tras 3 llamadas lentas, rechaza al momento, reabre si falla la prueba y cierra si va bien")
+    return True
+
+def verificar_control_admision():
+    """Verifica rechazos con la cola llena, turno rotatorio entre clientes y espera máxima"""
+    print("\n🚦 Verificando control de admisión...")
+    
+    import threading
+    import time
+    from control_admision import ControlAdmision, PeticionRechazada
+    
+    def ocupar(control):
+        """Hilo que toma el único hueco hasta que se libere el evento devuelto"""
+        liberar, dentro = threading.Event(), threading.Event()
+        
+        def bloqueo():
+            with control.admitir('bloqueo'):
+                dentro.set()
+                liberar.wait()
+        
+        hilo = threading.Thread(target=bloqueo)
+        hilo.start()
+        dentro.wait()
+        return liberar, hilo
+    
+    def rechazo(control, cliente):
+        try:
+            with control.admitir(cliente):
+                pass
+        except PeticionRechazada as e:
+            return e.motivo
+        return None
+    
+    errores = []
+    control = ControlAdmision(concurrencia=1, capacidad_cola=4, capacidad_por_cliente=2, espera_maxima=5.0)
+    liberar, bloqueo = ocupar(control)
+    
+    # Se encolan en este orden: A, A, B, C (cada uno espera a que el anterior esté en cola)
+    orden, hilos = [], []
+    
+    def encolar(cliente):
+        def atender():
+            with control.admitir(cliente):
+                orden.append(cliente)
+        en_cola = control.en_cola
+        hilos.append(threading.Thread(target=atender))
+        hilos[-1].start()
+        while control.en_cola == en_cola:
+            time.sleep(0.001)
+    
+    for cliente in ('A', 'A', 'B'):
+        encolar(cliente)
+    motivo = rechazo(control, 'A')
+    if motivo != "Demasiadas peticiones del cliente":
+        errores.append(f"tercera petición del cliente A: {motivo!r}, se esperaba el límite por cliente")
+    encolar('C')
+    motivo = rechazo(control, 'D')
+    if motivo != "Cola llena":
+        errores.append(f"petición con la cola llena: {motivo!r}, se esperaba 'Cola llena'")
+    
+    liberar.set()
+    for hilo in [bloqueo] + hilos:
+        hilo.join()
+    if orden != ['A', 'B', 'C', 'A']:
+        errores.append(f"orden de servicio {orden}, se esperaba turno rotatorio ['A', 'B', 'C', 'A']")
+    metricas = control.metricas()
+    if (metricas['admitidas'], metricas['rechazadas_cola'], metricas['en_curso']) != (5, 2, 0):
+        errores.append(f"admitidas {metricas['admitidas']}, rechazadas_cola {metricas['rechazadas_cola']}, "
+                       f"en_curso {metricas['en_curso']}; se esperaba 5, 2 y 0")
+    
+    # Una petición que no consigue turno dentro de espera_maxima se rechaza y sale de la cola
+    control = ControlAdmision(concurrencia=1, capacidad_cola=4, capacidad_por_cliente=2, espera_maxima=0.05)
+    liberar, bloqueo = ocupar(control)
+    motivo = rechazo(control, 'A')
+    liberar.set()
+    bloqueo.join()
+    metricas = control.metricas()
+    if motivo != "Tiempo de espera agotado":
+        errores.append(f"petición sin turno: {motivo!r}, se esperaba 'Tiempo de espera agotado'")
+    if (metricas['rechazadas_espera'], metricas['en_cola'], metricas['en_curso']) != (1, 0, 0):
+        errores.append(f"rechazadas_espera {metricas['rechazadas_espera']}, en_cola {metricas['en_cola']}, "
+                       f"en_curso {metricas['en_curso']}; se esperaba 1, 0 y 0")
+    
+    for error in errores:
+        print(f"❌ {error}")
+    if errores:
+        return False
+    
+    print("✅ Rechaza con la cola llena, reparte en turno rotatorio y descarta las esperas agotadas")
+    return True
+
 def crear_datos_prueba():
     """Crea datos de prueba para verificar el funcionamiento"""
     print("\n🧪 Creando datos de prueba...")
@@ -183,14 +634,32 @@ def main():
     # Verificaciones
     dependencias_ok = verificar_dependencias()
     modelo_ok = verificar_modelo()
+    contrato_ok = verificar_contrato()
     app_ok = verificar_app_streamlit()
+    codec_ok = verificar_codec_paciente()
+    arboles_ok = verificar_arboles_compilados()
+    unicos_ok = verificar_comprimir_unicos()
+    contrafactual_ok = verificar_contrafactuales()
+    lote_ok = verificar_puntuacion_lote()
+    knn_ok = verificar_knn_hamming()
+    guardia_ok = verificar_guardia_latencia()
+    admision_ok = verificar_control_admision()
     
     print("\n📊 Resumen de Verificación:")
     print(f"   Dependencias: {'✅' if dependencias_ok else '❌'}")
     print(f"   Modelo TFLite: {'✅' if modelo_ok else '❌'}")
+    print(f"   Contrato modelo/bundle: {'✅' if contrato_ok else '❌'}")
     print(f"   Aplicación: {'✅' if app_ok else '❌'}")
+    print(f"   Codec de pacientes: {'✅' if codec_ok else '❌'}")
+    print(f"   Árboles compilados: {'✅' if arboles_ok else '❌'}")
+    print(f"   Filas únicas: {'✅' if unicos_ok else '❌'}")
+    print(f"   Análisis contrafactual: {'✅' if contrafactual_ok else '❌'}")
+    print(f"   Puntuación masiva: {'✅' if lote_ok else '❌'}")
+    print(f"   kNN Hamming: {'✅' if knn_ok else '❌'}")
+    print(f"   Guardia de latencia: {'✅' if guardia_ok else '❌'}")
+    print(f"   Control de admisión: {'✅' if admision_ok else '❌'}")
     
-    if dependencias_ok and modelo_ok and app_ok:
+    if dependencias_ok and modelo_ok and contrato_ok and app_ok and codec_ok and arboles_ok and unicos_ok and contrafactual_ok and lote_ok and knn_ok and guardia_ok and admision_ok:
         print("\n🎉 ¡Todo está listo!")
         print("Ejecuta: streamlit run app_streamlit.py")
         
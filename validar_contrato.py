@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Validación del contrato entre el modelo .tflite, el bundle de
+preprocesamiento y las definiciones de la app, sin TensorFlow ni sklearn.
+
+Lee formas y tipos de los tensores directamente del FlatBuffer
+(modelo_tflite) y el bundle como JSON, y comprueba:
+  - entrada float32 (lote, n) con n = columnas one-hot + numéricas del bundle
+  - salida float32 (lote, k) con SOFTMAX y k = número de clases
+  - columnas y categorías del bundle en el orden del OneHotEncoder
+    (alfabético) y con las mismas opciones que OPCIONES_VARIABLES
+  - medias y escalas del escalador finitas, positivas y dentro del rango
+    de cada variable
+  - clases del bundle en el orden de ETIQUETAS
+
+Cada diferencia se devuelve como un texto que dice dónde está y qué se
+esperaba. Sin bundle (la app rehace el preprocessor con las opciones), el
+modelo se compara con lo que se deduce de OPCIONES_VARIABLES.
+
+Tarda milisegundos: la app lo ejecuta al cargar el modelo y en CI basta con
+`python validar_contrato.py`, que sale con código 1 si hay diferencias.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from modelo_tflite import leer_modelo
+from prediccion_tea import (
+    OPCIONES_VARIABLES, COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS, ETIQUETAS,
+    EDAD_MINIMA, EDAD_MAXIMA, PUNTOS_RIESGO, RUTA_MODELO
+)
+
+# Mismo valor que datos_tea.RUTA_BUNDLE (importarlo cargaría sklearn)
+RUTA_BUNDLE = 'modelo_autismo_bundle.json'
+
+CLAVES_BUNDLE = ['columnas_categoricas', 'categorias', 'columnas_numericas',
+                 'media', 'escala', 'clases', 'n_caracteristicas']
+
+# Rango posible de cada variable numérica: la media del escalador debe caer dentro
+RANGOS_NUMERICOS = {
+    'Edad (meses)': (EDAD_MINIMA, EDAD_MAXIMA),
+    'Puntaje riesgo': (0, sum(max(puntos.values()) for puntos in PUNTOS_RIESGO.values()))
+}
+
+
+def diferencias_lista(nombre, obtenido, esperado):
+    """Elementos que faltan o sobran y, si son los mismos, posiciones con distinto orden"""
+    obtenido, esperado = list(obtenido), list(esperado)
+    faltan = [e for e in esperado if e not in obtenido]
+    sobran = [o for o in obtenido if o not in esperado]
+    diferencias = []
+    if faltan:
+        diferencias.append(f"{nombre}: faltan {faltan}")
+    if sobran:
+        diferencias.append(f"{nombre}: sobran {sobran}")
+    repetidos = sorted({o for o in obtenido if obtenido.count(o) > 1})
+    if repetidos:
+        diferencias.append(f"{nombre}: repetidos {repetidos}")
+    if not diferencias and obtenido != esperado:
+        diferencias += [f"{nombre}[{i}]: {o!r}, se esperaba {e!r}"
+                        for i, (o, e) in enumerate(zip(obtenido, esperado)) if o != e]
+    return diferencias
+
+
+def _validar_bundle(bundle):
+    """Diferencias del bundle con las definiciones de la app"""
+    faltan = [clave for clave in CLAVES_BUNDLE if clave not in bundle]
+    if faltan:
+        return [f"bundle: faltan las claves {faltan}"]
+
+    diferencias = diferencias_lista('columnas_categoricas', bundle['columnas_categoricas'], COLUMNAS_CATEGORICAS)
+    diferencias += diferencias_lista('columnas_numericas', bundle['columnas_numericas'], COLUMNAS_NUMERICAS)
+
+    # El OneHotEncoder del entrenamiento ordena las categorías alfabéticamente
+    for col in COLUMNAS_CATEGORICAS:
+        if col not in bundle['categorias']:
+            diferencias.append(f"categorias['{col}']: no está en el bundle")
+            continue
+        diferencias += diferencias_lista(f"categorias['{col}']", bundle['categorias'][col],
+                                         sorted(OPCIONES_VARIABLES[col]))
+
+    n_calculado = sum(len(cats) for cats in bundle['categorias'].values()) + len(bundle['columnas_numericas'])
+    if bundle['n_caracteristicas'] != n_calculado:
+        diferencias.append(f"n_caracteristicas: {bundle['n_caracteristicas']}, pero categorías + "
+                           f"numéricas suman {n_calculado}")
+
+    for parametro in ('media', 'escala'):
+        valores = bundle[parametro]
+        if len(valores) != len(bundle['columnas_numericas']):
+            diferencias.append(f"{parametro}: {len(valores)} valores para "
+                               f"{len(bundle['columnas_numericas'])} columnas numéricas")
+            continue
+        for col, valor in zip(bundle['columnas_numericas'], valores):
+            if not isinstance(valor, (int, float)) or not math.isfinite(valor):
+                diferencias.append(f"{parametro}['{col}']: {valor!r} no es un número finito")
+            elif parametro == 'escala' and valor <= 0:
+                diferencias.append(f"escala['{col}']: {valor} debe ser positiva")
+            elif parametro == 'media' and col in RANGOS_NUMERICOS:
+                minimo, maximo = RANGOS_NUMERICOS[col]
+                if not minimo <= valor <= maximo:
+                    diferencias.append(f"media['{col}']: {valor:.4g} fuera del rango [{minimo}, {maximo}]")
+
+    diferencias += diferencias_lista('clases', bundle['clases'], ETIQUETAS)
+    return diferencias
+
+
+def _validar_modelo(modelo, n_caracteristicas, n_clases):
+    """Diferencias de las formas y tipos del modelo con las del bundle"""
+    diferencias = []
+    tensores = modelo['tensores']
+    if len(modelo['entradas']) != 1 or len(modelo['salidas']) != 1:
+        return [f"modelo: {len(modelo['entradas'])} entradas y {len(modelo['salidas'])} salidas, "
+                "se esperaba 1 y 1"]
+
+    for nombre, indice, ancho, que in (('entrada', modelo['entradas'][0], n_caracteristicas, 'características'),
+                                       ('salida', modelo['salidas'][0], n_clases, 'clases')):
+        tensor = tensores[indice]
+        if tensor['tipo'] is not np.float32:
+            tipo = tensor['tipo'].__name__ if tensor['tipo'] is not None else 'desconocido'
+            diferencias.append(f"{nombre} '{tensor['nombre']}': tipo {tipo}, se esperaba float32")
+        forma = list(tensor['forma'])
+        if len(forma) != 2:
+            diferencias.append(f"{nombre} '{tensor['nombre']}': forma {forma}, se esperaba [lote, {ancho}]")
+        elif forma[1] != ancho:
+            diferencias.append(f"{nombre} '{tensor['nombre']}': {forma[1]} columnas, el bundle tiene {ancho} {que}")
+
+    # Primera capa densa: sus pesos (unidades, n) deben coincidir con la entrada
+    for op in modelo['operadores']:
+        if op['operador'] == 'FULLY_CONNECTED' and op['entradas'][0] == modelo['entradas'][0]:
+            pesos = tensores[op['entradas'][1]]
+            if list(pesos['forma'][-1:]) != [n_caracteristicas]:
+                diferencias.append(f"pesos '{pesos['nombre']}': forma {list(pesos['forma'])}, "
+                                   f"se esperaban {n_caracteristicas} columnas")
+
+    ultimo = modelo['operadores'][-1] if modelo['operadores'] else None
+    if ultimo is None or ultimo['operador'] != 'SOFTMAX' or modelo['salidas'][0] not in ultimo['salidas']:
+        diferencias.append(f"salida: la última operación es {ultimo['operador'] if ultimo else 'ninguna'}, "
+                           "se esperaba SOFTMAX (probabilidades)")
+    return diferencias
+
+
+def validar_contrato(model_path=RUTA_MODELO, ruta_bundle=RUTA_BUNDLE):
+    """
+    Lista de diferencias entre el modelo, el bundle y la app (vacía si el
+    contrato se cumple). Sin bundle, el modelo se compara con las opciones.
+    """
+    try:
+        modelo = leer_modelo(model_path)
+    except (OSError, ValueError, IndexError) as e:
+        return [f"modelo: no se pudo leer {model_path} ({e})"]
+
+    if ruta_bundle is not None and os.path.exists(ruta_bundle):
+        try:
+            with open(ruta_bundle, encoding='utf-8') as f:
+                bundle = json.load(f)
+        except (OSError, ValueError) as e:
+            return [f"bundle: no se pudo leer {ruta_bundle} ({e})"]
+        diferencias = _validar_bundle(bundle)
+        if any(d.startswith('bundle:') for d in diferencias):
+            return diferencias
+        n_caracteristicas, n_clases = bundle['n_caracteristicas'], len(bundle['clases'])
+    else:
+        diferencias = []
+        n_caracteristicas = sum(len(OPCIONES_VARIABLES[col]) for col in COLUMNAS_CATEGORICAS) + len(COLUMNAS_NUMERICAS)
+        n_clases = len(ETIQUETAS)
+
+    return diferencias + _validar_modelo(modelo, n_caracteristicas, n_clases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida el contrato entre el modelo TFLite, el bundle y la app")
+    parser.add_argument('--modelo', default=RUTA_MODELO)
+    parser.add_argument('--bundle', default=None,
+                        help="Bundle de preprocesamiento (por defecto, <modelo>_bundle.json o el de producción)")
+    args = parser.parse_args()
+
+    ruta_bundle = args.bundle
+    if ruta_bundle is not None and not os.path.exists(ruta_bundle):
+        parser.error(f"no existe el bundle {ruta_bundle}")
+    if ruta_bundle is None:
+        candidato = os.path.splitext(args.modelo)[0] + '_bundle.json'
+        ruta_bundle = candidato if os.path.exists(candidato) else RUTA_BUNDLE
+
+    print("📐 Validación del contrato modelo/bundle")
+    print("=" * 50)
+    print(f"   Modelo: {args.modelo}")
+    print(f"   Bundle: {ruta_bundle if os.path.exists(ruta_bundle) else 'no encontrado (se usan las opciones de la app)'}")
+
+    inicio = time.perf_counter()
+    diferencias = validar_contrato(args.modelo, ruta_bundle)
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+
+    if diferencias:
+        print(f"\n❌ {len(diferencias)} diferencias ({duracion_ms:.1f} ms):")
+        for diferencia in diferencias:
+            print(f"   - {diferencia}")
+        sys.exit(1)
+    print(f"\n✅ Contrato válido ({duracion_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()